@@ -3,6 +3,20 @@ ASGI config for WOPBIC project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Production runs it under gunicorn with uvicorn workers (see render.yaml):
+
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker \\
+        gunicorn WOPBIC.asgi:application --config gunicorn.conf.py
+
+The pages themselves are still sync views, run in a thread per request, but
+the live status stream is answered by church.live.LiveStatusStream before
+the request reaches Django: every viewer waiting for a service holds an idle
+connection on the worker's event loop rather than a thread. Django closes
+database connections after each request under ASGI, so run with DB_POOL
+(render.yaml does), which hands them back to a per-worker pool instead.
+The in-process cache tier is shared by every thread and request context
+(see church/cache.py), so it keeps its hit rate under ASGI too.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +27,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'WOPBIC.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from church.live import LiveStatusStream  # noqa: E402 (needs the apps loaded)
+
+application = LiveStatusStream(django_application)
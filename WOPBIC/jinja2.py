@@ -0,0 +1,48 @@
+# WOPBIC/jinja2.py (Jinja2 environment for the templates in jinja2/)
+from django.conf import settings
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from jinja2 import ChainableUndefined, Environment, FileSystemLoader, Undefined
+
+from church.template_loaders import strip_whitespace
+
+
+class StripWhitespaceLoader(FileSystemLoader):
+    """FileSystemLoader with the same whitespace stripping as the Django loaders"""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        if template.endswith('.html'):
+            source = strip_whitespace(source)
+        return source, filename, uptodate
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def django_filter(func):
+    # Django's filters expect None (not Jinja's Undefined) for missing values
+    def wrapper(value, *args):
+        return func(None if isinstance(value, Undefined) else value, *args)
+    return wrapper
+
+
+def environment(**options):
+    if settings.TEMPLATE_STRIP_WHITESPACE:
+        options['loader'] = StripWhitespaceLoader(options['loader'].searchpath)
+    # Render missing attributes as '' like the Django templates do
+    options['undefined'] = ChainableUndefined
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+        'now': timezone.localtime,
+    })
+    env.filters.update({
+        name: django_filter(getattr(defaultfilters, name))
+        for name in ('date', 'time', 'truncatewords', 'pluralize')
+    })
+    return env
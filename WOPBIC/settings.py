@@ -12,14 +12,15 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+import dj_database_url
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
-# initialize environ
+# initialize environ (the only place .env is read)
 env = environ.Env(DEBUG =(bool, True))
 
 environ.Env.read_env(BASE_DIR / '.env')
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.sitemaps',
     'crispy_forms',
     'crispy_bootstrap4',
     'church'
@@ -54,6 +56,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'church.snapshots.SnapshotMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,11 +67,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'WOPBIC.urls'
 
+# Compiled templates are always cached (in development the autoreloader
+# clears the cache when a template changes). Outside development the HTML
+# templates also have their indentation and blank lines stripped.
+TEMPLATE_STRIP_WHITESPACE = env.bool('TEMPLATE_STRIP_WHITESPACE', default=not DEBUG)
+if TEMPLATE_STRIP_WHITESPACE:
+    TEMPLATE_LOADERS = ['church.template_loaders.FilesystemLoader', 'church.template_loaders.AppDirectoriesLoader']
+else:
+    TEMPLATE_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # ← ADD THIS
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -76,25 +87,131 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
 
+# Optional Jinja2 rendering of the busiest pages (home, events, sermons) from
+# the templates in jinja2/ (requires: pip install Jinja2)
+JINJA2_PAGES = env.bool('JINJA2_PAGES', default=False)
+JINJA2_TEMPLATES = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'NAME': 'jinja2',
+    'DIRS': [BASE_DIR / 'jinja2'],
+    'OPTIONS': {
+        'environment': 'WOPBIC.jinja2.environment',
+        'context_processors': [
+            'django.contrib.messages.context_processors.messages',
+        ],
+        'trim_blocks': True,
+        'lstrip_blocks': True,
+    },
+}
+if JINJA2_PAGES:
+    TEMPLATES.append(JINJA2_TEMPLATES)
+HOT_PAGES_TEMPLATE_ENGINE = 'jinja2' if JINJA2_PAGES else 'django'
+
 WSGI_APPLICATION = 'WOPBIC.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_URL wins when set (Render provides one); otherwise the URL is built
+# from the individual DB_* variables so local setups keep working.
+DEFAULT_DATABASE_URL = 'postgres://{user}:{password}@{host}:{port}/{name}'.format(
+    user=env('DB_USER', default='postgres'),
+    password=env('DB_PASSWORD', default='Ehimare1'),
+    host=env('DB_HOST', default='localhost'),
+    port=env('DB_PORT', default='5432'),
+    name=env('DB_NAME', default='Church'),
+)
+
+# Persistent connections: keep each worker's connection open between requests
+# and ping it before reuse instead of reconnecting on every request.
+DB_CONN_MAX_AGE = env.int('DB_CONN_MAX_AGE', default=600)
+
+# Django 5.1+ connection pool (needs psycopg 3 with the pool extra, as pinned
+# in requirements.txt). Pooling replaces persistent connections, so
+# CONN_MAX_AGE is forced to 0 when it is on. Under ASGI, where Django closes
+# connections after every request, it is what keeps them open.
+DB_POOL = env.bool('DB_POOL', default=False)
+if DB_POOL:
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured(
+            'DB_POOL needs psycopg 3 with the pool extra: pip install "psycopg[binary,pool]"'
+        )
+DB_POOL_MIN_SIZE = env.int('DB_POOL_MIN_SIZE', default=2)
+DB_POOL_MAX_SIZE = env.int('DB_POOL_MAX_SIZE', default=10)
+DB_POOL_TIMEOUT = env.int('DB_POOL_TIMEOUT', default=10)
+
+
+def database_config(url_env, default=None):
+    """Build a DATABASES entry from a database URL environment variable"""
+    db = dj_database_url.config(
+        env=url_env,
+        default=default,
+        conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+        conn_health_checks=not DB_POOL,
+    )
+    if DB_POOL and db.get('ENGINE') == 'django.db.backends.postgresql':
+        db.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    return db
+
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'Church',
-        'USER': 'postgres',  # Change to your PostgreSQL username
-        'PASSWORD': 'Ehimare1',
-        'HOST': 'localhost',
-        'PORT': '5432',  # Default PostgreSQL port
+    'default': database_config('DATABASE_URL', default=DEFAULT_DATABASE_URL),
+}
+
+# Optional read replica. The read-only public views are routed to it by
+# church.routers.ReplicaRouter; everything else stays on the primary.
+if env('DATABASE_REPLICA_URL', default=''):
+    DATABASES['replica'] = database_config('DATABASE_REPLICA_URL')
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['church.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# 'default' is a small per-process LRU in front of the 'shared' backend, which
+# all gunicorn workers see: Redis when REDIS_URL is set, otherwise files on
+# local disk.
+REDIS_URL = env('REDIS_URL', default='')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('CACHE_DIR', default=str(BASE_DIR / '.django_cache')),
+        'OPTIONS': {'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', default=5000)},
     }
+SHARED_CACHE['TIMEOUT'] = env.int('CACHE_TIMEOUT', default=300)
+SHARED_CACHE['KEY_PREFIX'] = 'wopbic'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'church.cache.TieredCache',
+        'LOCATION': 'shared',
+        'TIMEOUT': env.int('CACHE_TIMEOUT', default=300),
+        'OPTIONS': {
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', default=500),
+            'LOCAL_TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT', default=30),
+            'STATS_PUBLISH_INTERVAL': 60,
+        },
+    },
+    'shared': SHARED_CACHE,
 }
 
 
@@ -147,6 +264,21 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Sermon audio processing (see church/audio.py)
+FFMPEG_BINARY = env('FFMPEG_BINARY', default='ffmpeg')
+AUDIO_PROCESS_IN_BACKGROUND = env.bool('AUDIO_PROCESS_IN_BACKGROUND', default=True)
+
+# Related sermons (see church/recommendations.py): updated in the background
+# when a sermon is saved; build_recommendations recomputes them all
+RECOMMENDATIONS_IN_BACKGROUND = env.bool('RECOMMENDATIONS_IN_BACKGROUND', default=True)
+
+# Prerendered anonymous pages (see church/snapshots.py and prerender_pages)
+SNAPSHOTS_ENABLED = env.bool('SNAPSHOTS_ENABLED', default=not DEBUG)
+SNAPSHOT_ROOT = env('SNAPSHOT_ROOT', default=str(BASE_DIR / 'snapshots'))
+
+# Offline Bible text (see church/bible.py), written by build_bible_store
+BIBLE_STORE_PATH = env('BIBLE_STORE_PATH', default=str(BASE_DIR / 'bible.bin'))
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -155,16 +287,19 @@ CRISPY_TEMPLATE_PACK = "bootstrap4"
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
-EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
-EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
-EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
-EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
-DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@wopbic.org')
+EMAIL_HOST = env('EMAIL_HOST', default='smtp.gmail.com')
+EMAIL_PORT = env.int('EMAIL_PORT', default=587)
+EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS', default=True)
+EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@wopbic.org')
 
 # Church specific settings
-CHURCH_EMAIL = config('CHURCH_EMAIL', default='info@wopbic.org')
-PASTOR_EMAIL = config('PASTOR_EMAIL', default='pastor@wopbic.org')
+CHURCH_EMAIL = env('CHURCH_EMAIL', default='info@wopbic.org')
+PASTOR_EMAIL = env('PASTOR_EMAIL', default='pastor@wopbic.org')
+
+# Public base URL, used for links in emails (e.g. newsletter unsubscribe)
+SITE_URL = env('SITE_URL', default='https://rest-api-4uud.onrender.com')
 
 # Bank Account Details
 CHURCH_BANK_DETAILS = {
@@ -174,18 +309,57 @@ CHURCH_BANK_DETAILS = {
 }
 
 # Google Maps API Key
-GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
+GOOGLE_MAPS_API_KEY = env('GOOGLE_MAPS_API_KEY', default='')
 
 # Church Location
 CHURCH_LOCATION = {
-    'LATITUDE': config('CHURCH_LATITUDE', default='6.5244', cast=float),
-    'LONGITUDE': config('CHURCH_LONGITUDE', default='3.3792', cast=float),
+    'LATITUDE': env.float('CHURCH_LATITUDE', default=6.5244),
+    'LONGITUDE': env.float('CHURCH_LONGITUDE', default=3.3792),
     'ADDRESS': '123 Prayer Street, Fire City, Lagos State, Nigeria',
 }
 
+# The church's own time zone. Event and service times are entered as wall-clock
+# times there; TIME_ZONE stays UTC for everything else.
+CHURCH_TIME_ZONE = env('CHURCH_TIME_ZONE', default='Africa/Lagos')
+
 # Session Configuration
+# Only staff signing in to the admin have sessions; the public pages never
+# read one. The cookie is scoped to /admin/, so visitors never send it to the
+# site (and staff get snapshots like everyone else), and flash messages after
+# a form post travel in their own signed cookie rather than the session.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    # Read from the shared cache, written through to the database
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    # Nothing stored server-side (a signed-out cookie stays valid until it expires)
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[env('SESSION_BACKEND', default='cached_db')]
+# Not 'default': its per-process tier could keep serving a session another
+# worker has just flushed on logout
+SESSION_CACHE_ALIAS = 'shared'
+SESSION_COOKIE_PATH = env('SESSION_COOKIE_PATH', default='/admin/')
 SESSION_COOKIE_AGE = 86400  # 1 day
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Answered prayer requests and replied messages older than this are moved to
+# the archive tables by archive_old_rows (see church/archive.py)
+ARCHIVE_AFTER_DAYS = env.int('ARCHIVE_AFTER_DAYS', default=180)
+
+# Days rows are kept before purge_expired deletes them (see church/retention.py);
+# 0 keeps them forever
+RETENTION_DAYS = {
+    'contact_messages': env.int('RETAIN_CONTACT_MESSAGES_DAYS', default=730),
+    'rejected_testimonies': env.int('RETAIN_REJECTED_TESTIMONIES_DAYS', default=90),
+    'rejected_donations': env.int('RETAIN_REJECTED_DONATIONS_DAYS', default=365),
+    'inactive_subscribers': env.int('RETAIN_INACTIVE_SUBSCRIBERS_DAYS', default=365),
+}
+
+# Live page (see church/live.py): minutes before a service it shows "starting
+# soon", and how often each process checks the status for its open streams
+LIVE_STARTING_SOON_MINUTES = env.int('LIVE_STARTING_SOON_MINUTES', default=30)
+LIVE_POLL_SECONDS = env.int('LIVE_POLL_SECONDS', default=2)
 
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
@@ -6,4 +6,9 @@ pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
 python manage.py migrate
-python manage.py setup_church
\ No newline at end of file
+if [ -n "${BIBLE_SOURCE:-}" ]; then
+    python manage.py build_bible_store "$BIBLE_SOURCE" --translation "${BIBLE_TRANSLATION:-}"
+fi
+python manage.py setup_church
+python manage.py prerender_pages
+python manage.py warm_cache
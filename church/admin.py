@@ -1,21 +1,85 @@
 # church/admin.py
+import csv
+import io
+
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
-from django.core.mail import send_mail
 from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorExact
+from django.db import connections
+from django.db.models import Q
+from django.utils.encoding import filepath_to_uri
+from urllib.parse import urljoin
 from .models import (
     PrayerRequest, Testimony, ContactMessage, Donation, Event,
-    Ministry, Sermon, BibleVerse, Newsletter, ChurchSettings
+    Ministry, Sermon, BibleVerse, Newsletter, ChurchSettings,
+    Campaign, ArchivedPrayerRequest, ArchivedContactMessage, LiveStatus, SermonSeries
+)
+from . import bible, snapshots
+from .archive import restore
+from .paginators import EstimatedCountPaginator
+from .scripture import format_range
+from .reconciliation import (
+    DEFAULT_WINDOW_DAYS, MAX_ADMIN_LINES, StatementError, reconcile_statement, verification_email
 )
 
 
+class PerformanceModeAdmin(admin.ModelAdmin):
+    """
+    Changelist tuned for tables that only grow (prayer requests, messages,
+    donations): estimated page counts, no second COUNT(*) for filtered
+    results, a narrow column projection, and indexed prefix / full-text
+    search instead of icontains scans.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Columns loaded on the changelist; large text columns are left out
+    changelist_fields = ()
+    # TextFields searched with PostgreSQL full-text search (icontains elsewhere)
+    fulltext_search_fields = ()
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        opts = self.model._meta
+        match = request.resolver_match
+        if (self.changelist_fields and match and
+                match.url_name == f'{opts.app_label}_{opts.model_name}_changelist'):
+            queryset = queryset.only(*self.changelist_fields)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term and self.fulltext_search_fields:
+            results = results | queryset.filter(self.fulltext_condition(queryset, search_term))
+        return results, may_have_duplicates
+
+    def fulltext_condition(self, queryset, search_term):
+        condition = Q()
+        if connections[queryset.db].vendor == 'postgresql':
+            # Matches the GIN expression indexes created in migration 0003
+            query = SearchQuery(search_term, config='english', search_type='websearch')
+            for field in self.fulltext_search_fields:
+                condition |= Q(SearchVectorExact(SearchVector(field, config='english'), query))
+        else:
+            for field in self.fulltext_search_fields:
+                condition |= Q(**{f'{field}__icontains': search_term})
+        return condition
+
+
 @admin.register(PrayerRequest)
-class PrayerRequestAdmin(admin.ModelAdmin):
+class PrayerRequestAdmin(PerformanceModeAdmin):
     list_display = ('name', 'email', 'privacy', 'status', 'created_at')
     list_filter = ('privacy', 'status', 'created_at')
-    search_fields = ('name', 'email', 'request_text')
+    search_fields = ('^name', '^email')
+    fulltext_search_fields = ('request_text',)
+    changelist_fields = ('name', 'email', 'privacy', 'status', 'created_at')
     readonly_fields = ('created_at', 'updated_at')
     list_per_page = 20
     
@@ -92,10 +156,12 @@ class TestimonyAdmin(admin.ModelAdmin):
 
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(PerformanceModeAdmin):
     list_display = ('name', 'email', 'subject', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('name', 'email', 'subject', 'message')
+    search_fields = ('^name', '^email', '^subject')
+    fulltext_search_fields = ('message',)
+    changelist_fields = ('name', 'email', 'subject', 'status', 'created_at')
     readonly_fields = ('created_at',)
     list_per_page = 20
     
@@ -128,11 +194,61 @@ class ContactMessageAdmin(admin.ModelAdmin):
     mark_as_replied.short_description = "Mark selected messages as replied"
 
 
+class ArchiveAdmin(PerformanceModeAdmin):
+    """Read-only changelist over an archive table (see church/archive.py)"""
+    list_filter = ('created_at', 'archived_at')
+    actions = ['restore_rows']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def restore_rows(self, request, queryset):
+        restored = restore(self.model, queryset)
+        self.message_user(request, f'{restored} rows moved back out of the archive.')
+    restore_rows.short_description = "Move selected rows back out of the archive"
+    restore_rows.allowed_permissions = ('delete',)
+
+
+@admin.register(ArchivedPrayerRequest)
+class ArchivedPrayerRequestAdmin(ArchiveAdmin):
+    list_display = ('name', 'email', 'privacy', 'status', 'created_at', 'archived_at')
+    search_fields = ('^name', '^email')
+    fulltext_search_fields = ('request_text',)
+    changelist_fields = ('name', 'email', 'privacy', 'status', 'created_at', 'archived_at')
+    list_per_page = 20
+
+
+@admin.register(ArchivedContactMessage)
+class ArchivedContactMessageAdmin(ArchiveAdmin):
+    list_display = ('name', 'email', 'subject', 'status', 'created_at', 'archived_at')
+    search_fields = ('^name', '^email', '^subject')
+    fulltext_search_fields = ('message',)
+    changelist_fields = ('name', 'email', 'subject', 'status', 'created_at', 'archived_at')
+    list_per_page = 20
+
+
+class StatementUploadForm(forms.Form):
+    statement = forms.FileField(
+        help_text=f'CSV export of the account statement from online banking, at most {MAX_ADMIN_LINES:,} lines',
+    )
+    window_days = forms.IntegerField(
+        min_value=0, max_value=31, initial=DEFAULT_WINDOW_DAYS,
+        help_text='Days either side of a credit to look for a donation of the same amount',
+    )
+    notify = forms.BooleanField(required=False, initial=True, help_text='Email donors whose donation is verified')
+
+
 @admin.register(Donation)
-class DonationAdmin(admin.ModelAdmin):
+class DonationAdmin(PerformanceModeAdmin):
     list_display = ('donor_name', 'amount', 'donation_type', 'status', 'created_at', 'receipt_link')
     list_filter = ('donation_type', 'status', 'created_at')
-    search_fields = ('donor_name', 'donor_email', 'transaction_reference')
+    search_fields = ('^donor_name', '^donor_email', '^transaction_reference')
+    # Includes the fields the verify action's email needs
+    changelist_fields = ('donor_name', 'donor_email', 'amount', 'donation_type', 'status',
+                         'created_at', 'verified_at', 'transaction_reference', 'receipt_image')
     readonly_fields = ('created_at', 'verified_at', 'receipt_preview')
     list_per_page = 20
     
@@ -156,10 +272,46 @@ class DonationAdmin(admin.ModelAdmin):
     )
     
     actions = ['verify_donations', 'reject_donations']
+
+    def get_urls(self):
+        return [
+            path('reconcile/', self.admin_site.admin_view(self.reconcile_view), name='church_donation_reconcile'),
+        ] + super().get_urls()
+
+    def reconcile_view(self, request):
+        """Upload a bank statement and verify the pending donations it pays"""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = StatementUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            statement = io.TextIOWrapper(form.cleaned_data['statement'].file, encoding='utf-8-sig', newline='')
+            try:
+                result = reconcile_statement(
+                    statement,
+                    window_days=form.cleaned_data['window_days'],
+                    notify=form.cleaned_data['notify'],
+                    # Not within the request: a slow SMTP server would hit the worker timeout
+                    notify_in_background=True,
+                    max_lines=MAX_ADMIN_LINES,
+                )
+            except (StatementError, UnicodeDecodeError, csv.Error) as e:
+                form.add_error('statement', f'Could not read the statement: {e}')
+            else:
+                self.message_user(request, f'{result.summary()}, {result.emails_queued} donors being emailed.')
+                return redirect('admin:church_donation_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Reconcile bank statement',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/church/donation/reconcile.html', context)
     
     def receipt_link(self, obj):
         if obj.receipt_image:
-            return format_html('<a href="{}" target="_blank">View Receipt</a>', obj.receipt_image.url)
+            # Build the URL directly instead of asking the storage for every row
+            url = urljoin(settings.MEDIA_URL, filepath_to_uri(obj.receipt_image.name))
+            return format_html('<a href="{}" target="_blank">View Receipt</a>', url)
         return "No receipt"
     receipt_link.short_description = "Receipt"
     
@@ -180,29 +332,7 @@ class DonationAdmin(admin.ModelAdmin):
                 
                 # Send verification email to donor
                 try:
-                    send_mail(
-                        'Donation Verified - WOPBIC',
-                        f'''
-                        Dear {donation.donor_name},
-                        
-                        Your donation has been verified and received.
-                        
-                        Donation Details:
-                        Type: {donation.get_donation_type_display()}
-                        Amount: ₦{donation.amount:,.2f}
-                        Reference: {donation.transaction_reference}
-                        Verified on: {donation.verified_at.strftime('%Y-%m-%d')}
-                        
-                        Thank you for your generous support to the work of God's kingdom.
-                        
-                        May God bless you abundantly!
-                        
-                        WOPBIC Finance Team
-                        ''',
-                        settings.DEFAULT_FROM_EMAIL,
-                        [donation.donor_email],
-                        fail_silently=True,
-                    )
+                    verification_email(donation).send(fail_silently=True)
                 except Exception as e:
                     print(f"Verification email failed: {e}")
         
@@ -274,19 +404,23 @@ class MinistryAdmin(admin.ModelAdmin):
 @admin.register(Sermon)
 class SermonAdmin(admin.ModelAdmin):
     list_display = ('title', 'preacher', 'scripture_reference', 'date_preached', 'is_featured', 'download_count')
-    list_filter = ('is_featured', 'date_preached', 'series')
+    list_filter = ('is_featured', 'date_preached', 'sermon_series')
     search_fields = ('title', 'preacher', 'scripture_reference', 'summary')
-    readonly_fields = ('download_count',)
+    readonly_fields = ('download_count', 'audio_status', 'audio_low', 'audio_duration_display', 'audio_loudness', 'passages')
     date_hierarchy = 'date_preached'
     list_per_page = 20
     
     fieldsets = (
         ('Sermon Information', {
-            'fields': ('title', 'preacher', 'scripture_reference', 'summary', 'series')
+            'fields': ('title', 'preacher', 'scripture_reference', 'passages', 'summary', 'series')
         }),
         ('Media', {
             'fields': ('audio_file', 'video_url')
         }),
+        ('Audio Processing', {
+            'fields': ('audio_status', 'audio_low', 'audio_duration_display', 'audio_loudness'),
+            'classes': ('collapse',)
+        }),
         ('Details', {
             'fields': ('date_preached', 'is_featured', 'download_count')
         })
@@ -294,13 +428,62 @@ class SermonAdmin(admin.ModelAdmin):
     
     actions = ['feature_sermons']
     
+    def audio_duration_display(self, obj):
+        if obj.audio_duration is None:
+            return "-"
+        minutes, seconds = divmod(int(obj.audio_duration), 60)
+        return f"{minutes}:{seconds:02d}"
+    audio_duration_display.short_description = "Duration"
+    
+    def passages(self, obj):
+        # What the scripture index read the reference as; "-" means it could not be read
+        ranges = obj.scripture_ranges.values_list('start', 'end') if obj.pk else []
+        return ', '.join(format_range(start, end) for start, end in ranges) or "-"
+    passages.short_description = "Indexed as"
+    
     def feature_sermons(self, request, queryset):
         updated = queryset.update(is_featured=True)
         self.message_user(request, f'{updated} sermons marked as featured.')
     feature_sermons.short_description = "Feature selected sermons"
 
+
+@admin.register(SermonSeries)
+class SermonSeriesAdmin(admin.ModelAdmin):
+    list_display = ('name', 'sermon_count', 'first_preached', 'last_preached', 'cover_sermon')
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+    fields = ('name', 'slug', 'description', 'sermon_count', 'first_preached', 'last_preached', 'cover_sermon')
+    readonly_fields = ('sermon_count', 'first_preached', 'last_preached', 'cover_sermon')
+    list_select_related = ('cover_sermon',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'name' in form.changed_data:
+            # Sermons name their series; keep them pointing at this one
+            sermons = Sermon.objects.filter(sermon_series=obj)
+            sermons.update(series=obj.name)
+            # update() sends no signals, so refresh the pages showing the name here
+            pks = list(sermons.values_list('pk', flat=True))
+            snapshots.refresh_after_commit(snapshots.page_paths('sermons') + snapshots.sermon_paths(pks))
+
+class BibleVerseForm(forms.ModelForm):
+    class Meta:
+        model = BibleVerse
+        fields = '__all__'
+        help_texts = {'verse_text': 'Leave blank to fill it in from the offline Bible'}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('verse_text') and cleaned_data.get('reference'):
+            cleaned_data['verse_text'] = bible.passage_text(cleaned_data['reference'])
+            if not cleaned_data['verse_text']:
+                self.add_error('verse_text', 'Enter the verse text: the offline Bible does not have this reference.')
+        return cleaned_data
+
+
 @admin.register(BibleVerse)
 class BibleVerseAdmin(admin.ModelAdmin):
+    form = BibleVerseForm
     list_display = ('reference', 'verse_preview', 'is_active', 'created_at')
     list_filter = ('is_active', 'created_at')
     search_fields = ('reference', 'verse_text')
@@ -326,10 +509,10 @@ class BibleVerseAdmin(admin.ModelAdmin):
 
 @admin.register(Newsletter)
 class NewsletterAdmin(admin.ModelAdmin):
-    list_display = ('email', 'subscribed_at', 'is_active')
+    list_display = ('email', 'subscribed_at', 'is_active', 'unsubscribed_at')
     list_filter = ('is_active', 'subscribed_at')
     search_fields = ('email',)
-    readonly_fields = ('subscribed_at',)
+    readonly_fields = ('subscribed_at', 'unsubscribed_at')
     list_per_page = 50
     
     actions = ['export_emails', 'deactivate_subscriptions']
@@ -341,11 +524,50 @@ class NewsletterAdmin(admin.ModelAdmin):
     export_emails.short_description = "Export selected email addresses"
     
     def deactivate_subscriptions(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        from django.utils import timezone
+
+        updated = queryset.filter(is_active=True).update(is_active=False, unsubscribed_at=timezone.now())
         self.message_user(request, f'{updated} subscriptions deactivated.')
     deactivate_subscriptions.short_description = "Deactivate selected subscriptions"
 
 
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'total_recipients', 'sent_count', 'failed_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = ('status', 'created_at', 'queued_at', 'started_at', 'finished_at',
+                       'total_recipients', 'sent_count', 'failed_count')
+    list_per_page = 20
+
+    fieldsets = (
+        ('Message', {
+            'fields': ('subject', 'body_html', 'body_text')
+        }),
+        ('Delivery', {
+            'fields': ('status', 'total_recipients', 'sent_count', 'failed_count')
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'queued_at', 'started_at', 'finished_at'),
+            'classes': ('collapse',)
+        })
+    )
+
+    actions = ['queue_campaigns', 'pause_campaigns']
+
+    def queue_campaigns(self, request, queryset):
+        from django.utils import timezone
+
+        updated = queryset.filter(status__in=['draft', 'paused']).update(status='queued', queued_at=timezone.now())
+        self.message_user(request, f'{updated} campaigns queued. They will be sent by the send_campaigns worker.')
+    queue_campaigns.short_description = "Send selected campaigns"
+
+    def pause_campaigns(self, request, queryset):
+        updated = queryset.filter(status__in=['queued', 'sending']).update(status='paused')
+        self.message_user(request, f'{updated} campaigns paused.')
+    pause_campaigns.short_description = "Pause selected campaigns"
+
+
 @admin.register(ChurchSettings)
 class ChurchSettingsAdmin(admin.ModelAdmin):
     fieldsets = (
@@ -369,4 +591,19 @@ class ChurchSettingsAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         # Prevent deletion
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(LiveStatus)
+class LiveStatusAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'is_live', 'title', 'started_at', 'updated_at']
+    list_editable = ['is_live']
+    fields = ['is_live', 'title', 'stream_url', 'started_at']
+    readonly_fields = ['started_at']
+
+    def has_add_permission(self, request):
+        # Only allow one instance
+        return not LiveStatus.objects.exists()
+
+    def has_delete_permission(self, request, obj=None):
+        return False
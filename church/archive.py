@@ -0,0 +1,104 @@
+# church/archive.py
+"""
+Hot/cold split for the tables that only grow.
+
+Answered prayer requests and replied contact messages older than
+ARCHIVE_AFTER_DAYS are hardly ever read again, but every public page and
+admin changelist over PrayerRequest and ContactMessage has to step over
+them. archive_old_rows moves them in batches into ArchivedPrayerRequest and
+ArchivedContactMessage (same columns and ids), so the hot tables and their
+indexes stay small; the admin lists the archives separately and can move
+rows back.
+"""
+import datetime
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedContactMessage, ArchivedPrayerRequest, ContactMessage, PrayerRequest
+
+
+# name -> (hot model, archive model, rows that may be archived once old)
+ARCHIVES = {
+    'prayer_requests': (PrayerRequest, ArchivedPrayerRequest, Q(status='answered')),
+    'contact_messages': (ContactMessage, ArchivedContactMessage, Q(status='replied')),
+}
+
+BATCH_SIZE = 1000
+
+
+def copied_fields(archive_model):
+    return [field.attname for field in archive_model._meta.concrete_fields if field.name != 'archived_at']
+
+
+def _move(rows, target_model, fields):
+    copies = [target_model(**{name: getattr(row, name) for name in fields}) for row in rows]
+    target_model.objects.bulk_create(copies)
+    stamped = [
+        field.attname for field in target_model._meta.concrete_fields
+        if field.attname in fields and (getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False))
+    ]
+    if stamped:
+        # bulk_create() set these to the current time; put the originals back
+        for copy, row in zip(copies, rows):
+            for name in stamped:
+                setattr(copy, name, getattr(row, name))
+        target_model.objects.bulk_update(copies, stamped)
+    type(rows[0]).objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+
+def archivable(name, cutoff):
+    """Rows of ARCHIVES[name] created before cutoff that may be archived"""
+    model, archive_model, condition = ARCHIVES[name]
+    return model.objects.filter(condition, created_at__lt=cutoff)
+
+
+def archive_rows(name, cutoff, batch_size=BATCH_SIZE, log=None):
+    """Move the archivable rows of ARCHIVES[name] in batches; returns the number moved"""
+    model, archive_model, condition = ARCHIVES[name]
+    fields = copied_fields(archive_model)
+    moved = 0
+    while True:
+        # Each batch is copied and deleted in one transaction, so a run that
+        # stops half way leaves every row in exactly one table
+        with transaction.atomic(using=router.db_for_write(model)):
+            rows = list(
+                archivable(name, cutoff).order_by('pk').select_for_update()[:batch_size]
+            )
+            if not rows:
+                break
+            _move(rows, archive_model, fields)
+        moved += len(rows)
+        if log:
+            log(moved)
+    if moved:
+        vacuum(model)
+    return moved
+
+
+def restore(archive_model, queryset):
+    """Move archived rows back to their hot table; returns the number moved"""
+    model = next(hot for hot, archive, condition in ARCHIVES.values() if archive is archive_model)
+    fields = copied_fields(archive_model)
+    with transaction.atomic(using=router.db_for_write(model)):
+        rows = list(queryset.select_for_update())
+        for i in range(0, len(rows), BATCH_SIZE):
+            _move(rows[i:i + BATCH_SIZE], model, fields)
+    return len(rows)
+
+
+def vacuum(model):
+    """Let PostgreSQL reuse the space of the moved rows and refresh the planner's statistics"""
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor != 'postgresql' or connection.in_atomic_block:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'VACUUM (ANALYZE) {connection.ops.quote_name(model._meta.db_table)}')
+    except Exception as e:
+        print(f"Vacuum of {model._meta.db_table} failed: {e}")
+
+
+def default_cutoff(days):
+    return timezone.now() - datetime.timedelta(days=days)
@@ -0,0 +1,194 @@
+# church/audio.py
+"""
+Sermon audio processing.
+
+Runs outside the request that uploaded the file: decodes the upload once
+with ffmpeg into 8 kHz mono PCM, streams it through NumPy to get the
+duration, RMS loudness and waveform peaks, and encodes a low-bitrate mono MP3
+for listeners on slow connections.
+"""
+import os
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import Sermon
+
+
+ANALYSIS_SAMPLE_RATE = 8000
+# Samples per fine-grained peak bucket (50 ms at 8 kHz)
+BUCKET_SAMPLES = 400
+# Number of points stored for the waveform display
+PEAK_POINTS = 1000
+READ_BUCKETS = 2048
+
+LOW_BITRATE = '48k'
+LOW_SAMPLE_RATE = 22050
+
+# ECT client hint values that get the low-bitrate variant
+SLOW_CONNECTION_TYPES = ('slow-2g', '2g', '3g')
+
+
+class AudioProcessingError(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    return getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+
+def analyse(path):
+    """Return (duration, loudness, peaks) for an audio file"""
+    import numpy as np
+
+    command = [
+        ffmpeg_binary(), '-v', 'error', '-i', path,
+        '-ac', '1', '-ar', str(ANALYSIS_SAMPLE_RATE), '-f', 's16le', '-',
+    ]
+    # stderr goes to a file, not a pipe: a corrupt upload can log a line per
+    # bad frame, and a full stderr pipe would stall ffmpeg while we wait on stdout
+    with tempfile.TemporaryFile() as errors:
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        except OSError as e:
+            raise AudioProcessingError(f'Could not run ffmpeg: {e}')
+        with process:
+            samples = read_samples(process.stdout)
+            status = process.wait()
+        if status != 0:
+            errors.seek(0)
+            raise AudioProcessingError(errors.read(4096).decode(errors='replace').strip()[:255] or 'ffmpeg failed')
+    total_samples, sum_squares, bucket_peaks = samples
+    if not total_samples:
+        raise AudioProcessingError('No audio could be decoded')
+
+    duration = total_samples / ANALYSIS_SAMPLE_RATE
+    rms = (sum_squares / total_samples) ** 0.5 / 32768.0
+    loudness = float(20 * np.log10(rms)) if rms > 0 else None
+    peaks = downsample_peaks(np.concatenate(bucket_peaks), PEAK_POINTS)
+    return duration, loudness, peaks
+
+
+def read_samples(stdout):
+    """(sample count, sum of squares, per-bucket peaks) of 16-bit mono PCM read from stdout"""
+    import numpy as np
+
+    chunk_bytes = BUCKET_SAMPLES * READ_BUCKETS * 2
+    bucket_peaks = []
+    total_samples = 0
+    sum_squares = 0.0
+    leftover = b''
+    while True:
+        data = stdout.read(chunk_bytes)
+        if not data:
+            break
+        data = leftover + data
+        usable = len(data) - len(data) % 2
+        leftover = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32)
+        total_samples += samples.size
+        sum_squares += float(np.dot(samples, samples))
+        bucket_peaks.append(bucket_max(np.abs(samples), BUCKET_SAMPLES))
+    return total_samples, sum_squares, bucket_peaks
+
+
+def bucket_max(values, size):
+    """Max of every run of `size` values (the last run may be shorter)"""
+    import numpy as np
+
+    padding = -values.size % size
+    if padding:
+        values = np.concatenate([values, np.zeros(padding, dtype=values.dtype)])
+    return values.reshape(-1, size).max(axis=1)
+
+
+def downsample_peaks(peaks, points):
+    """Reduce an array of peaks to at most `points` values scaled to 0..1"""
+    import numpy as np
+
+    if peaks.size > points:
+        peaks = bucket_max(peaks, -(-peaks.size // points))
+    top = peaks.max() if peaks.size else 0
+    if top > 0:
+        peaks = peaks / top
+    return np.round(peaks.astype(np.float64), 3).tolist()
+
+
+def encode_low_bitrate(path, output_path):
+    command = [
+        ffmpeg_binary(), '-v', 'error', '-y', '-i', path, '-vn',
+        '-ac', '1', '-ar', str(LOW_SAMPLE_RATE),
+        '-codec:a', 'libmp3lame', '-b:a', LOW_BITRATE, output_path,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True)
+    except OSError as e:
+        raise AudioProcessingError(f'Could not run ffmpeg: {e}')
+    if result.returncode != 0:
+        raise AudioProcessingError(result.stderr.decode(errors='replace').strip()[:255] or 'ffmpeg failed')
+
+
+def process_sermon_audio(sermon_id):
+    """Analyse a sermon's audio and build its low-bitrate variant"""
+    sermon = Sermon.objects.filter(pk=sermon_id).first()
+    if sermon is None or not sermon.audio_file:
+        return False
+    source_name = sermon.audio_file.name
+    # .update() rather than .save() so the post_save handlers do not fire again
+    sermons = Sermon.objects.filter(pk=sermon_id, audio_file=source_name)
+
+    try:
+        path = sermon.audio_file.path
+        duration, loudness, peaks = analyse(path)
+
+        base = os.path.splitext(os.path.basename(source_name))[0]
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, f'{base}-low.mp3')
+            encode_low_bitrate(path, output_path)
+            with open(output_path, 'rb') as f:
+                low_name = default_storage.save(f'sermons/audio/low/{base}-low.mp3', File(f))
+    except (AudioProcessingError, OSError, NotImplementedError) as e:
+        print(f"Audio processing for sermon {sermon_id} failed: {e}")
+        sermons.update(audio_status='failed', audio_processed_name=source_name)
+        return False
+
+    if sermon.audio_low and sermon.audio_low.name != low_name:
+        sermon.audio_low.delete(save=False)
+    updated = sermons.update(
+        audio_status='done',
+        audio_processed_name=source_name,
+        audio_low=low_name,
+        audio_duration=duration,
+        audio_loudness=loudness,
+        audio_peaks=peaks,
+    )
+    if not updated:
+        # The audio was replaced while we were working; drop our output
+        default_storage.delete(low_name)
+    return bool(updated)
+
+
+def needs_processing(sermon):
+    return bool(sermon.audio_file) and sermon.audio_file.name != sermon.audio_processed_name
+
+
+def prefers_low_bitrate(request):
+    """Low-bitrate audio for ?quality=low, Save-Data or a slow ECT client hint"""
+    quality = request.GET.get('quality')
+    if quality:
+        return quality == 'low'
+    if request.headers.get('Save-Data', '').lower() == 'on':
+        return True
+    return request.headers.get('ECT', '').lower() in SLOW_CONNECTION_TYPES
+
+
+def audio_url_for(request, sermon):
+    """URL of the audio variant to serve for this request"""
+    if sermon.audio_low and prefers_low_bitrate(request):
+        return sermon.audio_low.url
+    if sermon.audio_file:
+        return sermon.audio_file.url
+    return None
@@ -0,0 +1,230 @@
+# church/bible.py
+"""
+Offline Bible text, memory-mapped.
+
+build_bible_store packs a public-domain translation into one binary file at
+BIBLE_STORE_PATH:
+
+    header    magic, format version, number of verse slots, translation name
+    chapters  (first slot, verse count) for every book and chapter, at
+              book * MAX_CHAPTERS + chapter, so no search is needed
+    offsets   slots + 1 byte offsets into the text (verse n of a chapter is
+              slot first + n - 1; verses a translation omits are empty)
+    text      every verse, UTF-8, back to back
+
+Each process maps the file read-only, so the text lives once in the OS page
+cache however many gunicorn workers there are, and a verse is three
+struct.unpack_from calls: no rows, no queries, nothing loaded per worker.
+Without a store the site shows BibleVerse rows and references as before.
+"""
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+from django.conf import settings
+
+from . import scripture
+from .models import BibleVerse
+
+
+MAGIC = b'WBIB'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxI32s')
+# Psalms has 150 chapters; slot 0 of each book is unused
+MAX_CHAPTERS = 151
+CHAPTER = struct.Struct('<II')
+OFFSET = struct.Struct('<I')
+CHAPTERS_AT = HEADER.size
+OFFSETS_AT = CHAPTERS_AT + (len(scripture.BOOKS) + 1) * MAX_CHAPTERS * CHAPTER.size
+
+# Most verses shown for one passage (a sermon's reference may be whole chapters)
+MAX_VERSES = 40
+# How often a process checks whether the file was rebuilt
+RELOAD_CHECK_SECONDS = 60
+
+# Verses of the day when no BibleVerse is active
+DAILY_REFERENCES = [
+    'John 3:16', 'Jeremiah 29:11', 'Philippians 4:13', 'Romans 8:28', 'Proverbs 3:5-6', 'Isaiah 40:31',
+    'Psalm 23:1', 'Joshua 1:9', 'Matthew 11:28', 'Psalm 46:1', '2 Corinthians 5:17', 'Galatians 5:22-23',
+    'Romans 12:2', 'Philippians 4:6-7', 'Isaiah 41:10', 'Psalm 119:105', 'Hebrews 11:1', 'Matthew 6:33',
+    '1 Corinthians 13:4', 'Lamentations 3:22-23', 'Psalm 27:1', 'Ephesians 2:8', 'John 14:6', 'Psalm 37:4',
+    'Romans 15:13', 'Micah 6:8', '1 Peter 5:7', 'James 1:5', 'Psalm 121:1-2', 'John 16:33', 'Deuteronomy 31:6',
+]
+
+LINE = re.compile(r'^(?P<book>.+?)\s+(?P<chapter>\d+):(?P<verse>\d+)\s+(?P<text>.+)$')
+
+
+def read_source(path):
+    """
+    (book, chapter, verse, text) for each verse of a source file: tab-separated
+    book, chapter, verse and text, or "Genesis 1:1 In the beginning..." lines.
+    Books may be names, aliases or numbers 1-66; blank and # lines are skipped.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) >= 4:
+                book, chapter, verse, text = fields[0], fields[1], fields[2], '\t'.join(fields[3:])
+                if not (chapter.strip().isdigit() and verse.strip().isdigit()):
+                    # A header row
+                    continue
+            else:
+                match = LINE.match(line)
+                if match is None:
+                    raise ValueError(f'line {number}: expected "book chapter:verse text"')
+                book, chapter, verse, text = match.group('book', 'chapter', 'verse', 'text')
+            name = book.strip()
+            book = int(name) if name.isdigit() else scripture.book_number(name)
+            if book not in scripture.BOOK_NAMES:
+                raise ValueError(f'line {number}: unknown book {name!r}')
+            chapter, verse = int(chapter), int(verse)
+            if not 1 <= chapter < MAX_CHAPTERS or not 1 <= verse <= scripture.LAST:
+                raise ValueError(f'line {number}: no verse {chapter}:{verse}')
+            yield book, chapter, verse, ' '.join(text.split())
+
+
+def build(verses, path, translation=''):
+    """Write the store for (book, chapter, verse, text) tuples; returns the number of verses"""
+    chapters = {}
+    for book, chapter, verse, text in verses:
+        chapters.setdefault((book, chapter), {})[verse] = text.encode('utf-8')
+
+    table = bytearray((OFFSETS_AT - CHAPTERS_AT))
+    offsets = [0]
+    texts = []
+    size = 0
+    for (book, chapter), chapter_verses in sorted(chapters.items()):
+        count = max(chapter_verses)
+        CHAPTER.pack_into(table, (book * MAX_CHAPTERS + chapter) * CHAPTER.size, len(offsets) - 1, count)
+        for verse in range(1, count + 1):
+            text = chapter_verses.get(verse, b'')
+            texts.append(text)
+            size += len(text)
+            offsets.append(size)
+
+    slots = len(offsets) - 1
+    temporary = f'{path}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, slots, translation.encode('utf-8')[:32]))
+        f.write(table)
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.writelines(texts)
+    # Processes that still map the old file keep reading it until they reopen
+    os.replace(temporary, path)
+    return sum(len(chapter_verses) for chapter_verses in chapters.values())
+
+
+class BibleStore:
+    """A store file mapped read-only"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, translation = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f'{path} is not a version {VERSION} Bible store')
+        self.translation = translation.rstrip(b'\0').decode('utf-8')
+        self.text_at = OFFSETS_AT + (self.slots + 1) * OFFSET.size
+
+    def chapter(self, book, chapter):
+        """(first slot, verse count) of a chapter; (0, 0) if the translation lacks it"""
+        if not (1 <= book <= len(scripture.BOOKS) and 1 <= chapter < MAX_CHAPTERS):
+            return 0, 0
+        return CHAPTER.unpack_from(self.data, CHAPTERS_AT + (book * MAX_CHAPTERS + chapter) * CHAPTER.size)
+
+    def _slot_text(self, slot):
+        start, end = struct.unpack_from('<II', self.data, OFFSETS_AT + slot * OFFSET.size)
+        return self.data[self.text_at + start:self.text_at + end].decode('utf-8')
+
+    def verse(self, book, chapter, verse):
+        """The text of one verse, or None"""
+        first, count = self.chapter(book, chapter)
+        if not 1 <= verse <= count:
+            return None
+        return self._slot_text(first + verse - 1) or None
+
+    def verses(self, start, end, limit=MAX_VERSES):
+        """[(verse id, text), ...] for an inclusive range of verse ids, at most limit of them"""
+        book, first_chapter, first_verse = scripture.split_id(start)
+        _, last_chapter, last_verse = scripture.split_id(end)
+        found = []
+        for chapter in range(max(first_chapter, 1), min(last_chapter, MAX_CHAPTERS - 1) + 1):
+            first, count = self.chapter(book, chapter)
+            begin = first_verse if chapter == first_chapter else 1
+            stop = min(count, last_verse) if chapter == last_chapter else count
+            for number in range(max(begin, 1), stop + 1):
+                text = self._slot_text(first + number - 1)
+                if text:
+                    found.append((scripture.verse_id(book, chapter, number), text))
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def close(self):
+        self.data.close()
+
+
+_store = None
+_checked_at = 0
+_lock = threading.Lock()
+
+
+def get_store():
+    """This process's BibleStore, reopened after a rebuild; None if there is no store file"""
+    global _store, _checked_at
+    now = time.monotonic()
+    if _store is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return _store
+    with _lock:
+        _checked_at = now
+        path = settings.BIBLE_STORE_PATH
+        try:
+            stat = os.stat(path)
+        except OSError:
+            _store = None
+            return None
+        if _store is None or (stat.st_ino, stat.st_mtime_ns) != (_store.stat.st_ino, _store.stat.st_mtime_ns):
+            try:
+                _store = BibleStore(path)
+            except (OSError, ValueError) as e:
+                print(f"Opening Bible store failed: {e}")
+                _store = None
+        return _store
+
+
+def passage(reference, limit=MAX_VERSES):
+    """[{'reference': 'John 3:16', 'text': ...}, ...] for a reference (text or ranges); [] without a store"""
+    store = get_store()
+    if store is None:
+        return []
+    ranges = scripture.parse(reference) if isinstance(reference, str) else reference
+    found = []
+    for start, end in ranges:
+        for verse_id, text in store.verses(start, end, limit - len(found)):
+            found.append({'reference': scripture.format_range(verse_id, verse_id), 'text': text})
+        if len(found) >= limit:
+            break
+    return found
+
+
+def passage_text(reference, limit=MAX_VERSES):
+    """The verses of a reference as one string, '' if unknown"""
+    return ' '.join(verse['text'] for verse in passage(reference, limit))
+
+
+def daily_verse(date):
+    """An unsaved BibleVerse for date from DAILY_REFERENCES, or None without a store"""
+    reference = DAILY_REFERENCES[date.toordinal() % len(DAILY_REFERENCES)]
+    text = passage_text(reference)
+    if not text:
+        return None
+    return BibleVerse(verse_text=text, reference=reference)
@@ -0,0 +1,276 @@
+# church/cache.py
+"""
+Two-tier cache backend.
+
+A small in-process LRU sits in front of a shared backend (file-based cache or
+Redis) so hot keys are served without a round trip, while every gunicorn
+worker still sees the same data. Local entries only live for LOCAL_TIMEOUT
+seconds, which bounds how stale a worker can be after another worker deletes
+or replaces a key.
+
+Configure it in settings.CACHES:
+
+    'default': {
+        'BACKEND': 'church.cache.TieredCache',
+        'LOCATION': 'shared',            # alias of the shared cache
+        'OPTIONS': {'LOCAL_MAX_ENTRIES': 500, 'LOCAL_TIMEOUT': 30},
+    }
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+# Values written by get_or_compute() carry their soft expiry and how long they
+# took to build, so readers can recompute early instead of all at once.
+_Entry = namedtuple('_Entry', ['value', 'expires', 'delta'])
+
+_MISSING = object()
+
+STATS_KEY_PREFIX = 'tiered-cache:stats:'
+STATS_FIELDS = ('local_hits', 'shared_hits', 'misses', 'sets', 'recomputes', 'lock_waits')
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters, periodically published to the shared tier"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(STATS_FIELDS, 0)
+        self._unpublished = dict.fromkeys(STATS_FIELDS, 0)
+        self._last_publish = time.monotonic()
+
+    def incr(self, field):
+        with self._lock:
+            self._counts[field] += 1
+            self._unpublished[field] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def publish(self, shared, interval):
+        """Add the counts gathered since the last publish to the shared totals"""
+        with self._lock:
+            if time.monotonic() - self._last_publish < interval:
+                return
+            pending = {k: v for k, v in self._unpublished.items() if v}
+            self._unpublished = dict.fromkeys(STATS_FIELDS, 0)
+            self._last_publish = time.monotonic()
+        for field, count in pending.items():
+            key = STATS_KEY_PREFIX + field
+            try:
+                shared.add(key, 0, timeout=None)
+                shared.incr(key, count)
+            except Exception:
+                # Stats are best effort; never fail a request because of them
+                pass
+
+
+def published_stats(shared_alias='shared'):
+    """Return the cache statistics aggregated over all processes"""
+    shared = caches[shared_alias]
+    values = shared.get_many([STATS_KEY_PREFIX + f for f in STATS_FIELDS])
+    stats = {f: values.get(STATS_KEY_PREFIX + f, 0) for f in STATS_FIELDS}
+    lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_ratio'] = (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+    return stats
+
+
+def reset_published_stats(shared_alias='shared'):
+    caches[shared_alias].delete_many([STATS_KEY_PREFIX + f for f in STATS_FIELDS])
+
+
+# Django builds a backend instance per thread (and per async context), so the
+# local tier, its lock and the stats live here, one set per shared alias, the
+# way LocMemCache keeps its _caches and _locks: every thread of a process
+# shares one LRU, and delete() clears the entry for all of them.
+_locals = {}
+_local_locks = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """In-process LRU in front of a shared Django cache backend"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location or 'shared'
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 500))
+        self._local_timeout = int(options.get('LOCAL_TIMEOUT', 30))
+        self._stats_interval = int(options.get('STATS_PUBLISH_INTERVAL', 60))
+        with _registry_lock:
+            self._local = _locals.setdefault(self._shared_alias, OrderedDict())
+            self._local_lock = _local_locks.setdefault(self._shared_alias, threading.Lock())
+            self.stats = _stats.setdefault(self._shared_alias, CacheStats())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    # Local tier ------------------------------------------------------------
+
+    def _local_get(self, key):
+        with self._local_lock:
+            item = self._local.get(key, _MISSING)
+            if item is _MISSING:
+                return _MISSING
+            value, expires = item
+            if expires is not None and expires <= time.time():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value, timeout):
+        expires = time.time() + self._local_timeout
+        backend_expires = self.get_backend_timeout(timeout)
+        if backend_expires is not None:
+            expires = min(expires, backend_expires)
+        if expires <= time.time():
+            self._local_delete(key)
+            return
+        with self._local_lock:
+            self._local[key] = (value, expires)
+            self._local.move_to_end(key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._local_lock:
+            self._local.pop(key, None)
+
+    def _get_raw(self, key, version=None):
+        """Return the stored value (possibly an _Entry) or _MISSING"""
+        key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(key)
+        if value is not _MISSING:
+            self.stats.incr('local_hits')
+        else:
+            value = self.shared.get(key, _MISSING)
+            if value is _MISSING:
+                self.stats.incr('misses')
+            else:
+                self.stats.incr('shared_hits')
+                self._local_set(key, value, DEFAULT_TIMEOUT)
+        self.stats.publish(self.shared, self._stats_interval)
+        return value
+
+    # Cache API -------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        value = self._get_raw(key, version=version)
+        if value is _MISSING:
+            return default
+        if isinstance(value, _Entry):
+            return value.value
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout=self._shared_timeout(timeout))
+        self._local_set(key, value, timeout)
+        self.stats.incr('sets')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, timeout=self._shared_timeout(timeout))
+        if added:
+            self._local_set(key, value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.touch(key, timeout=self._shared_timeout(timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._local_get(key) is not _MISSING or self.shared.has_key(key)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._local_delete(key)
+        try:
+            return self.shared.incr(key, delta)
+        except ValueError:
+            raise ValueError("Key '%s' not found" % key)
+
+    def clear(self):
+        with self._local_lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's local tier only"""
+        with self._local_lock:
+            self._local.clear()
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Stampede protection ---------------------------------------------------
+
+    def get_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT, version=None,
+                       lock_timeout=10, beta=1.0):
+        """
+        Return the cached value for key, calling compute() to build it if needed.
+
+        Only one process rebuilds an expired key at a time (a lock is taken in
+        the shared tier); the others keep serving the previous value. Entries
+        are also recomputed a little before they expire, with a probability
+        that grows as expiry approaches and with how slow compute() is
+        ("probabilistic early expiration"), so hot keys rarely expire at all.
+        """
+        timeout = self._shared_timeout(timeout)
+        now = time.time()
+        entry = self._get_raw(key, version=version)
+        if not isinstance(entry, _Entry):
+            entry = None
+
+        if entry is not None:
+            if entry.expires is None:
+                return entry.value
+            early = entry.delta * beta * -math.log(1.0 - random.random())
+            if now + early < entry.expires:
+                return entry.value
+
+        lock_key = self.make_and_validate_key('lock:%s' % key, version=version)
+        if not self.shared.add(lock_key, 1, timeout=lock_timeout):
+            if entry is not None:
+                # Someone else is rebuilding it; the old value is still good
+                return entry.value
+            self.stats.incr('lock_waits')
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                waited = self.shared.get(self.make_and_validate_key(key, version=version))
+                if isinstance(waited, _Entry):
+                    return waited.value
+            # The other worker died or is very slow; build it ourselves
+
+        try:
+            started = time.time()
+            value = compute()
+            delta = time.time() - started
+            expires = None if timeout is None else time.time() + timeout
+            # Keep the stale copy around for twice as long so it can be served
+            # while the next rebuild is running.
+            stored_timeout = None if timeout is None else timeout * 2
+            self.set(key, _Entry(value, expires, delta), timeout=stored_timeout, version=version)
+            self.stats.incr('recomputes')
+            return value
+        finally:
+            self.shared.delete(lock_key)
@@ -0,0 +1,32 @@
+# church/clock.py
+"""
+The church's wall clock.
+
+The project runs in UTC, but event times and the Sunday service time are
+typed in as local times at the church (settings.CHURCH_TIME_ZONE). These
+helpers attach that zone, so a 9 AM service is 9 AM in Lagos wherever the
+server or the visitor is.
+"""
+import datetime
+import zoneinfo
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def church_timezone():
+    return zoneinfo.ZoneInfo(settings.CHURCH_TIME_ZONE)
+
+
+def church_datetime(date, time):
+    """Aware datetime for a date and wall-clock time at the church"""
+    return datetime.datetime.combine(date, time, tzinfo=church_timezone())
+
+
+def church_today(now=None):
+    """Today's date at the church"""
+    return timezone.localdate(now, church_timezone())
+
+
+def church_localtime(value):
+    return timezone.localtime(value, church_timezone())
@@ -0,0 +1,67 @@
+# church/content.py
+"""
+Cached lookups shared by most pages: the church settings, the verse of the
+day and the rows shown on the home page. They are cached until the rows
+change (see church/signals.py) and primed by church.warmup after a deploy.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import bible
+from .models import BibleVerse, ChurchSettings, Event, Ministry, Sermon, Testimony
+
+
+CONTENT_CACHE_TIMEOUT = 60 * 60 * 24
+CHURCH_SETTINGS_KEY = 'content:church-settings'
+# Home page models -> rows it shows
+HOME_MODELS = (Event, Testimony, Sermon, Ministry)
+
+
+def daily_verse_key():
+    return f'content:daily-verse:{timezone.localdate().isoformat()}'
+
+
+def home_key():
+    return f'content:home:{timezone.localdate().isoformat()}'
+
+
+def get_church_settings():
+    """Get church settings (None until they have been set up)"""
+    return cache.get_or_compute(CHURCH_SETTINGS_KEY, ChurchSettings.objects.first, timeout=CONTENT_CACHE_TIMEOUT)
+
+
+def get_daily_verse():
+    """Get today's Bible verse"""
+    def build():
+        verses = BibleVerse.objects.filter(is_active=True)
+        count = verses.count()
+        if not count:
+            # One from the offline Bible, if there is one
+            return bible.daily_verse(timezone.localdate())
+        # Use date to get consistent verse for the day
+        return verses[timezone.localdate().day % count]
+
+    return cache.get_or_compute(daily_verse_key(), build, timeout=CONTENT_CACHE_TIMEOUT)
+
+
+def get_home_content():
+    """Rows shown on the home page"""
+    def build():
+        return {
+            'upcoming_events': list(Event.objects.filter(date__gte=timezone.localdate()).order_by('date', 'start_time')[:3]),
+            'featured_testimonies': list(Testimony.objects.filter(status='approved', featured=True)[:3]),
+            'recent_sermons': list(Sermon.objects.filter(is_featured=True)[:3]),
+            'ministries': list(Ministry.objects.filter(is_active=True)[:6]),
+        }
+
+    return cache.get_or_compute(home_key(), build, timeout=CONTENT_CACHE_TIMEOUT)
+
+
+def invalidate(model):
+    """Drop the cached content that shows rows of model"""
+    if model is ChurchSettings:
+        cache.delete(CHURCH_SETTINGS_KEY)
+    elif model is BibleVerse:
+        cache.delete(daily_verse_key())
+    elif model in HOME_MODELS:
+        cache.delete(home_key())
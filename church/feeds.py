@@ -0,0 +1,176 @@
+# church/feeds.py
+import datetime
+import hashlib
+import mimetypes
+import time
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import Enclosure, Rss201rev2Feed
+
+from .models import ChurchSettings, Sermon, SermonSeries
+
+
+PODCAST_GENERATION_KEY = 'podcast:generation'
+PODCAST_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class ITunesPodcastFeed(Rss201rev2Feed):
+    """RSS 2.0 with the itunes: elements podcast apps expect"""
+
+    def rss_attributes(self):
+        attrs = super().rss_attributes()
+        attrs['xmlns:itunes'] = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
+        return attrs
+
+    def add_root_elements(self, handler):
+        super().add_root_elements(handler)
+        handler.addQuickElement('itunes:author', self.feed['itunes_author'])
+        handler.addQuickElement('itunes:summary', self.feed['description'])
+        handler.addQuickElement('itunes:explicit', 'false')
+        handler.addQuickElement('itunes:type', 'episodic')
+        handler.addQuickElement('itunes:image', '', {'href': self.feed['itunes_image']})
+        handler.startElement('itunes:owner', {})
+        handler.addQuickElement('itunes:name', self.feed['itunes_author'])
+        handler.addQuickElement('itunes:email', self.feed['itunes_email'])
+        handler.endElement('itunes:owner')
+        handler.startElement('itunes:category', {'text': 'Religion & Spirituality'})
+        handler.addQuickElement('itunes:category', '', {'text': 'Christianity'})
+        handler.endElement('itunes:category')
+
+    def add_item_elements(self, handler, item):
+        super().add_item_elements(handler, item)
+        handler.addQuickElement('itunes:author', item['itunes_author'])
+        handler.addQuickElement('itunes:summary', item['description'])
+        handler.addQuickElement('itunes:explicit', 'false')
+        if item.get('itunes_duration'):
+            handler.addQuickElement('itunes:duration', item['itunes_duration'])
+
+
+class SermonPodcastFeed(Feed):
+    feed_type = ITunesPodcastFeed
+
+    def get_object(self, request, series=None):
+        return series
+
+    def title(self, series):
+        site_name = get_site_name()
+        return f'{site_name} - {series.name}' if series else f'{site_name} Sermons'
+
+    def link(self, series):
+        if series:
+            return reverse('sermon_series', args=[series.slug])
+        return reverse('sermons')
+
+    def description(self, series):
+        if series:
+            return series.description or f'Sermons from the "{series.name}" series.'
+        return 'Weekly sermons and teachings from World of Prayer Bible International Church.'
+
+    def feed_url(self, series):
+        if series:
+            return reverse('podcast_series_feed', args=[series.slug])
+        return reverse('podcast_feed')
+
+    def feed_extra_kwargs(self, series):
+        return {
+            'itunes_author': get_site_name(),
+            'itunes_email': settings.CHURCH_EMAIL,
+            'itunes_image': absolute_url(static('images/wopbic.jpg')),
+        }
+
+    def items(self, series):
+        sermons = Sermon.objects.exclude(audio_file='').exclude(audio_file__isnull=True)
+        if series:
+            sermons = sermons.filter(sermon_series=series)
+        return sermons.order_by('-date_preached')
+
+    def item_title(self, sermon):
+        return sermon.title
+
+    def item_description(self, sermon):
+        return sermon.summary
+
+    def item_link(self, sermon):
+        return reverse('sermon_detail', args=[sermon.pk])
+
+    def item_guid(self, sermon):
+        return absolute_url(sermon.audio_file.url)
+
+    def item_guid_is_permalink(self, sermon):
+        return False
+
+    def item_author_name(self, sermon):
+        return sermon.preacher
+
+    def item_pubdate(self, sermon):
+        return timezone.make_aware(datetime.datetime.combine(sermon.date_preached, datetime.time(9, 0)))
+
+    def item_categories(self, sermon):
+        return [sermon.series] if sermon.series else []
+
+    def item_enclosures(self, sermon):
+        try:
+            length = sermon.audio_file.size
+        except (OSError, NotImplementedError):
+            length = 0
+        mime_type = mimetypes.guess_type(sermon.audio_file.name)[0] or 'audio/mpeg'
+        return [Enclosure(absolute_url(sermon.audio_file.url), str(length), mime_type)]
+
+    def item_extra_kwargs(self, sermon):
+        kwargs = {'itunes_author': sermon.preacher}
+        if sermon.audio_duration:
+            minutes, seconds = divmod(int(sermon.audio_duration), 60)
+            hours, minutes = divmod(minutes, 60)
+            kwargs['itunes_duration'] = f'{hours}:{minutes:02d}:{seconds:02d}'
+        return kwargs
+
+
+def get_site_name():
+    church_settings = ChurchSettings.objects.first()
+    return church_settings.site_name if church_settings else 'WOPBIC'
+
+
+def absolute_url(url):
+    if url.startswith(('http://', 'https://')):
+        return url
+    return settings.SITE_URL.rstrip('/') + url
+
+
+def invalidate_podcast_feeds():
+    """Make every cached feed stale; called when a sermon changes"""
+    try:
+        cache.incr(PODCAST_GENERATION_KEY)
+    except ValueError:
+        cache.set(PODCAST_GENERATION_KEY, int(time.time()), timeout=None)
+
+
+def get_podcast_feed(request, series_slug=None):
+    """
+    Return (xml, etag, last_modified) for the main or a series feed.
+
+    The serialized XML is cached until a sermon is saved or deleted, so
+    podcast clients polling the feed cost one cache lookup.
+    """
+    generation = cache.get_or_set(PODCAST_GENERATION_KEY, int(time.time()), timeout=None)
+    key = f'podcast:feed:{generation}:{series_slug or "all"}'
+
+    def build():
+        series = None
+        if series_slug:
+            series = SermonSeries.objects.filter(slug=series_slug).first()
+            if series is None:
+                return None
+        response = SermonPodcastFeed()(request, series=series)
+        xml = response.content
+        return xml, hashlib.md5(xml).hexdigest(), time.time()
+
+    feed = cache.get_or_compute(key, build, timeout=PODCAST_CACHE_TIMEOUT)
+    if feed is None:
+        raise Http404('No such sermon series')
+    return feed
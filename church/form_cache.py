@@ -0,0 +1,141 @@
+# church/form_cache.py
+"""
+Pre-rendered crispy forms. Rendering a form through its FormHelper walks the
+layout and loads a template per field, but an unbound form renders the same
+HTML every time apart from the CSRF token and any initial values the view
+passed in. So each form class is rendered once per template pack (and
+language) into a skeleton: the HTML split around every field's widget, with
+a placeholder for the token. A request only fills in the token and
+re-renders the widgets whose value can differ; bound forms, which may carry
+errors, always go through crispy in full.
+
+The skeleton is kept per process, so a deploy always starts from the new
+layouts; church.warmup builds the skeletons before the workers fork. A
+form's helper must only depend on its class for it to be cached.
+"""
+import threading
+
+from django.utils import translation
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+# Rendered in place of the token; it cannot occur in a real one
+CSRF_PLACEHOLDER = 'CSRF-TOKEN-PLACEHOLDER'
+
+_skeletons = {}
+_lock = threading.Lock()
+
+
+class Skeleton:
+    def __init__(self, segments, widgets, widget_attrs):
+        # Literal HTML alternating with field names: [html, name, html, ...]
+        self.segments = segments
+        # Each field's rendered widget and the attrs crispy gave it
+        self.widgets = widgets
+        self.widget_attrs = widget_attrs
+
+
+def widget_parts(field):
+    # Same unwrapping as crispy's {% crispy_field %}
+    widget = field.widget
+    return getattr(widget, 'widgets', [getattr(widget, 'widget', widget)])
+
+
+def get_helper(form):
+    return getattr(form, 'helper', None)
+
+
+def template_pack(helper):
+    from crispy_forms.utils import get_template_pack
+
+    return getattr(helper, 'template_pack', None) or get_template_pack()
+
+
+def render_crispy(form, context):
+    """Full crispy render, as {% crispy form %} does it"""
+    from crispy_forms.utils import render_crispy_form
+
+    return render_crispy_form(form, get_helper(form), context=context)
+
+
+def render_widget(bound_field):
+    # The whole form is rendered inside crispy's {% specialspaceless %}
+    from crispy_forms.templatetags.crispy_forms_utils import remove_spaces
+
+    return remove_spaces(str(bound_field))
+
+
+def build_skeleton(form_class):
+    form = form_class()
+    html = render_crispy(form, {'csrf_token': CSRF_PLACEHOLDER})
+
+    segments = [html]
+    widgets = {}
+    widget_attrs = {}
+    for name, field in form.fields.items():
+        # crispy has set the widget attrs on this instance while rendering,
+        # so the widget now renders exactly as it does inside the skeleton
+        widget_html = render_widget(form[name])
+        found = [i for i in range(0, len(segments), 2) for _ in range(segments[i].count(widget_html))]
+        if len(found) != 1:
+            # Laid out by a template of its own (or not at all); it stays
+            # baked into the HTML and forms that change it render in full
+            continue
+        i = found[0]
+        before, after = segments[i].split(widget_html)
+        segments[i:i + 1] = [before, name, after]
+        widgets[name] = widget_html
+        widget_attrs[name] = [dict(part.attrs) for part in widget_parts(field)]
+    return Skeleton(segments, widgets, widget_attrs)
+
+
+def get_skeleton(form):
+    key = (type(form), template_pack(get_helper(form)), translation.get_language())
+    skeleton = _skeletons.get(key)
+    if skeleton is None:
+        with _lock:
+            skeleton = _skeletons.get(key)
+            if skeleton is None:
+                skeleton = _skeletons[key] = build_skeleton(type(form))
+    return skeleton
+
+
+def changed_fields(form):
+    """Fields whose initial value can differ from the class's own"""
+    return {
+        name for name, field in form.fields.items()
+        if name in form.initial or callable(field.initial)
+    }
+
+
+def render_form(form, context):
+    """{% crispy form %} for unbound forms, from the cached skeleton"""
+    if form.is_bound or form.prefix:
+        return render_crispy(form, context.flatten())
+
+    skeleton = get_skeleton(form)
+    changed = changed_fields(form)
+    if not changed <= skeleton.widgets.keys():
+        return render_crispy(form, context.flatten())
+
+    parts = []
+    for i, segment in enumerate(skeleton.segments):
+        if i % 2 == 0:
+            parts.append(segment)
+        elif segment in changed:
+            field = form.fields[segment]
+            for part, attrs in zip(widget_parts(field), skeleton.widget_attrs[segment]):
+                part.attrs = dict(attrs)
+            parts.append(render_widget(form[segment]))
+        else:
+            parts.append(skeleton.widgets[segment])
+    html = ''.join(parts)
+    return mark_safe(html.replace(CSRF_PLACEHOLDER, escape(context.get('csrf_token', ''))))
+
+
+def build_all(form_classes):
+    """Build the skeletons of form_classes up front (see church.warmup)"""
+    for form_class in form_classes:
+        get_skeleton(form_class())
+    return f'{len(form_classes)} forms'
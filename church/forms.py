@@ -1,8 +1,7 @@
 # church/forms.py
 from django import forms
 from django.core.validators import EmailValidator
-from crispy_forms.helper import FormHelper
-from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+from django.utils.functional import cached_property
 from .models import PrayerRequest, Testimony, ContactMessage, Donation, Newsletter
 
 
@@ -37,10 +36,14 @@ class PrayerRequestForm(forms.ModelForm):
             'privacy': 'Private requests are only seen by our prayer team'
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.layout = Layout(
+    @cached_property
+    def helper(self):
+        # crispy_forms is only imported when a form is actually rendered
+        from crispy_forms.helper import FormHelper
+        from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+
+        helper = FormHelper()
+        helper.layout = Layout(
             Row(
                 Column('name', css_class='form-group col-md-6 mb-3'),
                 Column('email', css_class='form-group col-md-6 mb-3'),
@@ -51,6 +54,7 @@ class PrayerRequestForm(forms.ModelForm):
             HTML('<hr>'),
             Submit('submit', 'Submit Prayer Request', css_class='btn btn-primary btn-block')
         )
+        return helper
 
 
 class TestimonyForm(forms.ModelForm):
@@ -83,6 +87,8 @@ class TestimonyForm(forms.ModelForm):
 def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
     from django.conf import settings
+    from crispy_forms.helper import FormHelper
+    from crispy_forms.layout import Layout, Submit, Row, Column, HTML
     bank = settings.CHURCH_BANK_DETAILS
     
     self.helper = FormHelper()
@@ -179,10 +185,13 @@ class DonationForm(forms.ModelForm):
             'receipt_image': 'Upload a screenshot or photo of your transfer receipt'
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.layout = Layout(
+    @cached_property
+    def helper(self):
+        from crispy_forms.helper import FormHelper
+        from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+
+        helper = FormHelper()
+        helper.layout = Layout(
             HTML('<div class="alert alert-info">'
                  '<h5><i class="fas fa-university"></i> Bank Details</h5>'
                  '<p><strong>Bank:</strong> Ecobank<br>'
@@ -213,6 +222,7 @@ class DonationForm(forms.ModelForm):
                  '</div>'),
             Submit('submit', 'Submit Donation Details', css_class='btn btn-primary btn-block mt-3')
         )
+        return helper
 
     def clean(self):
         cleaned_data = super().clean()
@@ -239,17 +249,26 @@ class NewsletterForm(forms.ModelForm):
             })
         }
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.layout = Layout(
+    @cached_property
+    def helper(self):
+        from crispy_forms.helper import FormHelper
+        from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+
+        helper = FormHelper()
+        helper.form_method = 'post'
+        helper.layout = Layout(
             Row(
                 Column('email', css_class='col-md-8'),
                 Column(Submit('submit', 'Subscribe', css_class='btn btn-primary'), css_class='col-md-4'),
                 css_class='form-row'
             )
         )
+        return helper
+
+    def validate_unique(self):
+        # Newsletter.subscribe() upserts, so an existing address is not an
+        # error and checking for it here would cost an extra query.
+        pass
 
 
 class SearchForm(forms.Form):
@@ -261,17 +280,21 @@ class SearchForm(forms.Form):
         })
     )
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.helper = FormHelper()
-        self.helper.form_method = 'get'
-        self.helper.layout = Layout(
+    @cached_property
+    def helper(self):
+        from crispy_forms.helper import FormHelper
+        from crispy_forms.layout import Layout, Submit, Row, Column, HTML
+
+        helper = FormHelper()
+        helper.form_method = 'get'
+        helper.layout = Layout(
             Row(
                 Column('query', css_class='col-md-10'),
                 Column(Submit('submit', 'Search', css_class='btn btn-primary'), css_class='col-md-2'),
                 css_class='form-row'
             )
         )
+        return helper
         
         from django import forms
 
@@ -0,0 +1,229 @@
+# church/ical.py
+"""
+iCalendar (.ics) feeds for events.
+
+Event times are the church's wall-clock times, so they are written with
+TZID=settings.CHURCH_TIME_ZONE and every feed carries that zone's VTIMEZONE;
+a weekly service stays at 9 AM local time however the zone's offset changes.
+
+Each event's VEVENT block is cached on its own and only rebuilt when that
+event changes, and the assembled feeds are cached on top of that, so calendar
+apps polling a subscription normally cost one cache lookup.
+"""
+import datetime
+import hashlib
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .clock import church_datetime, church_timezone, church_today
+from .models import Event
+
+
+ICAL_GENERATION_KEY = 'ical:generation'
+# Bumped when the VEVENT format changes, so cached blocks are not reused
+VEVENT_VERSION = 2
+ICAL_CACHE_TIMEOUT = 60 * 60 * 24
+# Past one-off events older than this are left out of the subscription feeds
+PAST_EVENTS_DAYS = 90
+
+RRULES = {
+    'daily': 'FREQ=DAILY',
+    'weekly': 'FREQ=WEEKLY',
+    'biweekly': 'FREQ=WEEKLY;INTERVAL=2',
+    'fortnightly': 'FREQ=WEEKLY;INTERVAL=2',
+    'monthly': 'FREQ=MONTHLY',
+    'quarterly': 'FREQ=MONTHLY;INTERVAL=3',
+    'yearly': 'FREQ=YEARLY',
+    'annually': 'FREQ=YEARLY',
+}
+
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def format_utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def format_local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def format_offset(offset):
+    minutes = int(offset.total_seconds()) // 60
+    sign = '-' if minutes < 0 else '+'
+    return f'{sign}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}'
+
+
+def vtimezone(tz, year):
+    """VTIMEZONE block for tz, with its offset changes from year - 1 to year + 2"""
+    utc = datetime.timezone.utc
+    moment = datetime.datetime(year - 1, 1, 1, tzinfo=utc)
+    end = datetime.datetime(year + 3, 1, 1, tzinfo=utc)
+    offset = moment.astimezone(tz).utcoffset()
+    changes = [(moment, offset, offset)]
+    day = datetime.timedelta(days=1)
+    while moment < end:
+        if (moment + day).astimezone(tz).utcoffset() != offset:
+            # Find the minute the offset changed on
+            while moment.astimezone(tz).utcoffset() == offset:
+                moment += datetime.timedelta(minutes=15)
+            new = moment.astimezone(tz).utcoffset()
+            changes.append((moment, offset, new))
+            offset = new
+        else:
+            moment += day
+
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tz.key}']
+    for moment, before, after in changes:
+        local = moment.astimezone(tz)
+        kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+        lines += [
+            f'BEGIN:{kind}',
+            # DTSTART is the local time on the clock before the change
+            f'DTSTART:{format_local((moment + before).replace(tzinfo=None))}',
+            f'TZOFFSETFROM:{format_offset(before)}',
+            f'TZOFFSETTO:{format_offset(after)}',
+            f'TZNAME:{escape_text(local.tzname())}',
+            f'END:{kind}',
+        ]
+    lines.append('END:VTIMEZONE')
+    return lines
+
+
+def event_rrule(event):
+    """RRULE for a recurring event, derived from its free-text recurring_pattern"""
+    if not event.is_recurring or not event.recurring_pattern:
+        return None
+    pattern = event.recurring_pattern.strip().lower().replace('-', '').replace(' ', '')
+    return RRULES.get(pattern)
+
+
+def serialize_event(event):
+    """VEVENT block for one event"""
+    start = church_datetime(event.date, event.start_time)
+    end = church_datetime(event.date, event.end_time)
+    if end <= start:
+        # Ends after midnight
+        end += datetime.timedelta(days=1)
+    host = urlsplit(settings.SITE_URL).netloc or 'wopbic.org'
+
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.pk}@{host}',
+        f'DTSTAMP:{format_utc(event.created_at)}',
+        f'DTSTART;TZID={start.tzinfo.key}:{format_local(start)}',
+        f'DTEND;TZID={end.tzinfo.key}:{format_local(end)}',
+        f'SUMMARY:{escape_text(event.title)}',
+        f'DESCRIPTION:{escape_text(event.description)}',
+        f'LOCATION:{escape_text(event.location)}',
+        f'CATEGORIES:{escape_text(event.get_event_type_display())}',
+    ]
+    rrule = event_rrule(event)
+    if rrule:
+        lines.append(f'RRULE:{rrule}')
+    lines.append('END:VEVENT')
+    return '\r\n'.join(fold(line) for line in lines)
+
+
+def event_cache_key(pk):
+    return f'ical:event:v{VEVENT_VERSION}:{pk}'
+
+
+def cached_vevents(events):
+    """VEVENT blocks for the given events, serializing only cache misses"""
+    keys = {event_cache_key(event.pk): event for event in events}
+    blocks = cache.get_many(list(keys))
+    missing = {}
+    for key, event in keys.items():
+        if key not in blocks:
+            missing[key] = blocks[key] = serialize_event(event)
+    if missing:
+        cache.set_many(missing, timeout=ICAL_CACHE_TIMEOUT)
+    return [blocks[key] for key in keys]
+
+
+def build_calendar(name, events):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//WOPBIC//Church Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        fold(f'X-WR-CALNAME:{escape_text(name)}'),
+        'X-PUBLISHED-TTL:PT1H',
+        f'X-WR-TIMEZONE:{church_timezone().key}',
+    ]
+    lines += vtimezone(church_timezone(), church_today().year)
+    body = '\r\n'.join(lines + cached_vevents(events) + ['END:VCALENDAR'])
+    return (body + '\r\n').encode('utf-8')
+
+
+def feed_events(event_type=None):
+    cutoff = church_today() - datetime.timedelta(days=PAST_EVENTS_DAYS)
+    events = Event.objects.filter(Q(date__gte=cutoff) | Q(is_recurring=True))
+    if event_type:
+        events = events.filter(event_type=event_type)
+    return events.order_by('date', 'start_time')
+
+
+def get_calendar(event_type=None, event_pk=None):
+    """
+    Return (ics, etag, last_modified) for the whole calendar, one event type
+    or a single event, or None if there is nothing to show.
+    """
+    generation = cache.get_or_set(ICAL_GENERATION_KEY, int(time.time()), timeout=None)
+    scope = f'event-{event_pk}' if event_pk else (event_type or 'all')
+    # The feeds drop old events as days go by, so the date is part of the key
+    key = f'ical:feed:{generation}:{church_today().isoformat()}:{scope}'
+
+    def build():
+        if event_pk:
+            events = list(Event.objects.filter(pk=event_pk))
+            if not events:
+                return None
+            name = events[0].title
+        else:
+            types = dict(Event.EVENT_TYPES)
+            if event_type and event_type not in types:
+                return None
+            name = f'WOPBIC {types[event_type]}' if event_type else 'WOPBIC Events'
+            events = feed_events(event_type)
+        ics = build_calendar(name, events)
+        return ics, hashlib.md5(ics).hexdigest(), time.time()
+
+    return cache.get_or_compute(key, build, timeout=ICAL_CACHE_TIMEOUT)
+
+
+def invalidate_event(pk):
+    """Drop one event's cached VEVENT and make every cached feed stale"""
+    cache.delete(event_cache_key(pk))
+    try:
+        cache.incr(ICAL_GENERATION_KEY)
+    except ValueError:
+        cache.set(ICAL_GENERATION_KEY, int(time.time()), timeout=None)
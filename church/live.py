@@ -0,0 +1,297 @@
+# church/live.py
+"""
+Live stream status for the live page and its server-sent event stream.
+
+The rows it depends on (LiveStatus, the next few services and the Sunday
+service time) are read once into the shared cache and dropped when they
+change (see church/signals.py). The state shown to viewers, "live",
+"starting_soon", "scheduled" or "offline", is derived from that snapshot and
+the current time on every call (service times are the church's wall-clock
+times, see church/clock.py), so it moves on by itself as a service
+approaches without touching the database.
+
+Under ASGI, LiveStatusStream (see WOPBIC/asgi.py) answers /api/live-status/
+ahead of Django's middleware and every open stream waits on one
+Broadcaster per process: a single task reads the snapshot every
+LIVE_POLL_SECONDS and wakes the streams only when the status changed, so
+thousands of waiting viewers cost one cache read a couple of seconds apart
+rather than a page render each time they press refresh.
+"""
+import asyncio
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.urls import reverse
+from django.utils import formats, timezone
+
+from .clock import church_datetime, church_localtime, church_today
+from .models import ChurchSettings, Event, LiveStatus
+
+
+STATUS_TIMEOUT = 60 * 60 * 24
+# Services read into the snapshot; more than are ever scheduled in a day
+UPCOMING_SERVICES = 5
+# A service stays "starting soon" this long past its start time if nobody has
+# gone live yet, then the next one is shown
+LATE_GRACE = datetime.timedelta(minutes=30)
+SUNDAY = 6
+
+# Seconds between comments that stop proxies closing an idle stream
+KEEPALIVE_SECONDS = 20
+# Streams end after this long and the browser reconnects, which spreads
+# viewers over the new workers after a deploy
+STREAM_SECONDS = 15 * 60
+# How long the browser waits before reconnecting, in milliseconds. Without an
+# event loop (WSGI) each request carries one event, so this is how often it polls.
+RECONNECT_MS = 3000
+POLL_RECONNECT_MS = 30000
+
+
+def status_key():
+    return f'live:status:v2:{church_today().isoformat()}'
+
+
+def _shared_cache():
+    # Not the tiered 'default' cache: its per-process copy could keep a
+    # worker showing "off air" for LOCAL_TIMEOUT seconds after going live
+    return caches['shared']
+
+
+def build_status():
+    """The rows the live status is derived from"""
+    live = LiveStatus.objects.first()
+    church_settings = ChurchSettings.objects.first()
+    services = Event.objects.filter(
+        event_type='service', date__gte=church_today()
+    ).order_by('date', 'start_time')[:UPCOMING_SERVICES]
+    return {
+        'is_live': bool(live and live.is_live),
+        'title': live.title if live else '',
+        'stream_url': live.stream_url if live else '',
+        'started_at': live.started_at if live else None,
+        'watch_url': church_settings.youtube_url if church_settings else None,
+        'services': [(event.title, church_datetime(event.date, event.start_time)) for event in services],
+        'sunday_service_time': church_settings.sunday_service_time if church_settings else None,
+    }
+
+
+def get_status_data():
+    key = status_key()
+    cache = _shared_cache()
+    data = cache.get(key)
+    if data is None:
+        data = build_status()
+        cache.set(key, data, STATUS_TIMEOUT)
+    return data
+
+
+def invalidate():
+    _shared_cache().delete(status_key())
+
+
+def next_service(data, now):
+    """(title, start) of the next service not yet over, falling back to the weekly Sunday service"""
+    for title, starts_at in data['services']:
+        if starts_at + LATE_GRACE > now:
+            return title, starts_at
+    service_time = data['sunday_service_time']
+    if service_time is None:
+        return None
+    today = church_today(now)
+    sunday = today + datetime.timedelta(days=(SUNDAY - today.weekday()) % 7)
+    starts_at = church_datetime(sunday, service_time)
+    if starts_at + LATE_GRACE <= now:
+        starts_at = church_datetime(sunday + datetime.timedelta(days=7), service_time)
+    return 'Sunday Service', starts_at
+
+
+def get_status(now=None):
+    """What viewers are shown right now, ready for JSON"""
+    data = get_status_data()
+    now = now or timezone.now()
+    service = next_service(data, now)
+    starting_soon = datetime.timedelta(minutes=settings.LIVE_STARTING_SOON_MINUTES)
+
+    upcoming = None
+    if service:
+        title, starts_at = service
+        local = church_localtime(starts_at)
+        upcoming = {
+            'title': title,
+            'starts_at': starts_at.isoformat(),
+            'display': formats.date_format(local, 'l j M, g:i A'),
+            'time': formats.time_format(local, 'g:i A'),
+        }
+
+    if data['is_live']:
+        state = 'live'
+        headline = f"We are live now: {data['title']}" if data['title'] else 'We are live now'
+    elif service and service[1] - starting_soon <= now:
+        state = 'starting_soon'
+        headline = f"{upcoming['title']} starts soon ({upcoming['time']})"
+    elif service:
+        state = 'scheduled'
+        headline = f"Next service: {upcoming['display']}"
+    else:
+        state = 'offline'
+        headline = 'Live stream will appear here during service times'
+
+    return {
+        'state': state,
+        'headline': headline,
+        'title': data['title'] if state == 'live' else '',
+        'stream_url': data['stream_url'] if state == 'live' else '',
+        'watch_url': data['watch_url'],
+        'started_at': data['started_at'].isoformat() if state == 'live' and data['started_at'] else None,
+        'next_service': upcoming,
+    }
+
+
+def status_json():
+    return json.dumps(get_status(), separators=(',', ':'))
+
+
+def _poll_status():
+    # Runs outside any request, so nothing else closes a connection opened
+    # on a cache miss
+    try:
+        return status_json()
+    finally:
+        close_old_connections()
+
+
+class Broadcaster:
+    """
+    Shares one status poll between every open stream in this process.
+
+    The poll task only runs while somebody is listening, and listeners are
+    woken only when the JSON they were last sent has changed.
+    """
+
+    def __init__(self):
+        self.payload = None
+        self.version = 0
+        self.listeners = 0
+        self._changed = None
+        self._task = None
+
+    def _start(self):
+        """Start the poll task if it is not running; returns True if it was started"""
+        if self._task is not None and not self._task.done():
+            return False
+        self.payload = None
+        self._changed = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._poll())
+        return True
+
+    async def _poll(self):
+        while self.listeners:
+            try:
+                payload = await sync_to_async(_poll_status, thread_sensitive=False)()
+            except Exception as e:
+                print(f"Live status poll failed: {e}")
+            else:
+                if payload != self.payload:
+                    self.payload = payload
+                    self.version += 1
+                    changed, self._changed = self._changed, asyncio.Event()
+                    changed.set()
+            await asyncio.sleep(settings.LIVE_POLL_SECONDS)
+
+    async def updates(self, keepalive):
+        """Yield the status JSON each time it changes, or None after keepalive seconds without a change"""
+        self.listeners += 1
+        try:
+            # A payload left from before the task last stopped may be stale;
+            # wait for the first poll instead
+            seen = self.version if self._start() else 0
+            while True:
+                if self.version != seen:
+                    seen = self.version
+                    yield self.payload
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.listeners -= 1
+
+
+broadcaster = Broadcaster()
+
+
+def sse_message(data, retry=None):
+    """A server-sent 'status' event"""
+    retry = f'retry: {retry}\n' if retry else ''
+    return f'{retry}event: status\ndata: {data}\n\n'
+
+
+async def event_stream():
+    """Server-sent events for one viewer: the status, then every change to it"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_SECONDS
+    yield f'retry: {RECONNECT_MS}\n\n'
+    updates = broadcaster.updates(KEEPALIVE_SECONDS)
+    try:
+        async for payload in updates:
+            yield ': keepalive\n\n' if payload is None else sse_message(payload)
+            if loop.time() > deadline:
+                break
+    finally:
+        await updates.aclose()
+
+
+class LiveStatusStream:
+    """
+    ASGI wrapper that serves the status stream itself and passes every other
+    request to the Django application.
+
+    WhiteNoise's middleware is sync only, and Django keeps a thread for each
+    request that has been through sync middleware until its response is
+    finished, so the stream would otherwise hold a thread per viewer.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self._path = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = reverse('api_live_status')
+        return self._path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'GET' or scope['path'] != self.path:
+            return await self.application(scope, receive, send)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        streaming = asyncio.ensure_future(self._stream(send))
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        done, pending = await asyncio.wait({streaming, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if streaming in done:
+            streaming.result()
+
+    async def _stream(self, send):
+        async for message in event_stream():
+            await send({'type': 'http.response.body', 'body': message.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def _wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
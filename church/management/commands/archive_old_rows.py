@@ -0,0 +1,37 @@
+# church/management/commands/archive_old_rows.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from church.archive import ARCHIVES, BATCH_SIZE, archivable, archive_rows, default_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move answered prayer requests and replied contact messages into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help=f'Archive rows created more than this many days ago (default: {settings.ARCHIVE_AFTER_DAYS})')
+        parser.add_argument('--only', choices=list(ARCHIVES), help='Archive just one table')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Rows moved per transaction (default: {BATCH_SIZE})')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows that would be moved')
+
+    def handle(self, *args, **options):
+        cutoff = default_cutoff(max(options['older_than_days'], 0))
+        batch_size = max(options['batch_size'], 1)
+        for name in [options['only']] if options['only'] else ARCHIVES:
+            label = name.replace('_', ' ')
+            if options['dry_run']:
+                self.stdout.write(f'{label}: {archivable(name, cutoff).count()} rows to archive')
+                continue
+
+            started = time.monotonic()
+            moved = archive_rows(
+                name, cutoff, batch_size,
+                log=lambda moved, label=label: self.stdout.write(f'  {label}: {moved} moved'),
+            )
+            elapsed = time.monotonic() - started
+            rate = moved / elapsed if elapsed else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'{label}: archived {moved} rows in {elapsed:.1f}s ({rate:.0f} rows/s)'
+            ))
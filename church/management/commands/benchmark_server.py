@@ -0,0 +1,173 @@
+# church/management/commands/benchmark_server.py
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Extra gunicorn arguments for each profile
+PROFILES = {
+    # What render.yaml used to run: one sync worker, nothing preloaded
+    'default': ['-c', os.devnull],
+    'tuned': ['-c', 'gunicorn.conf.py'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('gunicorn exited during startup; run it by hand to see why')
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError('gunicorn did not start in time')
+
+
+def process_tree(pid):
+    """The gunicorn master and its workers"""
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The parent pid follows the command name, which may contain spaces
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def memory_mb(pids):
+    """(RSS, PSS) in MB summed over pids; PSS counts shared pages once"""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    if line.startswith('Rss:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('Pss:'):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return rss / 1024, pss / 1024
+
+
+def run_load(base_url, paths, concurrency, duration):
+    """Hit the paths round-robin from `concurrency` threads; returns (latencies, errors)"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        n = offset
+        while time.monotonic() < stop_at:
+            url = base_url + paths[n % len(paths)]
+            n += 1
+            started = time.monotonic()
+            try:
+                urllib.request.urlopen(url, timeout=30).read()
+            except OSError:
+                with lock:
+                    errors[0] += 1
+                continue
+            elapsed = time.monotonic() - started
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+class Command(BaseCommand):
+    help = 'Start gunicorn with each runtime profile, load it, and compare throughput, latency and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', help=f"Profiles to run (default: all of {', '.join(PROFILES)})")
+        parser.add_argument('--paths', nargs='+', default=['/', '/sermons/', '/events/', '/about/'], help='URL paths to request')
+        parser.add_argument('--concurrency', type=int, default=16, help='Concurrent clients (default: 16)')
+        parser.add_argument('--duration', type=int, default=15, help='Seconds of load per profile (default: 15)')
+
+    def handle(self, *args, **options):
+        names = options['profiles'] or list(PROFILES)
+        unknown = set(names) - set(PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        results = []
+        for name in names:
+            self.stdout.write(f'Running {name} profile...')
+            results.append((name, self.run_profile(name, options)))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'profile':<10}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'RSS MB':>9}{'PSS MB':>9}  workers")
+        for name, r in results:
+            self.stdout.write(
+                f"{name:<10}{r['rps']:>8.1f}{r['p50']:>9.0f}{r['p95']:>9.0f}{r['errors']:>8}"
+                f"{r['rss']:>9.0f}{r['pss']:>9.0f}  {r['workers']}"
+            )
+        self.stdout.write('PSS counts pages shared between processes once; it is what the instance actually uses.')
+
+    def run_profile(self, name, options):
+        port = free_port()
+        base_url = f'http://localhost:{port}'
+        command = [
+            sys.executable, '-m', 'gunicorn', 'WOPBIC.wsgi:application',
+            *PROFILES[name], '--bind', f'127.0.0.1:{port}', '--access-logfile', os.devnull,
+        ]
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(base_url + options['paths'][0], process)
+            # One pass over the pages so every worker has loaded its templates
+            run_load(base_url, options['paths'], options['concurrency'], 2)
+            latencies, errors = run_load(base_url, options['paths'], options['concurrency'], options['duration'])
+            pids = process_tree(process.pid)
+            rss, pss = memory_mb(pids)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        if not latencies:
+            raise CommandError(f'No request succeeded with the {name} profile')
+        quantiles = statistics.quantiles(latencies, n=20)
+        return {
+            'rps': len(latencies) / options['duration'],
+            'p50': statistics.median(latencies) * 1000,
+            'p95': quantiles[18] * 1000,
+            'errors': errors,
+            'rss': rss,
+            'pss': pss,
+            'workers': len(pids) - 1,
+        }
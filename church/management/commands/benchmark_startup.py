@@ -0,0 +1,82 @@
+# church/management/commands/benchmark_startup.py
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# What each target imports, in a fresh interpreter
+TARGETS = {
+    'setup': 'import django; django.setup()',
+    # What a worker does before it can answer its first request
+    'wsgi': (
+        'import WOPBIC.wsgi; '
+        'from django.urls import get_resolver; get_resolver().url_patterns'
+    ),
+}
+
+SCRIPT = (
+    'import time; _started = time.perf_counter(); '
+    '{code}; '
+    'print(f"STARTUP_SECONDS={{time.perf_counter() - _started}}")'
+)
+
+
+def parse_importtime(output):
+    """Return [(module, self_us, cumulative_us)] from -X importtime output"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            modules.append((module.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure process startup time and report import time per module (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=list(TARGETS), default='wsgi', help='What to start (default: wsgi)')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start (default: 5)')
+        parser.add_argument('--top', type=int, default=20, help='Modules to list (default: 20)')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'WOPBIC.settings'))
+        command = [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(code=TARGETS[options['target']])]
+
+        timings = []
+        modules = []
+        for _ in range(max(options['runs'], 1)):
+            result = subprocess.run(command, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+            if result.returncode != 0:
+                raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'Startup failed')
+            seconds = [line.split('=', 1)[1] for line in result.stdout.splitlines() if line.startswith('STARTUP_SECONDS=')]
+            timings.append(float(seconds[-1]))
+            # Keep the breakdown of the fastest run, the least disturbed by noise
+            if timings[-1] == min(timings):
+                modules = parse_importtime(result.stderr)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Startup ({options['target']}): median {statistics.median(timings) * 1000:.0f} ms, "
+            f"best {min(timings) * 1000:.0f} ms over {len(timings)} runs, {len(modules)} modules imported"
+        ))
+
+        top = options['top']
+        self.stdout.write('\nSlowest modules (cumulative, including what they import):')
+        for module, self_us, cumulative_us in sorted(modules, key=lambda m: -m[2])[:top]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} ms  {module}')
+
+        packages = defaultdict(int)
+        for module, self_us, cumulative_us in modules:
+            packages[module.split('.')[0]] += self_us
+        self.stdout.write('\nImport time by top-level package (self):')
+        for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+            self.stdout.write(f'  {self_us / 1000:8.1f} ms  {package}')
@@ -0,0 +1,81 @@
+# church/management/commands/benchmark_templates.py
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.test import RequestFactory
+from church import views
+
+
+PAGES = {
+    'home': views.home,
+    'events': views.events,
+    'sermons': views.sermons,
+}
+
+
+def capture_context(view, request):
+    """Run a view once and return the template name and context it rendered"""
+    captured = {}
+    render_page = views.render_page
+
+    def capture(request, template_name, context):
+        captured.update(template_name=template_name, context=context)
+        return render_page(request, template_name, context)
+
+    views.render_page = capture
+    try:
+        view(request)
+    finally:
+        views.render_page = render_page
+    return captured['template_name'], captured['context']
+
+
+def jinja2_engine():
+    try:
+        return engines['jinja2']
+    except Exception:
+        # JINJA2_PAGES is off; build the engine from the same settings
+        params = {key: value for key, value in settings.JINJA2_TEMPLATES.items() if key != 'BACKEND'}
+        return Jinja2({'APP_DIRS': False, **params})
+
+
+class Command(BaseCommand):
+    help = 'Compare render times of the busiest pages with the Django and Jinja2 template engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Renders per page and engine (default: 200)')
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        engine_list = [('django', engines['django']), ('jinja2', jinja2_engine())]
+        iterations = max(options['iterations'], 1)
+
+        self.stdout.write(f"{'page':<10}{'engine':<8}{'median ms':>11}{'mean ms':>10}{'bytes':>9}")
+        for page, view in PAGES.items():
+            request = factory.get('/')
+            request.user = AnonymousUser()
+            # Build the context once (this runs the queries) and render only
+            template_name, context = capture_context(view, request)
+
+            medians = {}
+            for name, engine in engine_list:
+                template = engine.get_template(template_name)
+                output = template.render(context, request)
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    template.render(context, request)
+                    timings.append(time.perf_counter() - started)
+                medians[name] = statistics.median(timings)
+                self.stdout.write(
+                    f'{page:<10}{name:<8}{medians[name] * 1000:>11.2f}'
+                    f'{statistics.mean(timings) * 1000:>10.2f}{len(output.encode()):>9}'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"{page:<10}Jinja2 speedup: {medians['django'] / medians['jinja2']:.2f}x"
+            ))
@@ -0,0 +1,31 @@
+# church/management/commands/build_bible_store.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from church import bible, content
+from church.models import BibleVerse
+
+
+class Command(BaseCommand):
+    help = 'Pack a Bible translation into the memory-mapped store used for verse text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Tab-separated book, chapter, verse, text, or "Genesis 1:1 text" lines')
+        parser.add_argument('--translation', default='', help='Name of the translation, e.g. KJV')
+        parser.add_argument('--output', default=None, help='Store path (default: BIBLE_STORE_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.BIBLE_STORE_PATH
+        started = time.monotonic()
+        try:
+            verses = bible.build(bible.read_source(options['source']), path, options['translation'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"{options['source']}: {e}")
+        elapsed = time.monotonic() - started
+        rate = verses / elapsed if elapsed else 0
+        # The verse of the day may come from the store
+        content.invalidate(BibleVerse)
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {verses} verses in {path} in {elapsed:.1f}s ({rate:.0f} verses/s)'
+        ))
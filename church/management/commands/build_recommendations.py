@@ -0,0 +1,29 @@
+# church/management/commands/build_recommendations.py
+import time
+
+from django.core.management.base import BaseCommand
+from church.recommendations import TOP_K, rebuild, update
+
+
+class Command(BaseCommand):
+    help = 'Precompute the related sermons shown on each sermon page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sermon_ids', nargs='*', type=int,
+                            help='Only recompute what changes to these sermons affect (default: every sermon)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['sermon_ids']:
+            rows = update(options['sermon_ids'])
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(f'Recomputed {rows} sermons in {elapsed:.1f}s'))
+            return
+
+        sermons, stored = rebuild()
+        elapsed = time.monotonic() - started
+        rate = sermons / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} recommendations (up to {TOP_K} each) for {sermons} sermons '
+            f'in {elapsed:.1f}s ({rate:.0f} sermons/s)'
+        ))
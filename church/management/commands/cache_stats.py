@@ -0,0 +1,25 @@
+# church/management/commands/cache_stats.py
+from django.core.management.base import BaseCommand
+from church.cache import published_stats, reset_published_stats
+
+
+class Command(BaseCommand):
+    help = 'Show cache hit/miss statistics published by all workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = published_stats()
+        self.stdout.write(self.style.SUCCESS('Cache statistics (all workers)'))
+        self.stdout.write(f"  Local hits:   {stats['local_hits']}")
+        self.stdout.write(f"  Shared hits:  {stats['shared_hits']}")
+        self.stdout.write(f"  Misses:       {stats['misses']}")
+        self.stdout.write(f"  Sets:         {stats['sets']}")
+        self.stdout.write(f"  Recomputes:   {stats['recomputes']}")
+        self.stdout.write(f"  Lock waits:   {stats['lock_waits']}")
+        self.stdout.write(f"  Hit ratio:    {stats['hit_ratio']:.1%}")
+
+        if options['reset']:
+            reset_published_stats()
+            self.stdout.write(self.style.WARNING('Counters reset'))
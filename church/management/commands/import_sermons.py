@@ -0,0 +1,101 @@
+# church/management/commands/import_sermons.py
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from church import content, recommendations, scripture, series, snapshots
+from church.models import Sermon
+from church.feeds import invalidate_podcast_feeds
+from church.sermon_import import InvalidRow, clean_row, import_batch, read_rows
+from church.sitemaps import invalidate_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Import sermons from a CSV or JSON archive, updating sermons imported before'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, JSON array or JSON Lines file')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Input format (default: from the file extension)')
+        parser.add_argument('--audio-dir', help='Directory holding the files named in the audio_file column')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per transaction (default: 500)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'json')
+        audio_dir = options['audio_dir']
+        if audio_dir and not os.path.isdir(audio_dir):
+            raise CommandError(f'{audio_dir} is not a directory')
+        batch_size = max(options['batch_size'], 1)
+
+        self.created = self.invalid = 0
+        self.updated_pks = []
+        self.started = time.monotonic()
+        rows_read = 0
+        batch = []
+
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                for line, row in enumerate(read_rows(f, file_format), start=1):
+                    rows_read += 1
+                    try:
+                        batch.append(clean_row(row))
+                    except InvalidRow as e:
+                        self.report_invalid(line, e)
+                        continue
+                    if len(batch) >= batch_size:
+                        self.write_batch(batch, audio_dir, options['dry_run'], rows_read)
+                        batch = []
+                if batch:
+                    self.write_batch(batch, audio_dir, options['dry_run'], rows_read)
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        elapsed = time.monotonic() - self.started
+        rate = rows_read / elapsed if elapsed else 0
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'{rows_read - self.invalid} of {rows_read} rows are valid ({elapsed:.1f}s, {rate:.0f} rows/s); nothing written'
+            ))
+            return
+
+        if self.created or self.updated_pks:
+            self.refresh_caches()
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows_read} rows in {elapsed:.1f}s ({rate:.0f} rows/s): '
+            f'{self.created} created, {len(self.updated_pks)} updated, {self.invalid} skipped'
+        ))
+        if audio_dir and (self.created or self.updated_pks):
+            self.stdout.write('Run process_sermon_audio to analyse any newly attached audio.')
+
+    def report_invalid(self, line, error):
+        self.invalid += 1
+        self.stdout.write(self.style.WARNING(f'  Row {line}: {error}'))
+
+    def write_batch(self, batch, audio_dir, dry_run, rows_read):
+        if not dry_run:
+            created, updated_pks, errors = import_batch(batch, audio_dir)
+            self.created += created
+            self.updated_pks.extend(updated_pks)
+            for key, error in errors:
+                self.invalid += 1
+                self.stdout.write(self.style.WARNING(f'  {key}: {error}'))
+        elapsed = time.monotonic() - self.started or 1e-9
+        self.stdout.write(f'  {rows_read} rows read, {rows_read / elapsed:.0f} rows/s')
+
+    def refresh_caches(self):
+        # bulk_create does not send post_save, so do what the signal handlers would
+        series.rebuild()
+        scripture.reindex()
+        recommendations.rebuild()
+        content.invalidate(Sermon)
+        invalidate_podcast_feeds()
+        invalidate_sitemaps()
+        if snapshots.snapshots_enabled():
+            for pk in self.updated_pks:
+                snapshots.delete_snapshot(reverse('sermon_detail', args=[pk]))
+            snapshots.refresh(snapshots.page_paths('home') + snapshots.page_paths('sermons'))
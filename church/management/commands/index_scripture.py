@@ -0,0 +1,20 @@
+# church/management/commands/index_scripture.py
+import time
+
+from django.core.management.base import BaseCommand
+from church.scripture import reindex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the scripture ranges of every sermon and Bible verse'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        sermons, verses, unread = reindex()
+        elapsed = time.monotonic() - started
+        rate = (sermons + verses) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {sermons} sermons and {verses} verses in {elapsed:.1f}s ({rate:.0f} rows/s)'
+        ))
+        if unread:
+            self.stdout.write(self.style.WARNING(f'{unread} references could not be read'))
@@ -0,0 +1,29 @@
+# church/management/commands/prerender_pages.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from church import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Prerender the anonymous public pages to static HTML snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'pages', nargs='*',
+            help=f"Pages to render (default: all of {', '.join(snapshots.PAGES)})"
+        )
+
+    def handle(self, *args, **options):
+        names = options['pages'] or list(snapshots.PAGES)
+        unknown = set(names) - set(snapshots.PAGES)
+        if unknown:
+            raise CommandError(f"Unknown pages: {', '.join(sorted(unknown))}")
+
+        started = time.monotonic()
+        written, failed = snapshots.prerender(names, log=self.stdout.write)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'{written} pages prerendered in {elapsed:.1f}s'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} pages could not be rendered and will be served dynamically'))
@@ -0,0 +1,37 @@
+# church/management/commands/process_sermon_audio.py
+import time
+
+from django.core.management.base import BaseCommand
+from church.audio import process_sermon_audio
+from church.models import Sermon
+
+
+class Command(BaseCommand):
+    help = 'Analyse sermon audio and build low-bitrate variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sermon_ids', nargs='*', type=int, help='Only process these sermons')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry sermons whose processing failed')
+        parser.add_argument('--all', action='store_true', help='Reprocess every sermon with audio')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for new uploads')
+        parser.add_argument('--poll-interval', type=int, default=60, help='Seconds between polls with --loop (default: 60)')
+
+    def handle(self, *args, **options):
+        while True:
+            sermons = Sermon.objects.exclude(audio_file='').exclude(audio_file__isnull=True)
+            if options['sermon_ids']:
+                sermons = sermons.filter(pk__in=options['sermon_ids'])
+            elif not options['all']:
+                statuses = ['', 'pending'] + (['failed'] if options['retry_failed'] else [])
+                sermons = sermons.filter(audio_status__in=statuses)
+
+            for sermon_id, title in sermons.values_list('pk', 'title'):
+                started = time.monotonic()
+                if process_sermon_audio(sermon_id):
+                    self.stdout.write(self.style.SUCCESS(f'Processed "{title}" in {time.monotonic() - started:.1f}s'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'Could not process "{title}"'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
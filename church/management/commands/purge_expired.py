@@ -0,0 +1,62 @@
+# church/management/commands/purge_expired.py
+import time
+
+from django.core.management.base import BaseCommand
+from church import retention
+
+
+class Command(BaseCommand):
+    help = 'Delete rows past their retention period (RETENTION_DAYS) and orphaned receipt files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=list(retention.POLICIES) + ['orphaned_receipts'],
+                            help='Run just one policy')
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE,
+                            help=f'Rows deleted per transaction (default: {retention.BATCH_SIZE})')
+        parser.add_argument('--pause', type=float, default=retention.PAUSE,
+                            help=f'Seconds to wait between batches (default: {retention.PAUSE})')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be deleted')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        pause = max(options['pause'], 0)
+        names = [options['only']] if options['only'] else list(retention.POLICIES) + ['orphaned_receipts']
+
+        for name in names:
+            label = name.replace('_', ' ')
+            started = time.monotonic()
+            if name == 'orphaned_receipts':
+                if options['dry_run']:
+                    self.stdout.write(f'{label}: {len(retention.orphaned_receipts())} files to delete')
+                    continue
+                files = retention.purge_orphaned_receipts(batch_size, pause)
+                self.report(label, 0, files, time.monotonic() - started)
+                continue
+
+            days = retention.retention_days(name)
+            if days is None:
+                self.stdout.write(f'{label}: kept forever (retention set to 0)')
+                continue
+            querysets = retention.expired(name)
+            if options['dry_run']:
+                count = sum(queryset.count() for queryset in querysets)
+                self.stdout.write(f'{label}: {count} rows older than {days} days to delete')
+                continue
+
+            file_field = retention.POLICIES[name][1]
+            rows = files = 0
+            for queryset in querysets:
+                deleted, deleted_files = retention.purge_queryset(
+                    queryset, file_field, batch_size, pause,
+                    log=lambda deleted, label=label, base=rows: self.stdout.write(f'  {label}: {base + deleted} deleted'),
+                )
+                rows += deleted
+                files += deleted_files
+            self.report(label, rows, files, time.monotonic() - started)
+
+    def report(self, label, rows, files, elapsed):
+        rate = (rows or files) / elapsed if elapsed else 0
+        unit = 'rows' if rows else 'files'
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: deleted {rows} rows and {files} files in {elapsed:.1f}s ({rate:.0f} {unit}/s)'
+        ))
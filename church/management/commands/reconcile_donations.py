@@ -0,0 +1,46 @@
+# church/management/commands/reconcile_donations.py
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from church.reconciliation import DEFAULT_WINDOW_DAYS, StatementError, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Verify pending donations against a bank statement CSV export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV export of the account statement')
+        parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS,
+                            help=f'Days either side of a credit to look for a donation of the same amount (default: {DEFAULT_WINDOW_DAYS})')
+        parser.add_argument('--notify', action='store_true', help='Email donors whose donation is verified')
+        parser.add_argument('--dry-run', action='store_true', help='Report the matches without changing any donation')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.monotonic()
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                result = reconcile_statement(
+                    f,
+                    window_days=max(options['window_days'], 0),
+                    dry_run=options['dry_run'],
+                    notify=options['notify'],
+                )
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist')
+        except (StatementError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(f'Could not read {path}: {e}')
+
+        elapsed = time.monotonic() - started
+        rate = result.lines / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.summary()} ({elapsed:.1f}s, {rate:.0f} credits/s)'
+            + (', nothing written' if options['dry_run'] else '')
+        ))
+        if result.emails_sent:
+            self.stdout.write(f'{result.emails_sent} donors emailed.')
+        if result.review and not options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                'Donations flagged for review are listed under status "Needs Review" in the admin.'
+            ))
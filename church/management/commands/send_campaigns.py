@@ -0,0 +1,41 @@
+# church/management/commands/send_campaigns.py
+import time
+
+from django.core.management.base import BaseCommand
+from church.models import Campaign
+from church.newsletter import send_campaign
+
+
+class Command(BaseCommand):
+    help = 'Send queued newsletter campaigns in throttled batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per batch (default: 100)')
+        parser.add_argument('--rate', type=int, default=600, help='Maximum emails per minute, 0 for no limit (default: 600)')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for newly queued campaigns')
+        parser.add_argument('--poll-interval', type=int, default=30, help='Seconds between polls with --loop (default: 30)')
+
+    def handle(self, *args, **options):
+        while True:
+            # 'sending' campaigns were interrupted mid-run; resume them first
+            campaigns = Campaign.objects.filter(status__in=['sending', 'queued']).order_by('-status', 'queued_at')
+            for campaign in campaigns:
+                self.stdout.write(f'Sending "{campaign.subject}"...')
+                started = time.monotonic()
+                processed = send_campaign(
+                    campaign,
+                    batch_size=options['batch_size'],
+                    rate_per_minute=options['rate'],
+                    log=self.stdout.write,
+                )
+                campaign.refresh_from_db()
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'"{campaign.subject}" {campaign.get_status_display().lower()}: '
+                    f'{campaign.sent_count} sent, {campaign.failed_count} failed '
+                    f'({processed} processed in {elapsed:.1f}s)'
+                ))
+
+            if not options['loop']:
+                break
+            time.sleep(options['poll_interval'])
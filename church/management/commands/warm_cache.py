@@ -0,0 +1,19 @@
+# church/management/commands/warm_cache.py
+import time
+
+from django.core.management.base import BaseCommand
+from church import warmup
+
+
+class Command(BaseCommand):
+    help = 'Prime the caches the public pages use (run after each deploy)'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        results = warmup.warm(log=self.stdout.write)
+        elapsed = time.monotonic() - started
+
+        failed = [label for label, seconds, error in results if error]
+        self.stdout.write(self.style.SUCCESS(f'Caches warmed in {elapsed:.2f}s'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"Failed steps: {', '.join(failed)}"))
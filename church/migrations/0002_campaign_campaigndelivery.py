@@ -0,0 +1,53 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('body_html', models.TextField(help_text='HTML body of the newsletter. The unsubscribe footer is added automatically.')),
+                ('body_text', models.TextField(blank=True, help_text='Optional plain-text version. Generated from the HTML if left blank.')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('sending', 'Sending'), ('paused', 'Paused'), ('sent', 'Sent')], default='draft', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('queued_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('total_recipients', models.PositiveIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Newsletter Campaign',
+                'verbose_name_plural': 'Newsletter Campaigns',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=10)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='church.campaign')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='church.newsletter')),
+            ],
+            options={
+                'verbose_name': 'Campaign Delivery',
+                'verbose_name_plural': 'Campaign Deliveries',
+                'indexes': [models.Index(fields=['campaign', 'status'], name='church_camp_campaig_6b3fc0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'subscriber'), name='unique_campaign_subscriber')],
+            },
+        ),
+    ]
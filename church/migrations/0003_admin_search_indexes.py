@@ -0,0 +1,82 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+
+# Indexes backing the admin search (PostgreSQL only): prefix search with
+# '^field' compiles to UPPER(field::text) LIKE UPPER('term%'), and full-text
+# search to to_tsvector('english', COALESCE(field, '')) @@ query.
+PREFIX_INDEXES = [
+    ('church_prayerrequest', 'name'),
+    ('church_prayerrequest', 'email'),
+    ('church_contactmessage', 'name'),
+    ('church_contactmessage', 'email'),
+    ('church_contactmessage', 'subject'),
+    ('church_donation', 'donor_name'),
+    ('church_donation', 'donor_email'),
+    ('church_donation', 'transaction_reference'),
+]
+
+FULLTEXT_INDEXES = [
+    ('church_prayerrequest', 'request_text'),
+    ('church_contactmessage', 'message'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_prefix_idx '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+    for table, column in FULLTEXT_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_{column}_fts_idx '
+            f"ON {table} USING gin (to_tsvector('english'::regconfig, COALESCE({column}, '')))"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_prefix_idx')
+    for table, column in FULLTEXT_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{column}_fts_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0002_campaign_campaigndelivery'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at'], name='church_cont_created_b094c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['status', '-created_at'], name='church_cont_status_b048fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['-created_at'], name='church_dona_created_48ce57_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['status', '-created_at'], name='church_dona_status_f91fea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(fields=['-created_at'], name='church_pray_created_c6dd0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prayerrequest',
+            index=models.Index(fields=['status', '-created_at'], name='church_pray_status_1e1daa_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
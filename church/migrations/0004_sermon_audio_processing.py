@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0003_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_loudness',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_low',
+            field=models.FileField(blank=True, null=True, upload_to='sermons/audio/low/'),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_peaks',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_processed_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='audio_status',
+            field=models.CharField(blank=True, choices=[('', 'Not processed'), ('pending', 'Processing'), ('done', 'Processed'), ('failed', 'Failed')], default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0004_sermon_audio_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
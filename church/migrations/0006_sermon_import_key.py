@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0005_event_sermon_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sermon',
+            name='import_key',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True, unique=True),
+        ),
+    ]
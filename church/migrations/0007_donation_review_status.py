@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0006_sermon_import_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='donation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending Verification'), ('review', 'Needs Review'), ('verified', 'Verified'), ('rejected', 'Rejected')], default='pending', max_length=20),
+        ),
+    ]
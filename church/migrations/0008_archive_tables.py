@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:02
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0007_donation_review_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedContactMessage',
+            fields=[
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254, validators=[django.core.validators.EmailValidator()])),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('subject', models.CharField(default='General Inquiry', max_length=200)),
+                ('message', models.TextField()),
+                ('status', models.CharField(choices=[('new', 'New'), ('read', 'Read'), ('replied', 'Replied')], default='new', max_length=10)),
+                ('admin_notes', models.TextField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Contact Message',
+                'verbose_name_plural': 'Archived Contact Messages',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='church_arch_created_117de6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPrayerRequest',
+            fields=[
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True, validators=[django.core.validators.EmailValidator()])),
+                ('request_text', models.TextField()),
+                ('privacy', models.CharField(choices=[('public', 'Public'), ('private', 'Private')], default='private', max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('praying', 'Being Prayed For'), ('answered', 'Answered')], default='pending', max_length=10)),
+                ('admin_notes', models.TextField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Prayer Request',
+                'verbose_name_plural': 'Archived Prayer Requests',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['-created_at'], name='church_arch_created_1c5a48_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0008_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='unsubscribed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
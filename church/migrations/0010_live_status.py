@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0009_newsletter_unsubscribed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_live', models.BooleanField(default=False)),
+                ('title', models.CharField(blank=True, help_text='Shown to viewers while live, e.g. "Sunday Service"', max_length=200)),
+                ('stream_url', models.URLField(blank=True, help_text='Embed URL of the stream, e.g. https://www.youtube.com/embed/VIDEO_ID')),
+                ('started_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Live Status',
+                'verbose_name_plural': 'Live Status',
+            },
+        ),
+    ]
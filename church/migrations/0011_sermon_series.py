@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+from django.utils.text import slugify
+
+
+def create_series(apps, schema_editor):
+    """One SermonSeries per distinct Sermon.series, with its sermons linked"""
+    Sermon = apps.get_model('church', 'Sermon')
+    SermonSeries = apps.get_model('church', 'SermonSeries')
+    slugs = set()
+    by_name = {}
+    for value in Sermon.objects.exclude(series__isnull=True).order_by().values_list('series', flat=True).distinct():
+        name = value.strip()
+        if not name:
+            continue
+        if name not in by_name:
+            base = slug = slugify(name)[:100] or 'series'
+            number = 2
+            while slug in slugs:
+                slug = f'{base}-{number}'
+                number += 1
+            slugs.add(slug)
+            by_name[name] = SermonSeries.objects.create(name=name, slug=slug)
+        Sermon.objects.filter(series=value).update(sermon_series=by_name[name])
+
+    for row in Sermon.objects.exclude(sermon_series=None).values('sermon_series').annotate(
+        count=Count('pk'), first=Min('date_preached'), last=Max('date_preached')
+    ):
+        cover = (
+            Sermon.objects.filter(sermon_series=row['sermon_series'])
+            .order_by('-is_featured', '-date_preached', '-pk').values_list('pk', flat=True).first()
+        )
+        SermonSeries.objects.filter(pk=row['sermon_series']).update(
+            sermon_count=row['count'], first_preached=row['first'], last_preached=row['last'], cover_sermon=cover,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0010_live_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SermonSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('slug', models.SlugField(max_length=110, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('sermon_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('first_preached', models.DateField(blank=True, editable=False, null=True)),
+                ('last_preached', models.DateField(blank=True, editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cover_sermon', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='church.sermon')),
+            ],
+            options={
+                'verbose_name': 'Sermon Series',
+                'verbose_name_plural': 'Sermon Series',
+                'ordering': ['-last_preached', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='sermon',
+            name='sermon_series',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sermons', to='church.sermonseries'),
+        ),
+        migrations.AddIndex(
+            model_name='sermon',
+            index=models.Index(fields=['sermon_series', '-date_preached'], name='church_serm_sermon__6bddda_idx'),
+        ),
+        migrations.RunPython(create_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0011_sermon_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SermonRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='church.sermon')),
+                ('sermon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='church.sermon')),
+            ],
+            options={
+                'verbose_name': 'Sermon Recommendation',
+                'verbose_name_plural': 'Sermon Recommendations',
+                'ordering': ['sermon', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('sermon', 'rank'), name='unique_sermon_recommendation_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_references(apps, schema_editor):
+    """Ranges for the references already stored on sermons and Bible verses"""
+    from church.scripture import BOOK, parse
+
+    Sermon = apps.get_model('church', 'Sermon')
+    BibleVerse = apps.get_model('church', 'BibleVerse')
+    ScriptureRange = apps.get_model('church', 'ScriptureRange')
+    rows = []
+    for owner_field, model, field in (('sermon_id', Sermon, 'scripture_reference'), ('bible_verse_id', BibleVerse, 'reference')):
+        for pk, text in model.objects.values_list('pk', field).iterator(chunk_size=2000):
+            rows.extend(
+                ScriptureRange(**{owner_field: pk}, book=start // BOOK, start=start, end=end)
+                for start, end in parse(text)
+            )
+    ScriptureRange.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0012_sermon_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScriptureRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book', models.PositiveSmallIntegerField()),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('bible_verse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scripture_ranges', to='church.bibleverse')),
+                ('sermon', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scripture_ranges', to='church.sermon')),
+            ],
+            options={
+                'verbose_name': 'Scripture Range',
+                'verbose_name_plural': 'Scripture Ranges',
+                'ordering': ['start', 'end'],
+                'indexes': [models.Index(fields=['book', 'start', 'end'], name='church_scripture_overlap_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('bible_verse__isnull', True), ('sermon__isnull', False)), models.Q(('bible_verse__isnull', False), ('sermon__isnull', True)), _connector='OR'), name='scripture_range_one_owner')],
+            },
+        ),
+        migrations.RunPython(index_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0013_scripture_ranges'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bibleverse',
+            name='verse_text',
+            field=models.TextField(blank=True),
+        ),
+    ]
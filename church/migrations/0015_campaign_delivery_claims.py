@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('church', '0014_bibleverse_text_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaigndelivery',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='campaigndelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=10),
+        ),
+    ]
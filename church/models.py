@@ -1,12 +1,11 @@
 # church/models.py
-from django.db import models
+from django.db import models, connection, transaction, IntegrityError
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import EmailValidator
-from PIL import Image
 
 
-class PrayerRequest(models.Model):
+class AbstractPrayerRequest(models.Model):
     PRIVACY_CHOICES = [
         ('public', 'Public'),
         ('private', 'Private'),
@@ -28,14 +27,40 @@ class PrayerRequest(models.Model):
     admin_notes = models.TextField(blank=True, null=True)
     
     class Meta:
-        ordering = ['-created_at']
-        verbose_name = 'Prayer Request'
-        verbose_name_plural = 'Prayer Requests'
+        abstract = True
     
     def __str__(self):
         return f"Prayer request from {self.name} - {self.created_at.strftime('%Y-%m-%d')}"
 
 
+class PrayerRequest(AbstractPrayerRequest):
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Prayer Request'
+        verbose_name_plural = 'Prayer Requests'
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
+
+
+class ArchivedPrayerRequest(AbstractPrayerRequest):
+    """An answered prayer request moved out of PrayerRequest (see church/archive.py)"""
+    # The original id, and timestamps copied as they were
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Prayer Request'
+        verbose_name_plural = 'Archived Prayer Requests'
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+
 class Testimony(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending Review'),
@@ -70,7 +95,7 @@ class Testimony(models.Model):
         self.save()
 
 
-class ContactMessage(models.Model):
+class AbstractContactMessage(models.Model):
     STATUS_CHOICES = [
         ('new', 'New'),
         ('read', 'Read'),
@@ -87,14 +112,38 @@ class ContactMessage(models.Model):
     admin_notes = models.TextField(blank=True, null=True)
     
     class Meta:
-        ordering = ['-created_at']
-        verbose_name = 'Contact Message'
-        verbose_name_plural = 'Contact Messages'
+        abstract = True
     
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
 
 
+class ContactMessage(AbstractContactMessage):
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Contact Message'
+        verbose_name_plural = 'Contact Messages'
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
+
+
+class ArchivedContactMessage(AbstractContactMessage):
+    """A replied contact message moved out of ContactMessage (see church/archive.py)"""
+    id = models.BigIntegerField(primary_key=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Contact Message'
+        verbose_name_plural = 'Archived Contact Messages'
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+
 class Donation(models.Model):
     DONATION_TYPES = [
         ('tithe', 'Tithes & Offerings'),
@@ -105,6 +154,8 @@ class Donation(models.Model):
     
     STATUS_CHOICES = [
         ('pending', 'Pending Verification'),
+        # Set by bank statement reconciliation when a match is unclear
+        ('review', 'Needs Review'),
         ('verified', 'Verified'),
         ('rejected', 'Rejected'),
     ]
@@ -125,6 +176,10 @@ class Donation(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Donation'
         verbose_name_plural = 'Donations'
+        indexes = [
+            models.Index(fields=['-created_at']),
+            models.Index(fields=['status', '-created_at']),
+        ]
     
     def __str__(self):
         return f"₦{self.amount} donation from {self.donor_name} ({self.donation_type})"
@@ -132,6 +187,8 @@ class Donation(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         if self.receipt_image:
+            # Pillow is only needed here, so keep it out of every process's startup
+            from PIL import Image
             img = Image.open(self.receipt_image.path)
             if img.height > 1000 or img.width > 1000:
                 output_size = (1000, 1000)
@@ -160,6 +217,7 @@ class Event(models.Model):
     is_recurring = models.BooleanField(default=False)
     recurring_pattern = models.CharField(max_length=50, blank=True, null=True)  # weekly, monthly, etc.
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['date', 'start_time']
@@ -193,6 +251,29 @@ class Ministry(models.Model):
         return self.name
 
 
+class SermonSeries(models.Model):
+    """A sermon series; the counts, dates and cover are kept up to date by church.series"""
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=110, unique=True)
+    description = models.TextField(blank=True)
+    sermon_count = models.PositiveIntegerField(default=0, editable=False)
+    first_preached = models.DateField(null=True, blank=True, editable=False)
+    last_preached = models.DateField(null=True, blank=True, editable=False)
+    # The featured sermon of the series, else its latest
+    cover_sermon = models.ForeignKey(
+        'Sermon', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-last_preached', 'name']
+        verbose_name = 'Sermon Series'
+        verbose_name_plural = 'Sermon Series'
+
+    def __str__(self):
+        return self.name
+
+
 class Sermon(models.Model):
     title = models.CharField(max_length=200)
     preacher = models.CharField(max_length=100, default='Pastor')
@@ -202,20 +283,66 @@ class Sermon(models.Model):
     video_url = models.URLField(blank=True, null=True)
     date_preached = models.DateField()
     series = models.CharField(max_length=100, blank=True, null=True)
+    # The SermonSeries named by series, linked when the sermon is saved
+    # (indexed with date_preached in Meta.indexes)
+    sermon_series = models.ForeignKey(
+        SermonSeries, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='sermons', db_index=False,
+    )
     is_featured = models.BooleanField(default=False)
     download_count = models.IntegerField(default=0)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set by the import_sermons command so re-importing a file updates rather than duplicates
+    import_key = models.CharField(max_length=150, unique=True, null=True, blank=True, editable=False)
+
+    # Filled in by church.audio after audio_file is uploaded
+    AUDIO_STATUS_CHOICES = [
+        ('', 'Not processed'),
+        ('pending', 'Processing'),
+        ('done', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
+    audio_status = models.CharField(max_length=10, choices=AUDIO_STATUS_CHOICES, blank=True, default='')
+    audio_processed_name = models.CharField(max_length=255, blank=True, default='')
+    audio_low = models.FileField(upload_to='sermons/audio/low/', blank=True, null=True)
+    audio_duration = models.FloatField(null=True, blank=True)  # seconds
+    audio_loudness = models.FloatField(null=True, blank=True)  # RMS level in dBFS
+    audio_peaks = models.JSONField(null=True, blank=True)  # waveform peaks, 0..1
+
     class Meta:
         ordering = ['-date_preached']
         verbose_name = 'Sermon'
         verbose_name_plural = 'Sermons'
+        indexes = [
+            models.Index(fields=['sermon_series', '-date_preached']),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.date_preached}"
 
 
+class SermonRecommendation(models.Model):
+    """A precomputed related sermon (see church.recommendations)"""
+    sermon = models.ForeignKey(Sermon, on_delete=models.CASCADE, related_name='recommendations')
+    related = models.ForeignKey(Sermon, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['sermon', 'rank']
+        verbose_name = 'Sermon Recommendation'
+        verbose_name_plural = 'Sermon Recommendations'
+        constraints = [
+            models.UniqueConstraint(fields=['sermon', 'rank'], name='unique_sermon_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.sermon_id} -> {self.related_id} ({self.score:.2f})"
+
+
 class BibleVerse(models.Model):
-    verse_text = models.TextField()
+    verse_text = models.TextField(blank=True)
     reference = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -229,10 +356,42 @@ class BibleVerse(models.Model):
         return f"{self.reference}"
 
 
+class ScriptureRange(models.Model):
+    """A passage a sermon or Bible verse refers to, as inclusive verse ids (see church.scripture)"""
+    sermon = models.ForeignKey(Sermon, on_delete=models.CASCADE, null=True, blank=True, related_name='scripture_ranges')
+    bible_verse = models.ForeignKey(BibleVerse, on_delete=models.CASCADE, null=True, blank=True, related_name='scripture_ranges')
+    book = models.PositiveSmallIntegerField()
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['start', 'end']
+        verbose_name = 'Scripture Range'
+        verbose_name_plural = 'Scripture Ranges'
+        indexes = [
+            # Overlap queries: book = ? AND start <= end of passage AND end >= start of passage
+            models.Index(fields=['book', 'start', 'end'], name='church_scripture_overlap_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(sermon__isnull=False, bible_verse__isnull=True)
+                    | models.Q(sermon__isnull=True, bible_verse__isnull=False)
+                ),
+                name='scripture_range_one_owner',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.start}-{self.end}"
+
+
 class Newsletter(models.Model):
     email = models.EmailField(unique=True, validators=[EmailValidator()])
     subscribed_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
+    # When is_active last went False; inactive rows are purged some time after
+    unsubscribed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-subscribed_at']
@@ -242,6 +401,104 @@ class Newsletter(models.Model):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def subscribe(cls, email):
+        """
+        Subscribe an email address, reactivating it if it was unsubscribed.
+
+        Returns 'created', 'reactivated' or 'exists'. On PostgreSQL this is a
+        single INSERT ... ON CONFLICT statement, so concurrent double submits
+        cannot hit the unique constraint.
+        """
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (email, subscribed_at, is_active) "
+                    f"VALUES (%s, %s, TRUE) "
+                    f"ON CONFLICT (email) DO UPDATE SET is_active = TRUE, unsubscribed_at = NULL "
+                    f"WHERE {table}.is_active = FALSE "
+                    f"RETURNING (xmax = 0)",
+                    [email, timezone.now()],
+                )
+                row = cursor.fetchone()
+            if row is None:
+                # Conflict with an active row: nothing was changed
+                return 'exists'
+            return 'created' if row[0] else 'reactivated'
+
+        try:
+            with transaction.atomic():
+                subscriber, created = cls.objects.get_or_create(email=email)
+        except IntegrityError:
+            subscriber, created = cls.objects.get(email=email), False
+        if created:
+            return 'created'
+        if cls.objects.filter(pk=subscriber.pk, is_active=False).update(is_active=True, unsubscribed_at=None):
+            return 'reactivated'
+        return 'exists'
+
+
+class Campaign(models.Model):
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('paused', 'Paused'),
+        ('sent', 'Sent'),
+    ]
+
+    subject = models.CharField(max_length=200)
+    body_html = models.TextField(help_text='HTML body of the newsletter. The unsubscribe footer is added automatically.')
+    body_text = models.TextField(blank=True, help_text='Optional plain-text version. Generated from the HTML if left blank.')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
+    created_at = models.DateTimeField(auto_now_add=True)
+    queued_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Newsletter Campaign'
+        verbose_name_plural = 'Newsletter Campaigns'
+
+    def __str__(self):
+        return self.subject
+
+
+class CampaignDelivery(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        # Claimed by a worker that is sending it now
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='deliveries')
+    subscriber = models.ForeignKey(Newsletter, on_delete=models.CASCADE, related_name='deliveries')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = 'Campaign Delivery'
+        verbose_name_plural = 'Campaign Deliveries'
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'subscriber'], name='unique_campaign_subscriber'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign} -> {self.subscriber} ({self.status})"
+
 
 class ChurchSettings(models.Model):
     site_name = models.CharField(max_length=200, default='World of Prayer Bible International Church')
@@ -271,4 +528,30 @@ class ChurchSettings(models.Model):
         if not self.pk and ChurchSettings.objects.exists():
             # Only allow one instance
             raise ValueError('Only one ChurchSettings instance is allowed.')
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class LiveStatus(models.Model):
+    """Whether the live stream is on air; admins switch it on and off"""
+    is_live = models.BooleanField(default=False)
+    title = models.CharField(max_length=200, blank=True, help_text='Shown to viewers while live, e.g. "Sunday Service"')
+    stream_url = models.URLField(blank=True, help_text='Embed URL of the stream, e.g. https://www.youtube.com/embed/VIDEO_ID')
+    started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Live Status'
+        verbose_name_plural = 'Live Status'
+
+    def __str__(self):
+        return f"Live: {self.title or 'stream'}" if self.is_live else 'Off air'
+
+    def save(self, *args, **kwargs):
+        if not self.pk and LiveStatus.objects.exists():
+            # Only allow one instance
+            raise ValueError('Only one LiveStatus instance is allowed.')
+        if self.is_live and not self.started_at:
+            self.started_at = timezone.now()
+        elif not self.is_live:
+            self.started_at = None
+        super().save(*args, **kwargs)
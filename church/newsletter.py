@@ -0,0 +1,229 @@
+# church/newsletter.py
+"""
+Newsletter campaign delivery.
+
+A campaign is rendered once; per recipient only the unsubscribe link is
+substituted. Delivery rows are created up front so a worker that stops half
+way picks up where it left off, and subscribers are streamed from the
+database in batches so the list never has to fit in memory. Each batch is
+claimed in a short transaction and every outcome is stored as soon as the
+message is sent, so a crash never causes a message to be sent twice.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Campaign, CampaignDelivery, Newsletter
+
+
+UNSUBSCRIBE_SALT = 'church.newsletter.unsubscribe'
+UNSUBSCRIBE_PLACEHOLDER = '%%UNSUBSCRIBE_URL%%'
+# A delivery claimed longer ago than this belongs to a worker that stopped
+CLAIM_TIMEOUT = datetime.timedelta(hours=1)
+
+
+def make_unsubscribe_token(subscriber):
+    """Signed token identifying a subscriber, used in one-click unsubscribe links"""
+    return signing.Signer(salt=UNSUBSCRIBE_SALT).sign(str(subscriber.pk))
+
+
+def read_unsubscribe_token(token):
+    """Return the subscriber id for a token, or None if it has been tampered with"""
+    try:
+        return int(signing.Signer(salt=UNSUBSCRIBE_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def unsubscribe_url(subscriber):
+    path = reverse('newsletter_unsubscribe', args=[make_unsubscribe_token(subscriber)])
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def send_welcome_email(email):
+    """Welcome message for new subscribers (run through church.tasks.run_async)"""
+    send_mail(
+        'Welcome to WOPBIC Newsletter',
+        f'''
+        Dear Subscriber,
+        
+        Thank you for subscribing to the World of Prayer Bible International Church newsletter!
+        
+        You will now receive updates about:
+        - Upcoming events and services
+        - New sermon releases
+        - Prayer requests and testimonies
+        - Church announcements
+        
+        God bless you!
+        
+        WOPBIC Team
+        ''',
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        fail_silently=True,
+    )
+
+
+def render_campaign(campaign):
+    """Render the campaign once; returns (html, text) with an unsubscribe placeholder"""
+    html = render_to_string('church/email/campaign.html', {
+        'campaign': campaign,
+        'body_html': campaign.body_html,
+        'unsubscribe_url': UNSUBSCRIBE_PLACEHOLDER,
+    })
+    body_text = campaign.body_text or strip_tags(campaign.body_html)
+    text = f"{body_text.strip()}\n\n--\nUnsubscribe: {UNSUBSCRIBE_PLACEHOLDER}\n"
+    return html, text
+
+
+def queue_deliveries(campaign, batch_size=1000):
+    """Create a pending delivery row for every active subscriber (idempotent)"""
+    subscriber_ids = (
+        Newsletter.objects.filter(is_active=True)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    batch = []
+    for subscriber_id in subscriber_ids:
+        batch.append(CampaignDelivery(campaign=campaign, subscriber_id=subscriber_id))
+        if len(batch) >= batch_size:
+            CampaignDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        CampaignDelivery.objects.bulk_create(batch, ignore_conflicts=True)
+
+    total = campaign.deliveries.count()
+    Campaign.objects.filter(pk=campaign.pk).update(total_recipients=total)
+    campaign.total_recipients = total
+    return total
+
+
+def build_message(campaign, rendered, subscriber, connection):
+    html, text = rendered
+    url = unsubscribe_url(subscriber)
+    message = EmailMultiAlternatives(
+        campaign.subject,
+        text.replace(UNSUBSCRIBE_PLACEHOLDER, url),
+        settings.DEFAULT_FROM_EMAIL,
+        [subscriber.email],
+        connection=connection,
+        headers={
+            'List-Unsubscribe': f'<{url}>',
+            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+        },
+    )
+    message.attach_alternative(html.replace(UNSUBSCRIBE_PLACEHOLDER, url), 'text/html')
+    return message
+
+
+def record_delivery(delivery, status, error=''):
+    """Store one delivery's outcome as soon as it is known"""
+    now = timezone.now()
+    CampaignDelivery.objects.filter(pk=delivery.pk).update(
+        status=status, error=error[:255], sent_at=now if status == 'sent' else None,
+    )
+    if status == 'sent':
+        Campaign.objects.filter(pk=delivery.campaign_id).update(sent_count=F('sent_count') + 1)
+    elif status == 'failed':
+        Campaign.objects.filter(pk=delivery.campaign_id).update(failed_count=F('failed_count') + 1)
+
+
+def release_stale_claims(campaign):
+    """
+    Fail deliveries claimed by a worker that stopped before recording them.
+    They may have gone out, so they are not sent again.
+    """
+    stale = campaign.deliveries.filter(status='sending', claimed_at__lt=timezone.now() - CLAIM_TIMEOUT)
+    count = stale.update(status='failed', error='Interrupted while sending; it may have been delivered')
+    if count:
+        Campaign.objects.filter(pk=campaign.pk).update(failed_count=F('failed_count') + count)
+    return count
+
+
+def send_batch(campaign, rendered, connection, batch_size):
+    """Send the next batch of pending deliveries; returns how many were processed"""
+    # Claim the batch and commit, so no row lock is held while talking to SMTP
+    # and a crash part way leaves the sent rows recorded as sent
+    with transaction.atomic():
+        deliveries = list(
+            campaign.deliveries.filter(status='pending')
+            .select_related('subscriber')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('pk')[:batch_size]
+        )
+        if not deliveries:
+            return 0
+        CampaignDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+            status='sending', claimed_at=timezone.now(),
+        )
+
+    for delivery in deliveries:
+        if not delivery.subscriber.is_active:
+            record_delivery(delivery, 'skipped')
+            continue
+        try:
+            connection.send_messages([build_message(campaign, rendered, delivery.subscriber, connection)])
+        except Exception as e:
+            record_delivery(delivery, 'failed', str(e))
+            # Replace the connection in case the error left it broken
+            connection.close()
+            try:
+                connection.open()
+            except Exception:
+                pass
+        else:
+            record_delivery(delivery, 'sent')
+    return len(deliveries)
+
+
+def send_campaign(campaign, batch_size=100, rate_per_minute=600, log=None):
+    """Deliver a queued (or interrupted) campaign in throttled batches"""
+    if campaign.status == 'queued':
+        # A 'sending' campaign was interrupted; its delivery rows already exist
+        campaign.status = 'sending'
+        campaign.started_at = campaign.started_at or timezone.now()
+        campaign.save(update_fields=['status', 'started_at'])
+        queue_deliveries(campaign)
+    else:
+        release_stale_claims(campaign)
+
+    rendered = render_campaign(campaign)
+    # Minimum time each batch must take to stay under the rate limit
+    batch_interval = batch_size * 60.0 / rate_per_minute if rate_per_minute else 0
+
+    processed = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        while True:
+            started = time.monotonic()
+            count = send_batch(campaign, rendered, connection, batch_size)
+            if not count:
+                break
+            processed += count
+            if log:
+                log(f'  {campaign.subject}: {processed} processed')
+
+            # Stop if an admin paused the campaign mid-run
+            if Campaign.objects.filter(pk=campaign.pk, status='paused').exists():
+                return processed
+
+            elapsed = time.monotonic() - started
+            if elapsed < batch_interval:
+                time.sleep(batch_interval - elapsed)
+    finally:
+        connection.close()
+
+    Campaign.objects.filter(pk=campaign.pk).update(status='sent', finished_at=timezone.now())
+    return processed
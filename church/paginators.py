@@ -0,0 +1,56 @@
+# church/paginators.py
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) on large unfiltered tables.
+
+    On PostgreSQL the row count of an unfiltered queryset is read from the
+    planner statistics in pg_class, which is instant but only as fresh as the
+    last ANALYZE. Small tables, filtered querysets and other databases still
+    get an exact count.
+    """
+
+    # Below this many rows an exact count is cheap enough
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self._estimated_count()
+        if estimate is not None and estimate >= self.exact_count_threshold:
+            return estimate
+        return super().count
+
+    def _estimated_count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.where or query.distinct or query.combinator:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for tables that have never been analyzed
+        if row is None or row[0] < 0:
+            return None
+        return row[0]
+
+
+class KnownCountPaginator(Paginator):
+    """Paginator for a queryset whose size is already stored, e.g. SermonSeries.sermon_count"""
+
+    def __init__(self, object_list, per_page, known_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = known_count
+
+    @cached_property
+    def count(self):
+        return self.known_count
@@ -0,0 +1,240 @@
+# church/recommendations.py
+"""
+Related sermons, precomputed.
+
+Each sermon's title, summary, scripture reference and preacher are turned
+into a TF-IDF vector (terms that appear in only one sermon cannot relate two
+sermons and are dropped, and the vocabulary is capped at MAX_FEATURES). A
+sermon has a few dozen terms, so the L2-normalised vectors are kept sparse,
+by row and by term: about 3 MB for 5,000 sermons, where a dense matrix was
+80 MB. A row's cosine similarities are summed over the sermons sharing its
+terms, and argpartition picks its TOP_K neighbours without sorting them
+all. The results are stored in
+SermonRecommendation, and the sermon page reads them in one indexed query.
+
+build_recommendations recomputes every sermon. When a sermon is saved or
+deleted only the rows it can affect are recomputed: the sermon itself, the
+sermons that listed it, and the sermons it is now closer to than their
+weakest neighbour. The prerendered pages of the sermons whose list changed
+are rebuilt afterwards.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from . import snapshots
+from .models import Sermon, SermonRecommendation
+
+
+# Neighbours stored per sermon
+TOP_K = 6
+# Below this cosine similarity two sermons are not related
+MIN_SCORE = 0.05
+MAX_FEATURES = 4096
+WRITE_BATCH_SIZE = 1000
+
+# Each field's terms are counted this many times
+FIELD_WEIGHTS = {'title': 2, 'summary': 1, 'scripture_reference': 2}
+
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = frozenset('''
+    a about after all also an and any are as at be because been but by can did do does for from had has
+    have he her him his how i if in into is it its let me my no not of on or our out over she so than
+    that the their them then there these they this those through to up us was we were what when which
+    who will with you your shall unto thee thou thy ye hath
+'''.split())
+
+_lock = threading.Lock()
+
+
+def tokens(sermon):
+    """The weighted terms of a sermon (a values() row)"""
+    terms = []
+    for field, weight in FIELD_WEIGHTS.items():
+        words = [word for word in TOKEN.findall((sermon[field] or '').lower()) if word not in STOP_WORDS and len(word) > 1]
+        terms.extend(words * weight)
+    # The whole name, so "Pastor John" does not match every "John 3:16"
+    preacher = ' '.join((sermon['preacher'] or '').lower().split())
+    if preacher:
+        terms.append(f'preacher:{preacher}')
+    return terms
+
+
+def corpus():
+    """(sermon pks, term counts per sermon) for every sermon"""
+    pks = []
+    counts = []
+    rows = Sermon.objects.order_by('pk').values('pk', 'title', 'summary', 'scripture_reference', 'preacher')
+    for row in rows.iterator(chunk_size=2000):
+        pks.append(row['pk'])
+        counts.append(Counter(tokens(row)))
+    return pks, counts
+
+
+class TermMatrix:
+    """
+    L2-normalised TF-IDF rows stored sparse: by row (the terms of each
+    sermon) and by column (the sermons using each term).
+    """
+
+    def __init__(self, rows, columns, values, terms):
+        import numpy as np
+
+        self.rows = len(rows)
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.indices = np.array(columns, dtype=np.int32)
+        self.data = np.array(values, dtype=np.float32)
+        order = np.argsort(self.indices, kind='stable')
+        self.column_rows = np.repeat(np.arange(self.rows, dtype=np.int32), lengths)[order]
+        self.column_data = self.data[order]
+        self.column_indptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=terms))))
+
+    def similarities(self, row):
+        """Cosine similarity of one row with every row"""
+        import numpy as np
+
+        start, end = self.indptr[row], self.indptr[row + 1]
+        terms = self.indices[start:end]
+        firsts = self.column_indptr[terms]
+        lengths = self.column_indptr[terms + 1] - firsts
+        # Positions of every (sermon, weight) entry of the row's terms
+        positions = np.repeat(firsts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        weights = np.repeat(self.data[start:end], lengths) * self.column_data[positions]
+        return np.bincount(self.column_rows[positions], weights=weights, minlength=self.rows)
+
+
+def tfidf_matrix(counts):
+    """L2-normalised TF-IDF rows, one per sermon, as a TermMatrix"""
+    total = len(counts)
+    document_frequency = Counter(term for terms in counts for term in terms)
+    vocabulary = [term for term, df in document_frequency.items() if df > 1]
+    vocabulary.sort(key=lambda term: (-document_frequency[term], term))
+    vocabulary = {term: i for i, term in enumerate(vocabulary[:MAX_FEATURES])}
+    idf = {term: math.log((1 + total) / (1 + document_frequency[term])) + 1 for term in vocabulary}
+
+    rows = []
+    columns = []
+    values = []
+    for terms in counts:
+        # Sublinear term frequency: the tenth "faith" adds less than the second
+        row = {vocabulary[term]: (1 + math.log(count)) * idf[term] for term, count in terms.items() if term in vocabulary}
+        norm = math.sqrt(sum(value * value for value in row.values())) or 1
+        rows.append(row)
+        columns.extend(row)
+        values.extend(value / norm for value in row.values())
+    return TermMatrix(rows, columns, values, len(vocabulary))
+
+
+def top_neighbours(matrix, rows):
+    """{row: [(neighbour row, score), ...]} for the given row numbers, best first"""
+    import numpy as np
+
+    k = min(TOP_K, matrix.rows - 1)
+    if k <= 0:
+        return {row: [] for row in rows}
+    neighbours = {}
+    for row in rows:
+        scores = matrix.similarities(row)
+        # A sermon is not related to itself
+        scores[row] = -1
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        neighbours[row] = [(column, score) for column, score in zip(best.tolist(), scores[best].tolist()) if score >= MIN_SCORE]
+    return neighbours
+
+
+def save(pks, neighbours):
+    """Replace the stored recommendations of the sermons in neighbours"""
+    sermon_ids = [pks[row] for row in neighbours]
+    objects = [
+        SermonRecommendation(sermon_id=pks[row], related_id=pks[column], rank=rank, score=score)
+        for row, related in neighbours.items()
+        for rank, (column, score) in enumerate(related, start=1)
+    ]
+    with transaction.atomic():
+        for i in range(0, len(sermon_ids), WRITE_BATCH_SIZE):
+            SermonRecommendation.objects.filter(sermon_id__in=sermon_ids[i:i + WRITE_BATCH_SIZE]).delete()
+        SermonRecommendation.objects.bulk_create(objects, batch_size=WRITE_BATCH_SIZE)
+    return len(objects)
+
+
+def changed_lists(pks, neighbours):
+    """pks of the sermons in neighbours whose stored related sermons would change"""
+    new = {pks[row]: [pks[column] for column, _ in related] for row, related in neighbours.items()}
+    old = {}
+    stored = SermonRecommendation.objects.filter(sermon_id__in=list(new)).order_by('sermon_id', 'rank')
+    for sermon_id, related_id in stored.values_list('sermon_id', 'related_id').iterator(chunk_size=WRITE_BATCH_SIZE):
+        old.setdefault(sermon_id, []).append(related_id)
+    return {pk for pk, related in new.items() if old.get(pk, []) != related}
+
+
+def rebuild():
+    """Recompute the recommendations of every sermon; returns (sermons, rows stored)"""
+    with _lock:
+        pks, counts = corpus()
+        if not pks:
+            SermonRecommendation.objects.all().delete()
+            return 0, 0
+        matrix = tfidf_matrix(counts)
+        neighbours = top_neighbours(matrix, range(len(pks)))
+        return len(pks), save(pks, neighbours)
+
+
+def affected_rows(matrix, index, changed_rows, listing_ids):
+    """Rows whose neighbours may change after the changed rows changed"""
+    import numpy as np
+
+    affected = set(changed_rows)
+    affected.update(index[pk] for pk in listing_ids if pk in index)
+    if not changed_rows:
+        return affected
+    # A sermon takes in a changed sermon that is now closer than its weakest
+    # stored neighbour, or any related one while it has room for more
+    threshold = np.full(matrix.rows, MIN_SCORE)
+    stored = (
+        SermonRecommendation.objects.order_by().values('sermon_id')
+        .annotate(count=Count('pk'), weakest=Min('score'))
+    )
+    for row in stored:
+        if row['sermon_id'] in index and row['count'] >= TOP_K:
+            threshold[index[row['sermon_id']]] = row['weakest']
+    for row in changed_rows:
+        affected.update(np.flatnonzero(matrix.similarities(row) >= threshold).tolist())
+    return affected
+
+
+def update(sermon_ids, listing_ids=()):
+    """
+    Recompute the rows that changes to sermon_ids can affect; listing_ids are
+    sermons that listed a sermon which has since been deleted.
+    """
+    with _lock:
+        pks, counts = corpus()
+        if not pks:
+            return 0
+        index = {pk: row for row, pk in enumerate(pks)}
+        matrix = tfidf_matrix(counts)
+        changed_rows = [index[pk] for pk in sermon_ids if pk in index]
+        listing_ids = set(listing_ids) | set(
+            SermonRecommendation.objects.filter(related_id__in=sermon_ids).values_list('sermon_id', flat=True)
+        )
+        rows = sorted(affected_rows(matrix, index, changed_rows, listing_ids))
+        neighbours = top_neighbours(matrix, rows)
+        # Pages listing a changed sermon show its old title even if the list is the same
+        refresh = changed_lists(pks, neighbours) | {pk for pk in listing_ids | set(sermon_ids) if pk in index}
+        save(pks, neighbours)
+    snapshots.refresh_after_commit(snapshots.sermon_paths(sorted(refresh)))
+    return len(rows)
+
+
+def related_sermons(sermon, limit=3):
+    """The stored related sermons of a sermon, best first"""
+    return [
+        recommendation.related for recommendation in
+        SermonRecommendation.objects.filter(sermon=sermon).select_related('related').order_by('rank')[:limit]
+    ]
@@ -0,0 +1,366 @@
+# church/reconciliation.py
+"""
+Bank statement reconciliation for pending donations.
+
+The donations are loaded once into two hash indexes: one on the transaction
+reference of every donation and one on (amount, day given) of the pending
+ones. Each credit line of a bank CSV export is then matched in a single pass:
+
+1. a line carrying the reference of a donation that is no longer pending
+   (verified, rejected or under review) has been dealt with and is skipped;
+2. a reference from the line's reference/narration columns that equals a
+   donation's reference matches it if the amounts agree; a reference shared
+   by several donations, or with a different amount, is flagged for review;
+3. otherwise the donations of exactly that amount given within a few days of
+   the line are candidates: one is a match, several are flagged for review.
+
+Matches are verified and flagged donations set to 'review' in bulk updates,
+so tens of thousands of lines reconcile in seconds.
+
+Only pending donations are touched, and a line whose reference was matched
+before is skipped rather than matched again by amount, so running the same
+statement again (say after a timeout) verifies nothing twice and emails
+nobody twice. The admin
+sends the donor emails in the background once the updates are committed and
+refuses statements over MAX_ADMIN_LINES; bigger ones go through
+manage.py reconcile_donations.
+"""
+import csv
+import datetime
+import functools
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Donation
+from .tasks import run_async
+
+
+# Header names (lower case) banks use for each column, in order of preference
+DATE_COLUMNS = ('value date', 'transaction date', 'trans date', 'posted date', 'posting date', 'date')
+CREDIT_COLUMNS = ('credit', 'credit amount', 'credits', 'deposit', 'deposits', 'lodgement', 'amount')
+REFERENCE_COLUMNS = ('reference', 'ref', 'transaction reference', 'ref no', 'narration',
+                     'description', 'details', 'remarks', 'transaction details')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%d/%m/%y', '%Y/%m/%d')
+
+# References shorter than this are too likely to appear by chance in a narration
+MIN_REFERENCE_LENGTH = 4
+DEFAULT_WINDOW_DAYS = 3
+UPDATE_BATCH_SIZE = 1000
+# Longest statement the admin reconciles within a request
+MAX_ADMIN_LINES = 20000
+
+NON_ALPHANUMERIC = re.compile(r'[^0-9A-Z]')
+
+
+class StatementError(ValueError):
+    """The file is not a statement we can read"""
+
+
+class StatementLine:
+    def __init__(self, number, date, amount, reference, keys):
+        self.number = number
+        self.date = date
+        self.amount = amount
+        # As shown on the statement, for notes and reports
+        self.reference = reference
+        # Normalised references to look up
+        self.keys = keys
+
+    def describe(self):
+        return f'statement line {self.number} ({self.date:%Y-%m-%d}, ₦{self.amount:,.2f}, {self.reference[:60]})'
+
+
+class Result:
+    def __init__(self):
+        self.lines = 0
+        self.skipped = 0
+        self.unmatched = 0
+        # Lines whose reference belongs to a donation no longer pending
+        self.already_reconciled = 0
+        # donation pk -> StatementLine
+        self.matched = {}
+        # donation pk -> [reason, ...]
+        self.review = {}
+        # Filled in by reconcile_statement()
+        self.verified = 0
+        self.emails_sent = 0
+        self.emails_queued = 0
+
+    def flag(self, pks, reason):
+        for pk in pks:
+            self.review.setdefault(pk, []).append(reason)
+
+    def summary(self):
+        return (f'{self.lines} credits read: {self.verified} donations verified, '
+                f'{len(self.review)} flagged for review, {self.unmatched} credits unmatched, '
+                f'{self.already_reconciled} already reconciled')
+
+
+def normalize_reference(value):
+    return NON_ALPHANUMERIC.sub('', (value or '').upper())
+
+
+def reference_keys(text):
+    """Every way a donor's reference may appear in a reference/narration field"""
+    keys = {normalize_reference(text)}
+    keys.update(normalize_reference(chunk) for chunk in text.split())
+    return {key for key in keys if len(key) >= MIN_REFERENCE_LENGTH}
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value):
+    # Drop a time of day ("03/01/2025 10:22:11")
+    value = value.strip().split(' ')[0] if ':' in value else value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_amount(value):
+    value = (value or '').replace(',', '').replace('₦', '').replace('NGN', '').strip()
+    if not value:
+        return None
+    try:
+        return Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _column(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+def read_statement(f, max_lines=None):
+    """Yield a StatementLine for every credit on a bank CSV export"""
+    reader = csv.reader(f)
+    # Exports often open with a few lines of account details; the header is
+    # the first row naming both a date and an amount column
+    for row in reader:
+        header = [cell.strip().lower() for cell in row]
+        date_col = _column(header, DATE_COLUMNS)
+        amount_col = _column(header, CREDIT_COLUMNS)
+        if date_col is not None and amount_col is not None:
+            break
+    else:
+        raise StatementError('No header row with a date and a credit/amount column found')
+    reference_cols = [i for i, name in enumerate(header) if name in REFERENCE_COLUMNS]
+
+    first = reader.line_num + 1
+    for number, row in enumerate(reader, start=first):
+        if max_lines and number - first >= max_lines:
+            raise StatementError(f'More than {max_lines} lines; use manage.py reconcile_donations or split the file')
+        if len(row) <= max(date_col, amount_col):
+            yield None
+            continue
+        amount = parse_amount(row[amount_col])
+        date = parse_date(row[date_col])
+        if amount is None or amount <= 0 or date is None:
+            # Debits, balance lines and footers
+            yield None
+            continue
+        reference = ' '.join(row[i].strip() for i in reference_cols if i < len(row) and row[i].strip())
+        yield StatementLine(number, date, amount, reference, reference_keys(reference))
+
+
+class DonationIndex:
+    """
+    Donations indexed by reference (all of them, so a reference matched
+    before is recognised) and pending donations by (amount, day given)
+    """
+
+    def __init__(self, donations):
+        # Pending donations only
+        self.amounts = {}
+        self.by_reference = {}
+        self.by_amount_day = {}
+        for pk, amount, reference, created_at, status in donations:
+            key = normalize_reference(reference)
+            if len(key) >= MIN_REFERENCE_LENGTH:
+                self.by_reference.setdefault(key, []).append(pk)
+            if status != 'pending':
+                continue
+            self.amounts[pk] = amount
+            day = timezone.localdate(created_at)
+            self.by_amount_day.setdefault((amount, day), []).append(pk)
+
+    @classmethod
+    def load(cls):
+        return cls(
+            Donation.objects.values_list('pk', 'amount', 'transaction_reference', 'created_at', 'status')
+            .order_by().iterator(chunk_size=5000)
+        )
+
+    def is_pending(self, pk):
+        return pk in self.amounts
+
+    def by_reference_keys(self, keys):
+        return {pk for key in keys for pk in self.by_reference.get(key, ())}
+
+    def by_amount_near(self, amount, date, window_days):
+        pks = []
+        for offset in range(-window_days, window_days + 1):
+            pks.extend(self.by_amount_day.get((amount, date + datetime.timedelta(days=offset)), ()))
+        return pks
+
+
+def reconcile(lines, index, window_days=DEFAULT_WINDOW_DAYS):
+    """Match statement lines against a DonationIndex in one pass"""
+    result = Result()
+    claimed = {}
+    for line in lines:
+        if line is None:
+            result.skipped += 1
+            continue
+        result.lines += 1
+
+        by_reference = index.by_reference_keys(line.keys)
+        if any(not index.is_pending(pk) for pk in by_reference):
+            # Matched on an earlier run or handled by hand; it must not fall
+            # through to another donation of the same amount
+            result.already_reconciled += 1
+            continue
+        if by_reference:
+            same_amount = [pk for pk in by_reference if index.amounts[pk] == line.amount]
+            if len(same_amount) == 1:
+                pk = same_amount[0]
+                if pk in claimed:
+                    # Two credits carry the same reference
+                    result.flag([pk], f'{claimed[pk].describe()} and {line.describe()} both match it')
+                    result.matched.pop(pk, None)
+                else:
+                    claimed[pk] = result.matched[pk] = line
+            elif same_amount:
+                result.flag(same_amount, f'{line.describe()} matches {len(same_amount)} donations by reference')
+            else:
+                result.flag(by_reference, f'{line.describe()} matches the reference but not the amount')
+            continue
+
+        candidates = [pk for pk in index.by_amount_near(line.amount, line.date, window_days) if pk not in claimed]
+        if len(candidates) == 1:
+            claimed[candidates[0]] = result.matched[candidates[0]] = line
+        elif candidates:
+            result.flag(candidates, f'{line.describe()} could be any of {len(candidates)} donations of this amount')
+        else:
+            result.unmatched += 1
+
+    # A donation matched by one line and flagged by another needs a person
+    for pk in result.review:
+        result.matched.pop(pk, None)
+    return result
+
+
+def _note(existing, note):
+    stamp = timezone.localtime().strftime('%Y-%m-%d %H:%M')
+    line = f'[Reconciliation {stamp}] {note}'
+    return f'{existing}\n{line}' if existing else line
+
+
+def save_notes(donations):
+    # One prepared UPDATE run for every row; bulk_update() would spend far
+    # longer building its CASE expression than the database spends on it
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {quote(Donation._meta.db_table)} SET {quote('admin_notes')} = %s WHERE {quote(Donation._meta.pk.column)} = %s",
+            [(donation.admin_notes, donation.pk) for donation in donations],
+        )
+
+
+def apply(result):
+    """Verify the matched donations and set the flagged ones to review; returns the verified donations"""
+    now = timezone.now()
+    pks = list(result.matched) + list(result.review)
+    verified = []
+    with transaction.atomic():
+        for i in range(0, len(pks), UPDATE_BATCH_SIZE):
+            # Donations handled by hand since the statement was read are left alone
+            donations = list(Donation.objects.filter(
+                pk__in=pks[i:i + UPDATE_BATCH_SIZE], status='pending'
+            ).select_for_update().only('pk', 'donor_name', 'donor_email', 'donation_type', 'amount',
+                                       'transaction_reference', 'admin_notes'))
+            matched = []
+            flagged = []
+            for donation in donations:
+                if donation.pk in result.matched:
+                    donation.status = 'verified'
+                    donation.verified_at = now
+                    donation.admin_notes = _note(donation.admin_notes, f'Matched {result.matched[donation.pk].describe()}')
+                    matched.append(donation.pk)
+                    verified.append(donation)
+                else:
+                    donation.status = 'review'
+                    donation.admin_notes = _note(donation.admin_notes, '; '.join(result.review[donation.pk]))
+                    flagged.append(donation.pk)
+            # Shared values in plain UPDATEs; only the notes differ per row
+            Donation.objects.filter(pk__in=matched).update(status='verified', verified_at=now)
+            Donation.objects.filter(pk__in=flagged).update(status='review')
+            save_notes(donations)
+    return verified
+
+
+def verification_email(donation):
+    """Email telling a donor their donation has been verified"""
+    return EmailMessage(
+        'Donation Verified - WOPBIC',
+        f'''
+        Dear {donation.donor_name},
+
+        Your donation has been verified and received.
+
+        Donation Details:
+        Type: {donation.get_donation_type_display()}
+        Amount: ₦{donation.amount:,.2f}
+        Reference: {donation.transaction_reference}
+        Verified on: {donation.verified_at.strftime('%Y-%m-%d')}
+
+        Thank you for your generous support to the work of God's kingdom.
+
+        May God bless you abundantly!
+
+        WOPBIC Finance Team
+        ''',
+        settings.DEFAULT_FROM_EMAIL,
+        [donation.donor_email],
+    )
+
+
+def notify_donors(donations):
+    """Send the verification emails over one SMTP connection; returns the number sent"""
+    try:
+        connection = get_connection(fail_silently=True)
+        return connection.send_messages([verification_email(donation) for donation in donations]) or 0
+    except Exception as e:
+        print(f"Verification emails failed: {e}")
+        return 0
+
+
+def reconcile_statement(f, window_days=DEFAULT_WINDOW_DAYS, dry_run=False, notify=False,
+                        notify_in_background=False, max_lines=None):
+    """
+    Read, match and (unless dry_run) apply a statement. The whole file is
+    read before anything is written, so a statement over max_lines changes
+    nothing.
+    """
+    result = reconcile(read_statement(f, max_lines), DonationIndex.load(), window_days)
+    if dry_run:
+        result.verified = len(result.matched)
+        return result
+    verified = apply(result)
+    result.verified = len(verified)
+    if notify and verified and notify_in_background:
+        transaction.on_commit(lambda: run_async(notify_donors, verified))
+        result.emails_queued = len(verified)
+    elif notify and verified:
+        result.emails_sent = notify_donors(verified)
+    return result
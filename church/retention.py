@@ -0,0 +1,149 @@
+# church/retention.py
+"""
+Data retention: rows kept no longer than RETENTION_DAYS allows.
+
+Rows are deleted in small primary-key batches, each in its own short
+transaction with a pause in between, so a purge never holds locks on a
+table the site is writing to for more than a moment. Receipt images go with
+their donations once the batch has committed, and receipt files that no
+donation points at any more are removed as well.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedContactMessage, ContactMessage, Donation, Newsletter, Testimony
+
+
+BATCH_SIZE = 500
+# Seconds between batches, so other queries get the table in between
+PAUSE = 0.1
+# Uploads are written before their donation row commits; leave new files be
+ORPHAN_GRACE = datetime.timedelta(days=1)
+
+
+def _contact_messages(cutoff):
+    return [
+        ContactMessage.objects.filter(created_at__lt=cutoff),
+        ArchivedContactMessage.objects.filter(created_at__lt=cutoff),
+    ]
+
+
+def _rejected_testimonies(cutoff):
+    return [Testimony.objects.filter(status='rejected', created_at__lt=cutoff)]
+
+
+def _rejected_donations(cutoff):
+    return [Donation.objects.filter(status='rejected', created_at__lt=cutoff)]
+
+
+def _inactive_subscribers(cutoff):
+    # Subscribers who left before unsubscribed_at was recorded age from subscribing
+    return [Newsletter.objects.filter(
+        Q(unsubscribed_at__lt=cutoff) | Q(unsubscribed_at__isnull=True, subscribed_at__lt=cutoff),
+        is_active=False,
+    )]
+
+
+# name -> (querysets to purge given a cutoff, file field deleted with the rows)
+POLICIES = {
+    'contact_messages': (_contact_messages, None),
+    'rejected_testimonies': (_rejected_testimonies, None),
+    'rejected_donations': (_rejected_donations, 'receipt_image'),
+    'inactive_subscribers': (_inactive_subscribers, None),
+}
+
+
+def retention_days(name):
+    """Days rows of a policy are kept, or None to keep them forever"""
+    return settings.RETENTION_DAYS.get(name) or None
+
+
+def expired(name):
+    """The querysets of rows past their retention under POLICIES[name]"""
+    days = retention_days(name)
+    if days is None:
+        return []
+    build, file_field = POLICIES[name]
+    return build(timezone.now() - datetime.timedelta(days=days))
+
+
+def delete_files(storage, names):
+    deleted = 0
+    for name in names:
+        try:
+            storage.delete(name)
+            deleted += 1
+        except Exception as e:
+            print(f"Deleting {name} failed: {e}")
+    return deleted
+
+
+def purge_queryset(queryset, file_field=None, batch_size=BATCH_SIZE, pause=PAUSE, log=None):
+    """Delete the rows of queryset in pk batches; returns (rows deleted, files deleted)"""
+    model = queryset.model
+    storage = model._meta.get_field(file_field).storage if file_field else None
+    deleted = files = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        last_pk = pks[-1]
+
+        with transaction.atomic(using=router.db_for_write(model)):
+            # Filtered again: a row may have changed since the pks were read
+            rows = queryset.filter(pk__in=pks)
+            names = list(rows.exclude(**{file_field: ''}).values_list(file_field, flat=True)) if file_field else []
+            count, per_model = rows.delete()
+        deleted += per_model.get(model._meta.label, 0)
+        if names:
+            files += delete_files(storage, [name for name in names if name])
+        if log:
+            log(deleted)
+        if pause:
+            time.sleep(pause)
+    return deleted, files
+
+
+def orphaned_receipts():
+    """Receipt files no donation refers to (older than ORPHAN_GRACE)"""
+    field = Donation._meta.get_field('receipt_image')
+    storage = field.storage
+    directory = field.upload_to.rstrip('/')
+    try:
+        subdirectories, names = storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    referenced = set(
+        Donation.objects.exclude(receipt_image='').exclude(receipt_image__isnull=True)
+        .values_list('receipt_image', flat=True).iterator(chunk_size=5000)
+    )
+    cutoff = timezone.now() - ORPHAN_GRACE
+    orphans = []
+    for name in names:
+        path = f'{directory}/{name}'
+        if path not in referenced and storage.get_modified_time(path) < cutoff:
+            orphans.append(path)
+    return orphans
+
+
+def purge_orphaned_receipts(batch_size=BATCH_SIZE, pause=PAUSE, log=None):
+    """Delete orphaned receipt files in batches; returns the number deleted"""
+    storage = Donation._meta.get_field('receipt_image').storage
+    orphans = orphaned_receipts()
+    deleted = 0
+    for i in range(0, len(orphans), batch_size):
+        deleted += delete_files(storage, orphans[i:i + batch_size])
+        if log:
+            log(deleted)
+        if pause:
+            time.sleep(pause)
+    return deleted
@@ -0,0 +1,45 @@
+# church/routers.py
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_reads(view_func):
+    """Send the reads made while this view runs to the replica database
+
+    Only meant for the read-only public pages, which can tolerate a little
+    replication lag. Writes always go to the primary.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(request.method in ('GET', 'HEAD'))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads from views marked with @replica_reads to the replica"""
+
+    replica_alias = 'replica'
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and self.replica_alias in settings.DATABASES:
+            return self.replica_alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
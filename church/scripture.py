@@ -0,0 +1,308 @@
+# church/scripture.py
+"""
+Scripture references as integer verse ranges.
+
+A verse is numbered book * 1,000,000 + chapter * 1,000 + verse (Romans 8:28
+is 45,008,028), so a reference is a list of inclusive (start, end) ranges: a
+whole chapter runs from verse 0 to 999 and a whole book from chapter 0 to
+999. parse() reads free text such as "Prov 3:5-6", "1 Cor 13", "John 3:16,
+18; 4:1-2" or "Psalm 23 (KJV)", normalising book aliases and carrying the
+book and chapter over from one part of a list to the next.
+
+Each sermon's scripture_reference and each BibleVerse's reference is stored
+as ScriptureRange rows indexed on (book, start, end), so every sermon
+touching a passage is one interval overlap query instead of an icontains
+scan that would miss "Prov 3:5" when looking for "Proverbs 3".
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import BibleVerse, ScriptureRange, Sermon
+
+
+BOOK = 1_000_000
+CHAPTER = 1_000
+LAST = 999
+
+# (name, chapters, aliases), in canonical order; aliases are lower case without spaces or dots
+BOOKS = [
+    ('Genesis', 50, 'gen ge gn'),
+    ('Exodus', 40, 'exod exo'),
+    ('Leviticus', 27, 'lev lv'),
+    ('Numbers', 36, 'num nu nm nb'),
+    ('Deuteronomy', 34, 'deut dt'),
+    ('Joshua', 24, 'josh jos jsh'),
+    ('Judges', 21, 'judg jdg jg jdgs'),
+    ('Ruth', 4, 'rth ru'),
+    ('1 Samuel', 31, '1sam 1sa 1sm'),
+    ('2 Samuel', 24, '2sam 2sa 2sm'),
+    ('1 Kings', 22, '1kgs 1ki 1kin'),
+    ('2 Kings', 25, '2kgs 2ki 2kin'),
+    ('1 Chronicles', 29, '1chron 1chr 1ch'),
+    ('2 Chronicles', 36, '2chron 2chr 2ch'),
+    ('Ezra', 10, 'ezr'),
+    ('Nehemiah', 13, 'neh'),
+    ('Esther', 10, 'esth est'),
+    ('Job', 42, 'jb'),
+    ('Psalms', 150, 'psalm ps psa pss psm'),
+    ('Proverbs', 31, 'prov pro prv pr'),
+    ('Ecclesiastes', 12, 'eccles eccl ecc qoh'),
+    ('Song of Solomon', 8, 'songofsongs song sos canticles cant'),
+    ('Isaiah', 66, 'isa'),
+    ('Jeremiah', 52, 'jer jr'),
+    ('Lamentations', 5, 'lam'),
+    ('Ezekiel', 48, 'ezek eze ezk'),
+    ('Daniel', 12, 'dan dn'),
+    ('Hosea', 14, 'hos'),
+    ('Joel', 3, 'jl'),
+    ('Amos', 9, 'amo'),
+    ('Obadiah', 1, 'obad oba'),
+    ('Jonah', 4, 'jon jnh'),
+    ('Micah', 7, 'mic'),
+    ('Nahum', 3, 'nah'),
+    ('Habakkuk', 3, 'hab hb'),
+    ('Zephaniah', 3, 'zeph zep zp'),
+    ('Haggai', 2, 'hag hg'),
+    ('Zechariah', 14, 'zech zec zc'),
+    ('Malachi', 4, 'mal ml'),
+    ('Matthew', 28, 'matt mat mt'),
+    ('Mark', 16, 'mrk mar mk mr'),
+    ('Luke', 24, 'luk lk'),
+    ('John', 21, 'joh jhn jn'),
+    ('Acts', 28, 'act'),
+    ('Romans', 16, 'rom rm'),
+    ('1 Corinthians', 16, '1cor 1co'),
+    ('2 Corinthians', 13, '2cor 2co'),
+    ('Galatians', 6, 'gal'),
+    ('Ephesians', 6, 'eph ephes'),
+    ('Philippians', 4, 'phil php'),
+    ('Colossians', 4, 'col'),
+    ('1 Thessalonians', 5, '1thess 1thes 1th'),
+    ('2 Thessalonians', 3, '2thess 2thes 2th'),
+    ('1 Timothy', 6, '1tim 1ti'),
+    ('2 Timothy', 4, '2tim 2ti'),
+    ('Titus', 3, 'tit'),
+    ('Philemon', 1, 'philem phm'),
+    ('Hebrews', 13, 'heb'),
+    ('James', 5, 'jas jm'),
+    ('1 Peter', 5, '1pet 1pe 1pt'),
+    ('2 Peter', 3, '2pet 2pe 2pt'),
+    ('1 John', 5, '1jn 1jo 1joh'),
+    ('2 John', 1, '2jn 2jo 2joh'),
+    ('3 John', 1, '3jn 3jo 3joh'),
+    ('Jude', 1, 'jud jd'),
+    ('Revelation', 22, 'rev revelations apocalypse'),
+]
+
+BOOK_NAMES = {number: name for number, (name, chapters, aliases) in enumerate(BOOKS, start=1)}
+BOOK_CHAPTERS = {number: chapters for number, (name, chapters, aliases) in enumerate(BOOKS, start=1)}
+BOOK_SLUGS = {slugify(name): number for number, name in BOOK_NAMES.items()}
+
+
+def _key(name):
+    return re.sub(r'[\s.]+', '', name.lower())
+
+
+BOOK_KEYS = {}
+for _number, (_name, _chapters, _aliases) in enumerate(BOOKS, start=1):
+    BOOK_KEYS[_key(_name)] = _number
+    for _alias in _aliases.split():
+        BOOK_KEYS[_alias] = _number
+
+# Roman numerals and ordinals in front of a book name
+ORDINALS = re.compile(r'^(iii|ii|i|1st|2nd|3rd|first|second|third)(?=[\s.])')
+ORDINAL_NUMBERS = {'i': '1', 'ii': '2', 'iii': '3', '1st': '1', '2nd': '2', '3rd': '3',
+                   'first': '1', 'second': '2', 'third': '3'}
+# Translations and notes that may follow a reference
+NOISE = re.compile(r'\([^)]*\)|\b(?:kjv|nkjv|niv|esv|nlt|amp|msg|nasb|rsv|nrsv|tlb|gnt|cev)\b')
+PART = re.compile(
+    r'^(?P<book>[1-3]?\s*[a-z][a-z\s]*?)?\s*'
+    r'(?:(?P<c1>\d+)(?:\s*[:.]\s*(?P<v1>\d+)[a-f]?)?'
+    r'(?:\s*[-–—]\s*(?:(?P<c2>\d+)\s*[:.]\s*)?(?P<v2>\d+)[a-f]?)?)?$'
+)
+
+
+def book_number(name):
+    """The number (1-66) of a book name, alias or unambiguous prefix, or None"""
+    name = name.strip().lower()
+    match = ORDINALS.match(name)
+    if match:
+        name = ORDINAL_NUMBERS[match.group(1)] + name[match.end():]
+    key = _key(name)
+    if key in BOOK_KEYS:
+        return BOOK_KEYS[key]
+    if len(key) >= 3:
+        numbers = {number for candidate, number in BOOK_KEYS.items() if candidate.startswith(key)}
+        if len(numbers) == 1:
+            return numbers.pop()
+    return None
+
+
+def verse_id(book, chapter, verse):
+    return book * BOOK + chapter * CHAPTER + verse
+
+
+def split_id(value):
+    """(book, chapter, verse) of a verse id"""
+    book, rest = divmod(value, BOOK)
+    chapter, verse = divmod(rest, CHAPTER)
+    return book, chapter, verse
+
+
+def book_range(book, chapter=None):
+    if chapter is None:
+        return verse_id(book, 0, 0), verse_id(book, LAST, LAST)
+    return verse_id(book, chapter, 0), verse_id(book, chapter, LAST)
+
+
+def _part_range(match, book, chapter, had_verse):
+    """(start, end, chapter, had_verse) for one parsed part, or None if it makes no sense"""
+    c1, v1, c2, v2 = (int(value) if value else None for value in match.group('c1', 'v1', 'c2', 'v2'))
+    if c1 is None:
+        # A book on its own
+        return book_range(book) + (None, False)
+    single_chapter = BOOK_CHAPTERS[book] == 1
+    if match.group('book') is None and had_verse and v1 is None and c2 is None:
+        # "John 3:16, 18": a bare number after a verse is another verse
+        c1, v1 = chapter, c1
+    elif single_chapter and v1 is None and c2 is None:
+        # "Jude 3" is a verse: the book has one chapter
+        c1, v1 = 1, c1
+    if c1 < 1 or c1 > BOOK_CHAPTERS[book]:
+        return None
+    if v1 is None:
+        # Whole chapters: "Romans 8" or "Romans 8-9"
+        end_chapter = v2 if v2 is not None else c1
+        if c2 is not None or end_chapter < c1 or end_chapter > BOOK_CHAPTERS[book]:
+            return None
+        return verse_id(book, c1, 0), verse_id(book, end_chapter, LAST), end_chapter, False
+    end_chapter = c2 if c2 is not None else c1
+    end_verse = v2 if v2 is not None else v1
+    start, end = verse_id(book, c1, v1), verse_id(book, end_chapter, end_verse)
+    if end < start or end_chapter > BOOK_CHAPTERS[book]:
+        return None
+    return start, end, end_chapter, True
+
+
+def parse(text, require_chapter=False):
+    """
+    Inclusive (start, end) verse id ranges for a free-text reference, or []
+    if any part of it cannot be read. With require_chapter, a book name on
+    its own ("John") is not taken as a reference.
+    """
+    text = NOISE.sub(' ', (text or '').lower())
+    # "Prov. 3:5" and "I. Cor 13", but not "3.5"
+    text = re.sub(r'(?<=[a-z])\.', ' ', text)
+    text = re.sub(r'\band\b|&', ',', text)
+    ranges = []
+    book = chapter = None
+    had_verse = False
+    for segment in text.split(';'):
+        for part in segment.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            match = PART.match(part)
+            if match is None:
+                return []
+            if match.group('book'):
+                book = book_number(match.group('book'))
+                if book is None:
+                    return []
+                chapter = None
+                had_verse = False
+            if book is None or (match.group('c1') is None and (require_chapter or not match.group('book'))):
+                return []
+            result = _part_range(match, book, chapter, had_verse)
+            if result is None:
+                return []
+            start, end, chapter, had_verse = result
+            ranges.append((start, end))
+        # A new segment may repeat the chapter but keeps the book ("Rom 8:28; 12:1")
+        had_verse = False
+    return ranges
+
+
+def format_range(start, end):
+    """A readable reference for a range, e.g. "Romans 8", "Romans 8:28-39", "John 3:16-4:2" """
+    book, c1, v1 = split_id(start)
+    _, c2, v2 = split_id(end)
+    name = BOOK_NAMES.get(book, '?')
+    if c1 == 0 and c2 == LAST:
+        return name
+    if v1 == 0 and v2 == LAST:
+        return f'{name} {c1}' if c1 == c2 else f'{name} {c1}-{c2}'
+    if c1 == c2:
+        return f'{name} {c1}:{v1}' if v1 == v2 else f'{name} {c1}:{v1}-{v2}'
+    return f'{name} {c1}:{v1}-{c2}:{v2}'
+
+
+def overlapping(ranges):
+    """Q matching ScriptureRange rows that overlap any of ranges"""
+    condition = Q(pk__in=[])
+    for start, end in ranges:
+        condition |= Q(book=start // BOOK, start__lte=end, end__gte=start)
+    return condition
+
+
+def sermons_touching(ranges):
+    return Sermon.objects.filter(
+        pk__in=ScriptureRange.objects.filter(overlapping(ranges), sermon__isnull=False).values('sermon_id')
+    )
+
+
+def verses_touching(ranges):
+    return BibleVerse.objects.filter(
+        pk__in=ScriptureRange.objects.filter(overlapping(ranges), bible_verse__isnull=False).values('bible_verse_id')
+    )
+
+
+def sermon_reference_filter(query):
+    """Q for sermons whose scripture matches a search: by passage if query is a reference"""
+    ranges = parse(query, require_chapter=True)
+    if ranges:
+        return Q(pk__in=ScriptureRange.objects.filter(overlapping(ranges), sermon__isnull=False).values('sermon_id'))
+    return Q(scripture_reference__icontains=query)
+
+
+def _rows(owner_field, owner_id, text):
+    return [
+        ScriptureRange(**{owner_field: owner_id}, book=start // BOOK, start=start, end=end)
+        for start, end in parse(text)
+    ]
+
+
+def index_sermon(sermon):
+    with transaction.atomic():
+        ScriptureRange.objects.filter(sermon=sermon).delete()
+        ScriptureRange.objects.bulk_create(_rows('sermon_id', sermon.pk, sermon.scripture_reference))
+
+
+def index_verse(verse):
+    with transaction.atomic():
+        ScriptureRange.objects.filter(bible_verse=verse).delete()
+        ScriptureRange.objects.bulk_create(_rows('bible_verse_id', verse.pk, verse.reference))
+
+
+def reindex():
+    """Rebuild every range; returns (sermons, verses, references that could not be read)"""
+    rows = []
+    unread = 0
+    sermons = verses = 0
+    for pk, text in Sermon.objects.values_list('pk', 'scripture_reference').iterator(chunk_size=2000):
+        parsed = _rows('sermon_id', pk, text)
+        sermons += 1
+        unread += not parsed and bool((text or '').strip())
+        rows.extend(parsed)
+    for pk, text in BibleVerse.objects.values_list('pk', 'reference').iterator(chunk_size=2000):
+        parsed = _rows('bible_verse_id', pk, text)
+        verses += 1
+        unread += not parsed and bool((text or '').strip())
+        rows.extend(parsed)
+    with transaction.atomic():
+        ScriptureRange.objects.all().delete()
+        ScriptureRange.objects.bulk_create(rows, batch_size=1000)
+    return sermons, verses, unread
@@ -0,0 +1,92 @@
+# church/series.py
+"""
+Sermon series, denormalized.
+
+Sermon.series stays the free-text name admins and the importer fill in; each
+sermon is linked to the SermonSeries of that name when it is saved, and the
+series row carries its sermon count, first and last dates and cover sermon.
+Series listings, the sermons filter and the series pages then read one small
+indexed table instead of scanning the sermon table with DISTINCT.
+"""
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Sermon, SermonSeries
+
+
+def unique_slug(name):
+    base = slugify(name)[:100] or 'series'
+    slug = base
+    number = 2
+    while SermonSeries.objects.filter(slug=slug).exists():
+        slug = f'{base}-{number}'
+        number += 1
+    return slug
+
+
+def series_named(name):
+    """The SermonSeries called name, created if it does not exist yet"""
+    series = SermonSeries.objects.filter(name=name).first()
+    if series is None:
+        series = SermonSeries.objects.create(name=name, slug=unique_slug(name))
+    return series
+
+
+def cover_sermon_id(series_id):
+    return (
+        Sermon.objects.filter(sermon_series_id=series_id)
+        .order_by('-is_featured', '-date_preached', '-pk')
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+def refresh(series_ids):
+    """Recompute the count, dates and cover of the given series"""
+    stats = {
+        row['sermon_series']: row
+        for row in Sermon.objects.filter(sermon_series__in=series_ids)
+        .values('sermon_series')
+        .annotate(count=Count('pk'), first=Min('date_preached'), last=Max('date_preached'))
+    }
+    for series_id in series_ids:
+        row = stats.get(series_id, {})
+        SermonSeries.objects.filter(pk=series_id).update(
+            sermon_count=row.get('count', 0),
+            first_preached=row.get('first'),
+            last_preached=row.get('last'),
+            cover_sermon_id=cover_sermon_id(series_id) if row else None,
+            updated_at=timezone.now(),
+        )
+
+
+def sync_sermon(sermon, deleted=False):
+    """Link a saved sermon to the series it names and refresh the series it left or joined"""
+    previous = sermon.sermon_series_id
+    current = None
+    if not deleted:
+        name = (sermon.series or '').strip()
+        current = series_named(name).pk if name else None
+        if current != previous:
+            Sermon.objects.filter(pk=sermon.pk).update(sermon_series_id=current)
+            sermon.sermon_series_id = current
+    refresh([pk for pk in {previous, current} if pk is not None])
+
+
+def rebuild():
+    """Link every sermon to its series and recompute them all, after bulk changes (e.g. an import)"""
+    linked = set()
+    for value in Sermon.objects.exclude(series__isnull=True).order_by().values_list('series', flat=True).distinct():
+        name = value.strip()
+        series_id = series_named(name).pk if name else None
+        Sermon.objects.filter(series=value).exclude(sermon_series_id=series_id).update(sermon_series_id=series_id)
+        linked.add(series_id)
+    Sermon.objects.filter(series__isnull=True).exclude(sermon_series=None).update(sermon_series=None)
+    refresh(list(SermonSeries.objects.values_list('pk', flat=True)))
+    return len(linked - {None})
+
+
+def listed_series():
+    """Series with at least one sermon, by name"""
+    return SermonSeries.objects.filter(sermon_count__gt=0).order_by('name')
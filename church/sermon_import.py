@@ -0,0 +1,190 @@
+# church/sermon_import.py
+"""
+Bulk import of sermon archives from CSV or JSON.
+
+Rows are read one at a time, validated, and written in batches with a single
+INSERT ... ON CONFLICT per batch, keyed on Sermon.import_key, so importing
+the same file twice updates the sermons instead of duplicating them.
+"""
+import csv
+import datetime
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import Sermon
+
+
+# Fields overwritten when a row matches an existing sermon. download_count
+# is only taken from the file for new sermons: the live count wins.
+UPDATE_FIELDS = [
+    'title', 'preacher', 'scripture_reference', 'summary', 'date_preached', 'audio_file', 'updated_at',
+]
+# Overwritten only when the row has the column, so admins' changes (e.g. a
+# featured flag) survive a re-import of a file without it
+OPTIONAL_FIELDS = ['series', 'video_url', 'is_featured']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x'}
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def read_csv(f):
+    for row in csv.DictReader(f):
+        yield {key.strip().lower(): value for key, value in row.items() if key}
+
+
+def read_json(f):
+    """Stream objects from a JSON array or from JSON Lines without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = f.read(JSON_CHUNK_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started and buffer.startswith('['):
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(','):
+                buffer = buffer[1:]
+                continue
+            if not buffer or buffer.startswith(']'):
+                break
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                # The object continues in the next chunk
+                break
+            buffer = buffer[end:]
+            yield {str(key).strip().lower(): value for key, value in obj.items()}
+        if not chunk:
+            return
+
+
+def read_rows(f, file_format):
+    return read_csv(f) if file_format == 'csv' else read_json(f)
+
+
+def _text(row, field, max_length=None, required=False, default=''):
+    value = row.get(field)
+    value = default if value is None else str(value).strip()
+    if required and not value:
+        raise InvalidRow(f'{field} is required')
+    if max_length and len(value) > max_length:
+        raise InvalidRow(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _date(value):
+    value = str(value or '').strip()
+    if not value:
+        raise InvalidRow('date_preached is required')
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise InvalidRow(f'date_preached "{value}" is not a date')
+
+
+def clean_row(row):
+    """Validate one input row and return the Sermon field values"""
+    data = {
+        'title': _text(row, 'title', 200, required=True),
+        'preacher': _text(row, 'preacher', 100, default='Pastor') or 'Pastor',
+        'scripture_reference': _text(row, 'scripture_reference', 100, required=True),
+        'summary': _text(row, 'summary', required=True),
+        'date_preached': _date(row.get('date_preached') or row.get('date')),
+        'series': _text(row, 'series', 100) or None,
+        'video_url': _text(row, 'video_url') or None,
+        'is_featured': str(row.get('is_featured') or '').strip().lower() in TRUE_VALUES,
+    }
+    if data['video_url']:
+        try:
+            URLValidator()(data['video_url'])
+        except ValidationError:
+            raise InvalidRow(f'video_url "{data["video_url"]}" is not a URL')
+    try:
+        data['download_count'] = max(int(row.get('download_count') or 0), 0)
+    except (TypeError, ValueError):
+        raise InvalidRow('download_count is not a number')
+
+    key = _text(row, 'import_key', 150) or _text(row, 'id', 150)
+    if not key:
+        key = f"{data['date_preached'].isoformat()}:{slugify(data['title'])[:100]}"
+    data['import_key'] = key
+    data['audio'] = _text(row, 'audio_file')
+    data['provided'] = tuple(field for field in OPTIONAL_FIELDS if field in row)
+    return data
+
+
+def attach_audio(data, audio_dir, existing_audio):
+    """Copy a row's audio into storage unless the sermon already has audio"""
+    if existing_audio:
+        return existing_audio
+    if not data['audio'] or not audio_dir:
+        return None
+    name = os.path.basename(data['audio'])
+    path = os.path.join(audio_dir, name)
+    if not os.path.isfile(path):
+        raise InvalidRow(f'audio file {name} not found in {audio_dir}')
+    with open(path, 'rb') as f:
+        return default_storage.save(f'sermons/audio/{name}', File(f))
+
+
+def import_batch(rows, audio_dir=None):
+    """
+    Upsert a batch of cleaned rows; returns (created, updated_pks, errors)
+    where errors is a list of (import_key, message) for rows that were skipped.
+    """
+    keys = [data['import_key'] for data in rows]
+    existing = {
+        key: (pk, audio_file)
+        for key, pk, audio_file in Sermon.objects.filter(import_key__in=keys).values_list('import_key', 'pk', 'audio_file')
+    }
+
+    sermons = {}
+    provided = {}
+    errors = []
+    for data in rows:
+        key = data['import_key']
+        try:
+            audio_file = attach_audio(data, audio_dir, existing[key][1] if key in existing else None)
+        except (InvalidRow, OSError) as e:
+            errors.append((key, str(e)))
+            continue
+        fields = {name: value for name, value in data.items() if name not in ('audio', 'provided')}
+        # A later row with the same key wins, as it would in a row-by-row import
+        sermons[key] = Sermon(audio_file=audio_file, **fields)
+        provided[key] = data['provided']
+
+    # One upsert per set of optional columns (a CSV file has just the one)
+    groups = {}
+    for key, sermon in sermons.items():
+        groups.setdefault(provided[key], []).append(sermon)
+    if groups:
+        with transaction.atomic():
+            for optional_fields, group in groups.items():
+                Sermon.objects.bulk_create(
+                    group,
+                    update_conflicts=True,
+                    unique_fields=['import_key'],
+                    update_fields=UPDATE_FIELDS + list(optional_fields),
+                )
+
+    updated_pks = [existing[key][0] for key in sermons if key in existing]
+    return len(sermons) - len(updated_pks), updated_pks, errors
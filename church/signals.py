@@ -0,0 +1,165 @@
+# church/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import audio, content, live, recommendations, scripture, series, snapshots
+from .feeds import invalidate_podcast_feeds
+from .ical import invalidate_event
+from .sitemaps import invalidate_sitemaps
+from .models import (
+    BibleVerse, ChurchSettings, Event, LiveStatus, Ministry, Sermon, SermonRecommendation, SermonSeries, Testimony,
+)
+from .tasks import run_async
+
+
+# Sermon fields a series' link, counts, dates and cover depend on
+SERIES_FIELDS = {'series', 'date_preached', 'is_featured'}
+# Sermon fields the related sermons are computed from
+RECOMMENDATION_FIELDS = {'title', 'summary', 'scripture_reference', 'preacher'}
+# Counters no page, feed or sitemap is rebuilt for
+COUNTER_FIELDS = {'download_count'}
+
+
+def counters_only(update_fields):
+    return update_fields is not None and set(update_fields) <= COUNTER_FIELDS
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Sermon)
+@receiver(post_save, sender=Ministry)
+@receiver(post_save, sender=Testimony)
+@receiver(post_save, sender=BibleVerse)
+@receiver(post_save, sender=ChurchSettings)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Sermon)
+@receiver(post_delete, sender=Ministry)
+@receiver(post_delete, sender=Testimony)
+@receiver(post_delete, sender=BibleVerse)
+@receiver(post_delete, sender=ChurchSettings)
+def refresh_snapshots(sender, instance, update_fields=None, **kwargs):
+    """Drop the prerendered pages that show this row and rebuild them"""
+    if not snapshots.snapshots_enabled() or counters_only(update_fields):
+        return
+    snapshots.refresh_after_commit(snapshots.paths_for_change(sender, instance))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Sermon)
+@receiver(post_save, sender=Ministry)
+@receiver(post_save, sender=Testimony)
+@receiver(post_save, sender=BibleVerse)
+@receiver(post_save, sender=ChurchSettings)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Sermon)
+@receiver(post_delete, sender=Ministry)
+@receiver(post_delete, sender=Testimony)
+@receiver(post_delete, sender=BibleVerse)
+@receiver(post_delete, sender=ChurchSettings)
+def refresh_content(sender, instance, update_fields=None, **kwargs):
+    if counters_only(update_fields):
+        return
+    transaction.on_commit(lambda: content.invalidate(sender))
+
+
+@receiver(post_save, sender=LiveStatus)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=ChurchSettings)
+@receiver(post_delete, sender=LiveStatus)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=ChurchSettings)
+def refresh_live_status(sender, instance, **kwargs):
+    transaction.on_commit(live.invalidate)
+
+
+@receiver(post_save, sender=Sermon)
+@receiver(post_delete, sender=Sermon)
+def sync_sermon_series(sender, instance, signal, update_fields=None, **kwargs):
+    """Link the sermon to its SermonSeries and refresh the series' counts and dates"""
+    if update_fields is not None and not SERIES_FIELDS.intersection(update_fields):
+        return
+    series.sync_sermon(instance, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=Sermon)
+def index_sermon_scripture(sender, instance, update_fields=None, **kwargs):
+    """Store the passages the sermon's scripture reference covers"""
+    if update_fields is not None and 'scripture_reference' not in update_fields:
+        return
+    scripture.index_sermon(instance)
+
+
+@receiver(post_save, sender=BibleVerse)
+def index_verse_scripture(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'reference' not in update_fields:
+        return
+    scripture.index_verse(instance)
+
+
+@receiver(pre_delete, sender=Sermon)
+def remember_listing_sermons(sender, instance, **kwargs):
+    # Their rows pointing at this sermon are gone by post_delete
+    instance._listed_by = list(
+        SermonRecommendation.objects.filter(related=instance).values_list('sermon_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Sermon)
+@receiver(post_delete, sender=Sermon)
+def refresh_recommendations(sender, instance, signal, update_fields=None, **kwargs):
+    """Recompute the related sermons this change can affect, outside the request"""
+    if not getattr(settings, 'RECOMMENDATIONS_IN_BACKGROUND', True):
+        return
+    if update_fields is not None and not RECOMMENDATION_FIELDS.intersection(update_fields):
+        return
+    pk = instance.pk
+    listed_by = getattr(instance, '_listed_by', [])
+    transaction.on_commit(lambda: run_async(recommendations.update, [pk], listed_by))
+
+
+@receiver(post_save, sender=Sermon)
+def queue_audio_processing(sender, instance, **kwargs):
+    """Process newly uploaded sermon audio outside the request"""
+    if not audio.needs_processing(instance):
+        if not instance.audio_file and instance.audio_processed_name:
+            # Audio was removed; drop what was derived from it
+            if instance.audio_low:
+                instance.audio_low.delete(save=False)
+            Sermon.objects.filter(pk=instance.pk).update(
+                audio_status='', audio_processed_name='', audio_low=None,
+                audio_duration=None, audio_loudness=None, audio_peaks=None,
+            )
+        return
+    Sermon.objects.filter(pk=instance.pk).update(audio_status='pending')
+    if getattr(settings, 'AUDIO_PROCESS_IN_BACKGROUND', True):
+        transaction.on_commit(lambda: run_async(audio.process_sermon_audio, instance.pk))
+
+
+@receiver(post_save, sender=Sermon)
+@receiver(post_save, sender=SermonSeries)
+@receiver(post_delete, sender=Sermon)
+@receiver(post_delete, sender=SermonSeries)
+def refresh_podcast_feeds(sender, instance, update_fields=None, **kwargs):
+    if counters_only(update_fields):
+        return
+    transaction.on_commit(invalidate_podcast_feeds)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def refresh_event_calendars(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_event(pk))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Sermon)
+@receiver(post_save, sender=SermonSeries)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Sermon)
+@receiver(post_delete, sender=SermonSeries)
+def refresh_sitemaps(sender, instance, update_fields=None, **kwargs):
+    if counters_only(update_fields):
+        return
+    transaction.on_commit(invalidate_sitemaps)
@@ -0,0 +1,178 @@
+# church/sitemaps.py
+"""
+Sitemap index for crawlers.
+
+Sermons are split into chunks by primary-key range rather than by
+LIMIT/OFFSET, so a chunk is one indexed range scan, and the index takes the
+lastmod of every chunk from a single GROUP BY query. The rendered XML is
+cached until a sermon or event changes (see church/signals.py).
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.db.models.functions import TruncMonth
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .feeds import absolute_url
+from .models import Event, Sermon, SermonSeries
+
+
+SITEMAP_GENERATION_KEY = 'sitemap:generation'
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+# Sermons per sitemap file (the protocol allows up to 50,000)
+CHUNK_SIZE = 1000
+
+# (url name, changefreq, priority)
+STATIC_PAGES = [
+    ('home', 'daily', '1.0'),
+    ('about', 'monthly', '0.6'),
+    ('ministries', 'monthly', '0.6'),
+    ('events', 'weekly', '0.8'),
+    ('sermons', 'weekly', '0.8'),
+    ('live_stream', 'weekly', '0.5'),
+    ('testimonies', 'weekly', '0.5'),
+    ('verse_of_the_day', 'daily', '0.4'),
+    ('giving', 'yearly', '0.4'),
+    ('contact', 'yearly', '0.4'),
+    ('prayer_request', 'yearly', '0.4'),
+]
+
+
+def section_url(section):
+    return absolute_url(reverse('sitemap_section', args=[section]))
+
+
+def static_urls():
+    latest_sermon = Sermon.objects.aggregate(lastmod=Max('updated_at'))['lastmod']
+    latest_event = Event.objects.aggregate(lastmod=Max('updated_at'))['lastmod']
+    lastmods = {
+        'home': max(filter(None, [latest_sermon, latest_event]), default=None),
+        'sermons': latest_sermon,
+        'events': latest_event,
+    }
+    return [
+        {
+            'location': absolute_url(reverse(name)),
+            'lastmod': lastmods.get(name),
+            'changefreq': changefreq,
+            'priority': priority,
+        }
+        for name, changefreq, priority in STATIC_PAGES
+    ]
+
+
+def event_month_urls():
+    """One URL per month of the events calendar that has events"""
+    months = (
+        Event.objects.annotate(month=TruncMonth('date'))
+        .values('month').annotate(lastmod=Max('updated_at'))
+        .order_by('month')
+    )
+    base = absolute_url(reverse('events'))
+    return [
+        {
+            'location': f'{base}?year={row["month"].year}&month={row["month"].month}',
+            'lastmod': row['lastmod'],
+            'changefreq': 'weekly',
+            'priority': '0.5',
+        }
+        for row in months
+    ]
+
+
+def series_urls():
+    return [
+        {
+            'location': absolute_url(reverse('sermon_series', args=[slug])),
+            'lastmod': updated_at,
+            'changefreq': 'weekly',
+            'priority': '0.6',
+        }
+        for slug, updated_at in SermonSeries.objects.filter(sermon_count__gt=0).order_by('slug').values_list('slug', 'updated_at')
+    ]
+
+
+def sermon_chunk_urls(chunk):
+    sermons = (
+        Sermon.objects.filter(pk__gte=chunk * CHUNK_SIZE, pk__lt=(chunk + 1) * CHUNK_SIZE)
+        .order_by('pk').values_list('pk', 'updated_at')
+    )
+    return [
+        {
+            'location': absolute_url(reverse('sermon_detail', args=[pk])),
+            'lastmod': updated_at,
+            'changefreq': 'monthly',
+            'priority': '0.7',
+        }
+        for pk, updated_at in sermons
+    ]
+
+
+def sermon_chunks():
+    """(chunk number, lastmod) for every non-empty sermon chunk, in one query"""
+    rows = (
+        Sermon.objects.annotate(chunk=F('pk') / CHUNK_SIZE)
+        .values('chunk').annotate(lastmod=Max('updated_at'))
+        .order_by('chunk')
+    )
+    return [(row['chunk'], row['lastmod']) for row in rows]
+
+
+def index_entries():
+    entries = [{'location': section_url('pages'), 'last_mod': None}]
+    events_lastmod = Event.objects.aggregate(lastmod=Max('updated_at'))['lastmod']
+    if events_lastmod:
+        entries.append({'location': section_url('events'), 'last_mod': events_lastmod})
+    series_lastmod = SermonSeries.objects.filter(sermon_count__gt=0).aggregate(lastmod=Max('updated_at'))['lastmod']
+    if series_lastmod:
+        entries.append({'location': section_url('series'), 'last_mod': series_lastmod})
+    for chunk, lastmod in sermon_chunks():
+        entries.append({'location': section_url(f'sermons-{chunk}'), 'last_mod': lastmod})
+    return entries
+
+
+def section_urls(section):
+    """URLs for one sitemap section, or None if there is no such section"""
+    if section == 'pages':
+        return static_urls()
+    if section == 'events':
+        return event_month_urls()
+    if section == 'series':
+        return series_urls()
+    prefix, _, chunk = section.partition('-')
+    if prefix == 'sermons' and chunk.isdigit():
+        return sermon_chunk_urls(int(chunk)) or None
+    return None
+
+
+def get_sitemap(section=None):
+    """
+    Return (xml, etag, last_modified) for the index (section=None) or one
+    section, or None if the section does not exist.
+    """
+    generation = cache.get_or_set(SITEMAP_GENERATION_KEY, int(time.time()), timeout=None)
+    key = f'sitemap:{generation}:{section or "index"}'
+
+    def build():
+        if section is None:
+            xml = render_to_string('sitemap_index.xml', {'sitemaps': index_entries()})
+        else:
+            urls = section_urls(section)
+            if urls is None:
+                return None
+            xml = render_to_string('sitemap.xml', {'urlset': urls})
+        xml = xml.encode('utf-8')
+        return xml, hashlib.md5(xml).hexdigest(), time.time()
+
+    return cache.get_or_compute(key, build, timeout=SITEMAP_CACHE_TIMEOUT)
+
+
+def invalidate_sitemaps():
+    """Make every cached sitemap stale; called when a sermon or event changes"""
+    try:
+        cache.incr(SITEMAP_GENERATION_KEY)
+    except ValueError:
+        cache.set(SITEMAP_GENERATION_KEY, int(time.time()), timeout=None)
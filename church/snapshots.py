@@ -0,0 +1,235 @@
+# church/snapshots.py
+"""
+Prerendered HTML snapshots of the anonymous public pages.
+
+The pages below render the same HTML for every anonymous visitor, so they are
+rendered once into SNAPSHOT_ROOT and SnapshotMiddleware serves the file
+without touching the template engine or the database. A snapshot is only
+valid on the day it was generated (the home page shows the verse of the day
+and upcoming events), and it is deleted and rebuilt whenever one of the
+models it depends on changes (see church/signals.py).
+"""
+import datetime
+import os
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import Resolver404, resolve, reverse
+from django.utils import timezone
+
+from .audio import prefers_low_bitrate
+from .models import BibleVerse, ChurchSettings, Event, Ministry, Sermon, Testimony
+from .tasks import run_async
+
+
+# url name -> models whose rows appear on the page
+PAGES = {
+    'home': (Event, Testimony, Sermon, Ministry, BibleVerse, ChurchSettings),
+    'about': (Ministry, ChurchSettings),
+    'ministries': (Ministry, ChurchSettings),
+    'sermons': (Sermon, ChurchSettings),
+    'sermon_detail': (Sermon, ChurchSettings),
+}
+
+
+def snapshots_enabled():
+    return getattr(settings, 'SNAPSHOTS_ENABLED', False)
+
+
+def snapshot_file(path):
+    """File holding the snapshot for a URL path, e.g. /sermons/3/ -> sermons/3/index.html"""
+    return Path(settings.SNAPSHOT_ROOT) / path.strip('/') / 'index.html'
+
+
+def page_paths(name):
+    """All URL paths for a page name"""
+    if name == 'sermon_detail':
+        return [reverse(name, args=[pk]) for pk in Sermon.objects.values_list('pk', flat=True).iterator()]
+    return [reverse(name)]
+
+
+def sermon_paths(pks):
+    """The sermon_detail paths of the given sermons"""
+    return [reverse('sermon_detail', args=[pk]) for pk in pks]
+
+
+def paths_for_change(model, instance=None):
+    """URL paths whose snapshots are affected by a change to model/instance"""
+    paths = []
+    for name, models in PAGES.items():
+        if model not in models:
+            continue
+        if name == 'sermon_detail' and model is Sermon and instance is not None:
+            # A sermon appears on its own page and on the pages of its series
+            paths.append(reverse(name, args=[instance.pk]))
+            if instance.series:
+                siblings = Sermon.objects.filter(sermon_series__name=instance.series).exclude(pk=instance.pk)
+                paths.extend(reverse(name, args=[pk]) for pk in siblings.values_list('pk', flat=True))
+        else:
+            paths.extend(page_paths(name))
+    return paths
+
+
+def _request_factory():
+    site = urlsplit(settings.SITE_URL)
+    return RequestFactory(HTTP_HOST=site.netloc or 'localhost'), site.scheme == 'https'
+
+
+def render_snapshot(path, factory=None):
+    """Render one URL path as an anonymous visitor and write it to disk"""
+    if factory is None:
+        factory = _request_factory()
+    request_factory, secure = factory
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return False
+
+    request = request_factory.get(path, secure=secure)
+    request.user = AnonymousUser()
+    response = match.func(request, *match.args, **match.kwargs)
+    if response.status_code != 200 or not response.get('Content-Type', '').startswith('text/html'):
+        return False
+
+    target = snapshot_file(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first so a request never sees half a page
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix='.snapshot-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(response.content)
+    os.replace(tmp, target)
+    return True
+
+
+def prerender(names=None, log=None):
+    """Render every page (or the given page names); returns (written, failed)"""
+    factory = _request_factory()
+    written = failed = 0
+    for name in names or PAGES:
+        for path in page_paths(name):
+            try:
+                ok = render_snapshot(path, factory)
+            except Exception as e:
+                ok = False
+                if log:
+                    log(f'  {path}: {e.__class__.__name__}: {e}')
+            if ok:
+                written += 1
+            else:
+                failed += 1
+                delete_snapshot(path)
+    return written, failed
+
+
+def delete_snapshot(path):
+    try:
+        snapshot_file(path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def refresh(paths):
+    """Rebuild the given snapshots, dropping any that no longer render"""
+    factory = _request_factory()
+    for path in paths:
+        try:
+            if render_snapshot(path, factory):
+                continue
+        except Exception as e:
+            print(f"Snapshot of {path} failed: {e}")
+        delete_snapshot(path)
+
+
+def refresh_after_commit(paths):
+    """Stop serving the given snapshots now and rebuild them once the change is committed"""
+    if not snapshots_enabled() or not paths:
+        return
+    for path in paths:
+        delete_snapshot(path)
+    transaction.on_commit(lambda: run_async(refresh, paths))
+
+
+def read_snapshot(path):
+    """
+    Return (content, stale) for the snapshot of path.
+
+    content is None when there is no snapshot; stale is True when it was
+    generated on an earlier day and has to be rebuilt before it is served.
+    """
+    if '..' in path.split('/'):
+        return None, False
+    target = snapshot_file(path)
+    try:
+        stat = target.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None, False
+    generated = datetime.datetime.fromtimestamp(stat.st_mtime, tz=datetime.timezone.utc)
+    if timezone.localdate(generated) != timezone.localdate():
+        return None, True
+    return target.read_bytes(), False
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_once(path):
+    try:
+        refresh([path])
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(path)
+
+
+def schedule_refresh(path):
+    """Rebuild a stale snapshot in the background (once per path at a time)"""
+    with _refreshing_lock:
+        if path in _refreshing:
+            return
+        _refreshing.add(path)
+    run_async(_refresh_once, path)
+
+
+class SnapshotMiddleware:
+    """
+    Serve prerendered pages to anonymous GET requests.
+
+    Requests with a query string, a session cookie (logged-in staff) or
+    pending flash messages always go to the view. It sits below
+    SecurityMiddleware, so hits get its headers, but above the clickjacking
+    middleware, whose header it sets itself.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.can_serve(request):
+            content, stale = read_snapshot(request.path)
+            if content is not None:
+                response = HttpResponse(content, content_type='text/html; charset=utf-8')
+                response['X-Snapshot'] = 'hit'
+                # A hit never reaches XFrameOptionsMiddleware further down
+                response['X-Frame-Options'] = getattr(settings, 'X_FRAME_OPTIONS', 'DENY').upper()
+                return response
+            if stale:
+                schedule_refresh(request.path)
+        return self.get_response(request)
+
+    def can_serve(self, request):
+        return (
+            snapshots_enabled()
+            and request.method in ('GET', 'HEAD')
+            and not request.GET
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and 'messages' not in request.COOKIES
+            # Snapshots carry the full-quality audio player
+            and not prefers_low_bitrate(request)
+        )
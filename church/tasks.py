@@ -0,0 +1,51 @@
+# church/tasks.py
+"""
+Minimal in-process background queue.
+
+Slow side effects of a request (mostly sending email) are handed to a small
+thread pool so the response does not wait for the SMTP server. Jobs live in
+memory only: anything still queued when the worker process exits is lost,
+so only use this for best-effort work such as notification emails.
+"""
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+MAX_WORKERS = 2
+
+
+def _get_executor():
+    # Created lazily so each gunicorn worker gets its own pool after forking
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='church-task')
+            atexit.register(_executor.shutdown, wait=True)
+        return _executor
+
+
+def reset_after_fork():
+    """Forget the parent's pool; its threads do not exist in a forked child"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception as e:
+        print(f"Background task {func.__name__} failed: {e}")
+    finally:
+        close_old_connections()
+
+
+def run_async(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the background thread pool"""
+    return _get_executor().submit(_run, func, args, kwargs)
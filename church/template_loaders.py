@@ -0,0 +1,38 @@
+# church/template_loaders.py
+"""
+Template loaders that strip indentation and blank lines from HTML templates
+before they are compiled, so the cached templates (and every response built
+from them) carry no source formatting. Line breaks are kept, because inline
+scripts may rely on them, and <pre>/<textarea> blocks are left untouched.
+"""
+import re
+
+from django.template.loaders import app_directories, filesystem
+
+
+PRESERVE = re.compile(r'(<pre\b.*?</pre>|<textarea\b.*?</textarea>)', re.IGNORECASE | re.DOTALL)
+INDENTATION = re.compile(r'^[ \t]+|[ \t]+$', re.MULTILINE)
+BLANK_LINES = re.compile(r'\n{2,}')
+
+
+def strip_whitespace(source):
+    parts = PRESERVE.split(source)
+    for i in range(0, len(parts), 2):
+        parts[i] = BLANK_LINES.sub('\n', INDENTATION.sub('', parts[i]))
+    return ''.join(parts)
+
+
+class StripWhitespaceMixin:
+    def get_contents(self, origin):
+        contents = super().get_contents(origin)
+        if origin.name.endswith('.html'):
+            contents = strip_whitespace(contents)
+        return contents
+
+
+class FilesystemLoader(StripWhitespaceMixin, filesystem.Loader):
+    pass
+
+
+class AppDirectoriesLoader(StripWhitespaceMixin, app_directories.Loader):
+    pass
@@ -0,0 +1,13 @@
+# church/templatetags/church_forms.py
+from django import template
+
+from church.form_cache import render_form
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cached_crispy(context, form):
+    """Drop-in for {% crispy form %} that renders unbound forms from a cached skeleton"""
+    return render_form(form, context)
@@ -1,3 +1,47 @@
+import io
+from decimal import Decimal
+
+from django.core import mail
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Donation
+from .reconciliation import reconcile_statement
+
+
+class ReconcileStatementTests(TestCase):
+    def setUp(self):
+        self.referenced = Donation.objects.create(
+            donor_name='A', donor_email='a@example.com', donation_type='tithe',
+            amount=Decimal('5000'), transaction_reference='TRX12345',
+        )
+        self.other = Donation.objects.create(
+            donor_name='B', donor_email='b@example.com', donation_type='tithe',
+            amount=Decimal('5000'), transaction_reference='',
+        )
+        day = self.referenced.created_at.strftime('%Y-%m-%d')
+        self.statement = f'Date,Credit,Reference\n{day},5000,TRX12345\n'
+
+    def reconcile(self):
+        return reconcile_statement(io.StringIO(self.statement), notify=True)
+
+    def test_rerun_does_not_match_another_donation_by_amount(self):
+        first = self.reconcile()
+        self.assertEqual(first.verified, 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        second = self.reconcile()
+        self.assertEqual(second.verified, 0)
+        self.assertEqual(second.already_reconciled, 1)
+        self.referenced.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.referenced.status, 'verified')
+        self.assertEqual(self.other.status, 'pending')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_line_for_rejected_donation_is_skipped(self):
+        Donation.objects.filter(pk=self.referenced.pk).update(status='rejected')
+        result = self.reconcile()
+        self.assertEqual(result.verified, 0)
+        self.assertEqual(result.already_reconciled, 1)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.status, 'pending')
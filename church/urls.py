@@ -31,6 +31,10 @@ urlpatterns = [
     path('events/', views.events, name='events'),
     path('sermons/', views.sermons, name='sermons'),
     path('sermons/<int:pk>/', views.sermon_detail, name='sermon_detail'),
+    path('sermons/series/<slug:slug>/', views.sermon_series, name='sermon_series'),
+    path('scripture/', views.scripture_browse, name='scripture'),
+    path('scripture/<slug:book>/', views.scripture_browse, name='scripture_book'),
+    path('scripture/<slug:book>/<int:chapter>/', views.scripture_browse, name='scripture_chapter'),
     path('giving/', views.giving, name='giving'),
     path('contact/', views.contact, name='contact'),
     
@@ -40,8 +44,22 @@ urlpatterns = [
     path('live/', views.live_stream, name='live_stream'),
     path('search/', views.search, name='search'),
     path('verse-of-the-day/', views.bible_verse_of_the_day, name='verse_of_the_day'),
+    path('newsletter/unsubscribe/<str:token>/', views.newsletter_unsubscribe, name='newsletter_unsubscribe'),
     
     # AJAX/API endpoints
     path('api/newsletter-subscribe/', views.newsletter_subscribe, name='newsletter_subscribe'),
     path('api/events/', views.api_events, name='api_events'),
+    path('api/sermons/<int:pk>/waveform/', views.api_sermon_waveform, name='api_sermon_waveform'),
+    path('api/live-status/', views.api_live_status, name='api_live_status'),
+    path('ready/', views.readiness, name='readiness'),
+    
+    # Feeds
+    path('podcast/sermons.xml', views.podcast_feed, name='podcast_feed'),
+    path('podcast/series/<slug:series_slug>.xml', views.podcast_feed, name='podcast_series_feed'),
+    path('calendar/events.ics', views.events_calendar, name='events_calendar'),
+    path('calendar/<slug:event_type>.ics', views.events_calendar, name='events_type_calendar'),
+    path('events/<int:pk>/event.ics', views.event_ics, name='event_ics'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-<slug:section>.xml', views.sitemap, name='sitemap_section'),
+    path('robots.txt', views.robots_txt, name='robots_txt'),
 ]
\ No newline at end of file
@@ -1,12 +1,18 @@
 # church/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from django.conf import settings
 from django.core.paginator import Paginator
@@ -14,48 +20,48 @@ from datetime import datetime, timedelta
 import calendar
 import json
 
+from asgiref.sync import sync_to_async
+
 from .models import (
     PrayerRequest, Testimony, ContactMessage, Donation, Event, 
-    Ministry, Sermon, BibleVerse, Newsletter, ChurchSettings
+    Ministry, Sermon, SermonSeries, BibleVerse, Newsletter, ChurchSettings, ScriptureRange
 )
+from .audio import audio_url_for
+from .content import get_church_settings, get_daily_verse, get_home_content
+from .feeds import get_podcast_feed
+from .ical import get_calendar
+from .recommendations import related_sermons
+from .scripture import sermon_reference_filter
+from .series import listed_series
+from .sitemaps import get_sitemap
+from .newsletter import read_unsubscribe_token, send_welcome_email
+from .tasks import run_async
+from .paginators import KnownCountPaginator
+from .routers import replica_reads
+from . import bible, live, scripture, warmup
 from .forms import (
     PrayerRequestForm, TestimonyForm, ContactForm, DonationForm, 
     NewsletterForm, SearchForm
 )
 
 
-def get_church_settings():
-    """Get church settings or create default if none exists"""
-    try:
-        return ChurchSettings.objects.first()
-    except ChurchSettings.DoesNotExist:
-        return ChurchSettings.objects.create()
-
-
-def get_daily_verse():
-    """Get today's Bible verse"""
-    verses = BibleVerse.objects.filter(is_active=True)
-    if verses.exists():
-        # Use date to get consistent verse for the day
-        today = timezone.now().date()
-        verse_index = today.day % verses.count()
-        return verses[verse_index]
-    return None
+def render_page(request, template_name, context):
+    """render() for the busiest pages, which may use the Jinja2 engine (JINJA2_PAGES)"""
+    return render(request, template_name, context, using=settings.HOT_PAGES_TEMPLATE_ENGINE)
 
 
+@replica_reads
 def home(request):
     """Home page view"""
     context = {
         'church_settings': get_church_settings(),
         'daily_verse': get_daily_verse(),
-        'upcoming_events': Event.objects.filter(date__gte=timezone.now().date()).order_by('date', 'start_time')[:3],
-        'featured_testimonies': Testimony.objects.filter(status='approved', featured=True)[:3],
-        'recent_sermons': Sermon.objects.filter(is_featured=True)[:3],
-        'ministries': Ministry.objects.filter(is_active=True)[:6],
+        **get_home_content(),
     }
-    return render(request, 'church/home.html', context)
+    return render_page(request, 'church/home.html', context)
 
 
+@replica_reads
 def about(request):
     """About page view"""
     context = {
@@ -65,6 +71,7 @@ def about(request):
     return render(request, 'church/about.html', context)
 
 
+@replica_reads
 def ministries(request):
     """Ministries page view"""
     context = {
@@ -74,6 +81,7 @@ def ministries(request):
     return render(request, 'church/ministries.html', context)
 
 
+@replica_reads
 def events(request):
     """Events and calendar page"""
     today = timezone.now().date()
@@ -129,7 +137,7 @@ def events(request):
         'next_month': next_month,
         'upcoming_events': Event.objects.filter(date__gte=today).order_by('date', 'start_time')[:5],
     }
-    return render(request, 'church/events.html', context)
+    return render_page(request, 'church/events.html', context)
 
 
 def prayer_request(request):
@@ -414,6 +422,7 @@ def contact(request):
     return render(request, 'church/contact.html', context)
 
 
+@replica_reads
 def sermons(request):
     """Sermons page"""
     sermons_list = Sermon.objects.all().order_by('-date_preached')
@@ -425,40 +434,42 @@ def sermons(request):
         sermons_list = sermons_list.filter(
             Q(title__icontains=query) |
             Q(preacher__icontains=query) |
-            Q(scripture_reference__icontains=query) |
+            sermon_reference_filter(query) |
             Q(series__icontains=query)
         )
     
-    # Filter by series
+    # Filter by series (slug, or the name older links used)
     series = request.GET.get('series')
     if series:
-        sermons_list = sermons_list.filter(series=series)
+        series = SermonSeries.objects.filter(Q(slug=series) | Q(name=series)).first()
+        sermons_list = sermons_list.filter(sermon_series=series) if series else sermons_list.none()
     
     # Pagination
     paginator = Paginator(sermons_list, 9)
     page_number = request.GET.get('page')
     sermons_page = paginator.get_page(page_number)
     
-    # Get available series for filter
-    available_series = Sermon.objects.values_list('series', flat=True).distinct().exclude(series__isnull=True).exclude(series='')
-    
     context = {
         'church_settings': get_church_settings(),
         'sermons': sermons_page,
         'search_form': search_form,
-        'available_series': available_series,
+        'available_series': listed_series(),
         'featured_sermons': Sermon.objects.filter(is_featured=True)[:3],
     }
-    return render(request, 'church/sermons.html', context)
+    return render_page(request, 'church/sermons.html', context)
 
+@replica_reads
 def sermon_detail(request, pk):
     sermon = get_object_or_404(Sermon, pk=pk)
     
+    # Low-bitrate variant for ?quality=low or slow connections
+    audio_url = audio_url_for(request, sermon)
+    
     # Increment download count if audio file is accessed
     if request.GET.get('download') and sermon.audio_file:
-        sermon.download_count += 1
-        sermon.save()
-        return redirect(sermon.audio_file.url)
+        # In the database, so concurrent downloads all count; no save() signals
+        Sermon.objects.filter(pk=sermon.pk).update(download_count=F('download_count') + 1)
+        return redirect(audio_url)
     
     # Convert YouTube URL to embed format
     video_embed_url = None
@@ -471,18 +482,114 @@ def sermon_detail(request, pk):
         else:
             video_embed_url = sermon.video_url
     
-    # Get related sermons from same series
-    related_sermons = Sermon.objects.filter(
-        series=sermon.series
-    ).exclude(pk=sermon.pk)[:3] if sermon.series else []
+    # Precomputed related sermons, else (until they are built) the same series
+    related = related_sermons(sermon)
+    if not related and sermon.sermon_series_id:
+        related = Sermon.objects.filter(sermon_series_id=sermon.sermon_series_id).exclude(pk=sermon.pk)[:3]
     
     context = {
         'church_settings': get_church_settings(),
         'sermon': sermon,
         'video_embed_url': video_embed_url,  # Add this
-        'related_sermons': related_sermons,
+        'related_sermons': related,
+        'audio_url': audio_url,
+        # The passage's text from the offline Bible ([] without one)
+        'scripture_verses': bible.passage(sermon.scripture_reference),
+    }
+    response = render(request, 'church/sermon_detail.html', context)
+    # Ask browsers for the connection hints used to pick the audio variant
+    response['Accept-CH'] = 'ECT, Save-Data'
+    patch_vary_headers(response, ('ECT', 'Save-Data'))
+    return response
+
+
+@replica_reads
+def sermon_series(request, slug):
+    """A series landing page; its dates and cover come from the series row"""
+    series = get_object_or_404(
+        SermonSeries.objects.select_related('cover_sermon'), slug=slug, sermon_count__gt=0
+    )
+    paginator = KnownCountPaginator(series.sermons.order_by('-date_preached'), 9, series.sermon_count)
+    context = {
+        'church_settings': get_church_settings(),
+        'series': series,
+        'sermons': paginator.get_page(request.GET.get('page')),
     }
-    return render(request, 'church/sermon_detail.html', context)
+    return render(request, 'church/sermon_series.html', context)
+
+
+@replica_reads
+def scripture_browse(request, book=None, chapter=None):
+    """
+    Sermons by passage: the books preached from, or every sermon and verse
+    overlapping a book, a chapter or a ?ref= reference such as "Rom 8:28-39".
+    """
+    if book is not None:
+        number = scripture.BOOK_SLUGS.get(book)
+        if number is None or (chapter is not None and not 1 <= chapter <= scripture.BOOK_CHAPTERS[number]):
+            raise Http404('Unknown passage')
+        passage = [scripture.book_range(number, chapter)]
+    else:
+        reference = request.GET.get('ref', '').strip()
+        passage = scripture.parse(reference) if reference else []
+        if reference and not passage:
+            messages.error(request, f'"{reference}" is not a scripture reference we recognise.')
+
+    context = {
+        'church_settings': get_church_settings(),
+        'passage': ', '.join(scripture.format_range(*r) for r in passage),
+        'reference': request.GET.get('ref', ''),
+    }
+    if not passage:
+        # Book index: how many sermons preach from each book
+        counts = dict(
+            ScriptureRange.objects.filter(sermon__isnull=False).order_by().values_list('book')
+            .annotate(sermons=Count('sermon', distinct=True))
+        )
+        context['books'] = [
+            {'name': scripture.BOOK_NAMES[number], 'slug': slug, 'sermons': counts.get(number, 0)}
+            for slug, number in scripture.BOOK_SLUGS.items()
+        ]
+        return render(request, 'church/scripture.html', context)
+
+    if book is not None:
+        # Chapters of the book that sermons preach from
+        chapters = set()
+        for start, end in ScriptureRange.objects.filter(sermon__isnull=False, book=number).values_list('start', 'end'):
+            first, last = scripture.split_id(start)[1], scripture.split_id(end)[1]
+            chapters.update(range(max(first, 1), min(last, scripture.BOOK_CHAPTERS[number]) + 1))
+        context.update({
+            'book': {'name': scripture.BOOK_NAMES[number], 'slug': book},
+            'chapter': chapter,
+            'chapters': sorted(chapters),
+        })
+    paginator = Paginator(scripture.sermons_touching(passage).order_by('-date_preached'), 9)
+    context.update({
+        'sermons': paginator.get_page(request.GET.get('page')),
+        'verses': scripture.verses_touching(passage).filter(is_active=True)[:10],
+        # The text itself for a chapter or reference, not a whole book
+        'scripture_verses': bible.passage(passage) if book is None or chapter is not None else [],
+    })
+    return render(request, 'church/scripture.html', context)
+
+
+@replica_reads
+def api_sermon_waveform(request, pk):
+    """Waveform peaks and duration for a sermon's audio player (JSON)"""
+    sermon = get_object_or_404(
+        Sermon.objects.only('audio_status', 'audio_duration', 'audio_loudness', 'audio_peaks'),
+        pk=pk,
+    )
+    if sermon.audio_status != 'done':
+        return JsonResponse({'ready': False})
+    response = JsonResponse({
+        'ready': True,
+        'duration': sermon.audio_duration,
+        'loudness': sermon.audio_loudness,
+        'peaks': sermon.audio_peaks,
+    })
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
 
 
 def newsletter_subscribe(request):
@@ -492,41 +599,16 @@ def newsletter_subscribe(request):
         if form.is_valid():
             email = form.cleaned_data['email']
             
-            # Check if already subscribed
-            if Newsletter.objects.filter(email=email).exists():
+            # Subscribe (or reactivate) in a single upsert
+            result = Newsletter.subscribe(email)
+            if result == 'exists':
                 return JsonResponse({
                     'success': False,
                     'message': 'You are already subscribed to our newsletter.'
                 })
             
-            # Subscribe
-            Newsletter.objects.create(email=email)
-            
-            # Send welcome email
-            try:
-                send_mail(
-                    'Welcome to WOPBIC Newsletter',
-                    f'''
-                    Dear Subscriber,
-                    
-                    Thank you for subscribing to the World of Prayer Bible International Church newsletter!
-                    
-                    You will now receive updates about:
-                    - Upcoming events and services
-                    - New sermon releases
-                    - Prayer requests and testimonies
-                    - Church announcements
-                    
-                    God bless you!
-                    
-                    WOPBIC Team
-                    ''',
-                    settings.DEFAULT_FROM_EMAIL,
-                    [email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Welcome email failed: {e}")
+            # Send welcome email in the background
+            run_async(send_welcome_email, email)
             
             return JsonResponse({
                 'success': True,
@@ -541,18 +623,131 @@ def newsletter_subscribe(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method.'})
 
 
+@csrf_exempt
+def newsletter_unsubscribe(request, token):
+    """One-click newsletter unsubscribe (link in every campaign email)"""
+    subscriber_id = read_unsubscribe_token(token)
+    if subscriber_id is None:
+        raise Http404('Invalid unsubscribe link')
+    subscriber = get_object_or_404(Newsletter, pk=subscriber_id)
+
+    # Mail clients send a POST for RFC 8058 one-click unsubscribe; browsers
+    # get a confirmation page first so link scanners cannot unsubscribe people.
+    unsubscribed = not subscriber.is_active
+    if request.method == 'POST' and subscriber.is_active:
+        Newsletter.objects.filter(pk=subscriber.pk).update(is_active=False, unsubscribed_at=timezone.now())
+        unsubscribed = True
+
+    context = {
+        'church_settings': get_church_settings(),
+        'subscriber': subscriber,
+        'unsubscribed': unsubscribed,
+    }
+    return render(request, 'church/newsletter_unsubscribe.html', context)
+
+
+@replica_reads
 def live_stream(request):
-    """Live stream page"""
+    """Live stream page; the status on it is kept current by api_live_status"""
     context = {
         'church_settings': get_church_settings(),
-        'next_service': Event.objects.filter(
-            date__gte=timezone.now().date(),
-            event_type='service'
-        ).order_by('date', 'start_time').first(),
+        'live': live.get_status(),
     }
     return render(request, 'church/live_stream.html', context)
 
 
+async def api_live_status(request):
+    """Live status as server-sent events, pushed on every change under ASGI"""
+    # WOPBIC/asgi.py normally answers this URL before Django (church.live.LiveStatusStream)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live.event_stream(), content_type='text/event-stream')
+    else:
+        # No event loop to hold the connection: send the status once and let
+        # the browser reconnect for the next one
+        payload = await sync_to_async(live.status_json)()
+        response = HttpResponse(live.sse_message(payload, retry=live.POLL_RECONNECT_MS), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def cached_feed_response(request, content, etag, built_at, content_type, filename=None):
+    """Serve a cached feed, answering conditional requests with a 304"""
+    etag = f'"{etag}"'
+    last_modified = int(built_at)
+    
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+        if filename:
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+
+@replica_reads
+def podcast_feed(request, series_slug=None):
+    """Podcast RSS feed of sermons, optionally for one series"""
+    xml, etag, built_at = get_podcast_feed(request, series_slug)
+    return cached_feed_response(request, xml, etag, built_at, 'application/rss+xml; charset=utf-8')
+
+
+@replica_reads
+def events_calendar(request, event_type=None):
+    """iCalendar feed of events, optionally for one event type"""
+    calendar_feed = get_calendar(event_type=event_type)
+    if calendar_feed is None:
+        raise Http404('No such event type')
+    ics, etag, built_at = calendar_feed
+    return cached_feed_response(request, ics, etag, built_at, 'text/calendar; charset=utf-8')
+
+
+@replica_reads
+def event_ics(request, pk):
+    """Download a single event as an .ics file"""
+    calendar_feed = get_calendar(event_pk=pk)
+    if calendar_feed is None:
+        raise Http404('No such event')
+    ics, etag, built_at = calendar_feed
+    return cached_feed_response(
+        request, ics, etag, built_at, 'text/calendar; charset=utf-8', filename=f'event-{pk}.ics'
+    )
+
+
+@replica_reads
+def sitemap(request, section=None):
+    """Sitemap index, or one of the sitemaps it lists"""
+    sitemap_xml = get_sitemap(section)
+    if sitemap_xml is None:
+        raise Http404('No such sitemap')
+    xml, etag, built_at = sitemap_xml
+    return cached_feed_response(request, xml, etag, built_at, 'application/xml; charset=utf-8')
+
+
+@never_cache
+def readiness(request):
+    """Readiness probe: 503 until this process has finished warming its caches"""
+    if not warmup.is_ready():
+        warmup.start_background()
+        return JsonResponse({'ready': False}, status=503)
+    return JsonResponse({'ready': True})
+
+
+def robots_txt(request):
+    """robots.txt pointing crawlers at the sitemap"""
+    lines = [
+        'User-agent: *',
+        'Disallow: /admin/',
+        'Disallow: /api/',
+        f"Sitemap: {request.build_absolute_uri(reverse('sitemap'))}",
+    ]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain')
+
+
+@replica_reads
 def api_events(request):
     """API endpoint for calendar events (JSON)"""
     start_date = request.GET.get('start')
@@ -584,6 +779,7 @@ def api_events(request):
     return JsonResponse([], safe=False)
 
 
+@replica_reads
 def search(request):
     """Global search functionality"""
     form = SearchForm(request.GET)
@@ -591,6 +787,9 @@ def search(request):
         'sermons': [],
         'events': [],
         'testimonies': [],
+        'verses': [],
+        'scripture_verses': [],
+        'passage': '',
         'query': ''
     }
     
@@ -598,14 +797,20 @@ def search(request):
         query = form.cleaned_data['query']
         results['query'] = query
         
-        # Search sermons
+        # Search sermons (by passage when the query is a reference like "Prov 3:5")
         results['sermons'] = Sermon.objects.filter(
             Q(title__icontains=query) |
             Q(preacher__icontains=query) |
-            Q(scripture_reference__icontains=query) |
+            sermon_reference_filter(query) |
             Q(summary__icontains=query)
         ).order_by('-date_preached')[:10]
         
+        # Bible verses within the passage
+        passage = scripture.parse(query, require_chapter=True)
+        results['passage'] = ', '.join(scripture.format_range(*r) for r in passage)
+        results['verses'] = scripture.verses_touching(passage).filter(is_active=True)[:10] if passage else []
+        results['scripture_verses'] = bible.passage(passage) if passage else []
+        
         # Search events
         results['events'] = Event.objects.filter(
             Q(title__icontains=query) |
@@ -627,6 +832,7 @@ def search(request):
     }
     return render(request, 'church/search.html', context)
 
+@replica_reads
 def bible_verse_of_the_day(request):
     verse = BibleVerse.objects.filter(is_active=True).order_by('-created_at').first()
     return render(request, 'church/bible_verse.html', {'verse': verse})
@@ -0,0 +1,94 @@
+# church/warmup.py
+"""
+Cache warm-up after a deploy or a worker start.
+
+Primes the shared cache (church settings, verse of the day, home page rows,
+sitemap and calendar) and this process's compiled templates, form skeletons
+and URLconf, so the first visitors after a deploy do not pay for cold
+caches. Under gunicorn this runs in the master before the workers fork (see
+gunicorn.conf.py), so every worker starts warm; elsewhere the readiness
+endpoint starts it.
+"""
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from . import content, form_cache
+from .forms import ContactForm, DonationForm, PrayerRequestForm
+from .ical import get_calendar
+from .sitemaps import get_sitemap
+from .tasks import run_async
+
+
+_ready = threading.Event()
+_started = False
+_started_lock = threading.Lock()
+
+
+def template_names():
+    """Every template under templates/church/, as get_template() names"""
+    root = Path(settings.BASE_DIR) / 'templates'
+    return sorted(path.relative_to(root).as_posix() for path in (root / 'church').rglob('*.html'))
+
+
+def warm_templates():
+    loaded = 0
+    for name in template_names():
+        try:
+            get_template(name)
+            loaded += 1
+        except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+            print(f"Template warm-up of {name} failed: {e}")
+    return f'{loaded} compiled'
+
+
+STEPS = [
+    ('URLconf', lambda: len(get_resolver().url_patterns)),
+    ('Church settings', content.get_church_settings),
+    ('Verse of the day', content.get_daily_verse),
+    ('Home page rows', content.get_home_content),
+    ('Templates', warm_templates),
+    ('Form skeletons', lambda: form_cache.build_all([PrayerRequestForm, DonationForm, ContactForm])),
+    ('Sitemap index', get_sitemap),
+    ('Events calendar', get_calendar),
+]
+
+
+def warm(log=None):
+    """Run every warm-up step; returns [(step, seconds, error)]"""
+    results = []
+    for label, step in STEPS:
+        started = time.monotonic()
+        error = None
+        try:
+            detail = step()
+        except Exception as e:
+            # A broken step must not keep the process unready forever
+            detail = None
+            error = f'{e.__class__.__name__}: {e}'
+        elapsed = time.monotonic() - started
+        results.append((label, elapsed, error))
+        if log:
+            outcome = error or (detail if isinstance(detail, str) else 'ok')
+            log(f'  {label}: {elapsed * 1000:.0f} ms ({outcome})')
+    _ready.set()
+    return results
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def start_background():
+    """Warm up on the background pool, once per process"""
+    global _started
+    with _started_lock:
+        if _started or is_ready():
+            return
+        _started = True
+    run_async(warm)
@@ -0,0 +1,134 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for production (gunicorn loads this file automatically).
+
+Views spend most of their time waiting on the database and SMTP, so each
+worker runs several threads (gthread) instead of one request at a time.
+Serving WOPBIC.asgi:application with GUNICORN_WORKER_CLASS set to
+uvicorn_worker.UvicornWorker runs an event loop in each worker instead, which
+can also hold open the long-lived live status streams (see WOPBIC/asgi.py). The
+app is imported once in the master before forking (preload_app) so workers
+share its memory copy-on-write, and the worker count is capped by the
+memory available to the container as well as by its CPUs.
+
+Every setting can be overridden from the environment, see .env.example.
+"""
+import gc
+import os
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_mb():
+    """Memory limit of the container (cgroup v2 or v1), else the machine's RAM"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number
+        if value != 'max' and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return 512
+
+
+def worker_count(cpus, memory_mb, worker_memory_mb, reserved_mb):
+    """2 x CPUs + 1, but no more workers than fit in memory (at least one)"""
+    by_cpu = 2 * cpus + 1
+    by_memory = (memory_mb - reserved_mb) // worker_memory_mb
+    return max(1, min(by_cpu, by_memory))
+
+
+# Resident memory a worker grows to beyond what it shares with the master
+WORKER_MEMORY_MB = _env_int('GUNICORN_WORKER_MEMORY_MB', 90)
+# Master process, copy-on-write shared pages and headroom for spikes
+RESERVED_MEMORY_MB = _env_int('GUNICORN_RESERVED_MEMORY_MB', 160)
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = _env_int('WEB_CONCURRENCY', 0) or worker_count(
+    available_cpus(), available_memory_mb(), WORKER_MEMORY_MB, RESERVED_MEMORY_MB
+)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Only used by gthread workers
+threads = _env_int('GUNICORN_THREADS', 4)
+
+preload_app = True
+
+# Recycle workers now and then so slow leaks cannot eat the instance's memory;
+# the jitter stops them all restarting at the same moment.
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = 20
+keepalive = 5
+
+# The worker heartbeat file; tmpfs keeps it from blocking on a slow disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    """Finish loading the app in the master so workers share it"""
+    from django.db import connections
+
+    from church import warmup
+
+    # Imports the URLconf (every view, form and model module), compiles the
+    # templates and primes the shared cache before any worker exists
+    server.log.info('Warming caches')
+    warmup.warm(log=server.log.info)
+    connections.close_all()
+    # close_all() only returns pooled connections (DB_POOL) to the pool; close
+    # the pools too, or every worker inherits their sockets and their threads
+    # (which do not survive the fork)
+    for connection in connections.all():
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+    # Keep the garbage collector from touching (and so copying) the shared
+    # objects in every worker
+    gc.freeze()
+    if worker_class == 'gthread':
+        server.log.info(f'Starting {workers} {worker_class} workers x {threads} threads')
+    else:
+        server.log.info(f'Starting {workers} {worker_class} workers')
+
+
+def post_fork(server, worker):
+    """Give each worker its own connections instead of the master's"""
+    from django.core.cache import close_caches
+    from django.db import connections
+
+    from church.tasks import reset_after_fork
+
+    connections.close_all()
+    # Forget any pool the master still had; this worker opens its own
+    for connection in connections.all():
+        pools = getattr(connection, '_connection_pools', None)
+        if pools:
+            pools.clear()
+    close_caches()
+    reset_after_fork()